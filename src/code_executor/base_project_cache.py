@@ -0,0 +1,73 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from gs_common.CodeProject import CodeProject
+
+
+def _project_size(project: CodeProject) -> int:
+    return sum(
+        len(f.file_name) + len(f.source_code)
+        for f in project.files + project.reference_files
+    )
+
+
+class BaseProjectCache:
+    """
+    Base projects of the candidates sent as ProjectDeltas (see
+    gs_common.project_delta), in memory by CodeProject.content_hash(normalize=False).
+    A request sends its base once (base_project), later requests only send the
+    hash (base_hash). If the base is not cached (evicted, restart or another
+    replica) the request is answered with missing_base and the client sends the
+    base again. The least recently used bases are removed beyond max_size_bytes.
+
+    The cached projects are shared by all requests: never modify them, copy
+    the projects reconstructed from them before modifying files in place.
+    """
+
+    # cache used by execute_tests(_batch), None = disabled (see configure)
+    default: "BaseProjectCache" = None
+
+    def __init__(self, max_size_bytes: int):
+        self.max_size_bytes = max_size_bytes
+        self._lock = threading.Lock()
+        self._bases: OrderedDict[str, tuple[CodeProject, int]] = OrderedDict()
+        self._size = 0
+
+    @staticmethod
+    def configure(max_size_mb: float):
+        """
+        Set BaseProjectCache.default to a cache of max_size_mb.
+        max_size_mb 0 disables the cache: deltas need base_project in every request.
+        """
+        if not max_size_mb:
+            BaseProjectCache.default = None
+            return
+        logging.info(f"Using base project cache of {max_size_mb} MB")
+        BaseProjectCache.default = BaseProjectCache(int(max_size_mb * 1024 * 1024))
+
+    def put(self, project: CodeProject) -> str:
+        """
+        Cache project; returns its hash.
+        """
+        base_hash = project.content_hash(normalize=False)
+        size = _project_size(project)
+        with self._lock:
+            if base_hash in self._bases:
+                self._bases.move_to_end(base_hash)
+                return base_hash
+            self._bases[base_hash] = (project, size)
+            self._size += size
+            # keep at least the new base, even if it is larger than the cache
+            while self._size > self.max_size_bytes and len(self._bases) > 1:
+                _, (_, evicted_size) = self._bases.popitem(last=False)
+                self._size -= evicted_size
+        return base_hash
+
+    def get(self, base_hash: str) -> CodeProject | None:
+        with self._lock:
+            entry = self._bases.get(base_hash)
+            if entry is not None:
+                self._bases.move_to_end(base_hash)
+        logging.info(f"GSMETRIC:base_project_cache_hit={entry is not None}")
+        return entry[0] if entry is not None else None
@@ -0,0 +1,221 @@
+import logging
+import os
+import subprocess
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+# command line markers of the build server processes (Roslyn compiler server,
+# MSBuild worker nodes and MSBuild server, Razor compiler server)
+BUILD_SERVER_MARKERS = [b"VBCSCompiler", b"/nodemode:", b"rzc.dll"]
+# build output that means a build server crashed, not that the project is broken
+BUILD_SERVER_ERRORS = ["MSB4166"]
+# dotnet commands that run the tests (user code) and keep the temp dir of their job
+JOB_TEMP_COMMANDS = ["test"]
+
+
+def build_server_memory_mb() -> float | None:
+    """
+    Resident memory of all build server processes, None if unknown (no /proc).
+    """
+    if not os.path.isdir("/proc"):
+        return None
+    memory_kb = 0
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                cmdline = f.read()
+            if not any(marker in cmdline for marker in BUILD_SERVER_MARKERS):
+                continue
+            with open(f"/proc/{pid}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        memory_kb += int(line.split()[1])
+        except (OSError, ValueError):
+            # process exited in the meantime
+            continue
+    return memory_kb / 1024
+
+
+class DotnetBuildServer:
+    """
+    Runs the dotnet build and test commands of the NUnitProgram.
+
+    Enabled (warm mode): the MSBuild nodes, the MSBuild server and the Roslyn
+    compiler server (VBCSCompiler) stay alive and are reused by the next build,
+    so only the first build pays for their startup. They are recycled
+    (dotnet build-server shutdown) after max_builds builds, when they use more
+    than max_memory_mb or when a build reports a crashed node.
+    The servers are found via pipes in the temp dir, so all builds use server_dir
+    as temp dir instead of the temp dir of their job. There is no setting for
+    the pipe location alone, so JOB_TEMP_COMMANDS (dotnet test, which runs the
+    tests) keep the temp dir of their job and run without build servers: the
+    tests of concurrent jobs do not share a temp dir, at the cost of a cold
+    build if dotnet test has to build (it follows a build of the test project,
+    so it is usually up to date).
+
+    Disabled (cold mode): every command starts its own build processes and no
+    server is left running.
+    """
+
+    # build server used by NUnitProgram, None = plain dotnet commands
+    default: "DotnetBuildServer" = None
+
+    def __init__(
+        self,
+        enabled: bool,
+        server_dir: str,
+        max_builds: int,
+        max_memory_mb: float,
+        run=subprocess.run,
+        memory_mb=build_server_memory_mb,
+    ):
+        self.enabled = enabled
+        self.server_dir = os.path.abspath(server_dir)
+        self.max_builds = max_builds
+        self.max_memory_mb = max_memory_mb
+        self._run = run
+        self._memory_mb = memory_mb
+        self._condition = threading.Condition()
+        self._n_active = 0
+        self.n_builds = 0
+        self.n_recycles = 0
+        self.recycle_reason: str | None = None
+        os.makedirs(self.server_dir, exist_ok=True)
+
+    @staticmethod
+    def configure(config: dict):
+        logging.info(
+            f"Using dotnet build server: enabled={config['dotnet_build_server_enabled']}"
+        )
+        DotnetBuildServer.default = DotnetBuildServer(
+            config["dotnet_build_server_enabled"],
+            config["dotnet_build_server_dir"],
+            config["dotnet_build_server_max_builds"],
+            config["dotnet_build_server_max_memory_mb"],
+        )
+
+    def _env(self, env: dict[str, str] | None, warm: bool) -> dict[str, str]:
+        env = dict(os.environ if env is None else env)
+        if warm:
+            env.update(
+                {
+                    "TMPDIR": self.server_dir,
+                    "TMP": self.server_dir,
+                    "TEMP": self.server_dir,
+                    "DOTNET_CLI_USE_MSBUILD_SERVER": "1",
+                }
+            )
+            env.pop("MSBUILDDISABLENODEREUSE", None)
+        else:
+            env.update(
+                {
+                    "DOTNET_CLI_USE_MSBUILD_SERVER": "0",
+                    "MSBUILDDISABLENODEREUSE": "1",
+                }
+            )
+        return env
+
+    def _args(self, warm: bool) -> list[str]:
+        if warm:
+            return []
+        return ["--disable-build-servers"]
+
+    def _check_health(self, process_result: subprocess.CompletedProcess):
+        if not self.enabled or self.recycle_reason is not None:
+            return
+        output = process_result.stdout + process_result.stderr
+        if any(error in output for error in BUILD_SERVER_ERRORS):
+            self.recycle_reason = "crashed build node"
+        elif self.n_builds >= self.max_builds:
+            self.recycle_reason = f"{self.n_builds} builds"
+        else:
+            memory_mb = self._memory_mb()
+            if memory_mb is not None:
+                logging.info(f"GSMETRIC:dotnet_build_server_memory_mb={memory_mb:.0f}")
+                if memory_mb > self.max_memory_mb:
+                    self.recycle_reason = f"{memory_mb:.0f} MB memory"
+
+    def _recycle(self):
+        logging.info(f"Recycling dotnet build servers: {self.recycle_reason}")
+        try:
+            self._run(
+                ["dotnet", "build-server", "shutdown"],
+                capture_output=True,
+                text=True,
+                timeout=60,
+                env=self._env(None, self.enabled),
+            )
+        except Exception as e:
+            logging.error(f"Error shutting down dotnet build servers: {e}")
+        self.n_builds = 0
+        self.n_recycles += 1
+        self.recycle_reason = None
+        logging.info(f"GSMETRIC:dotnet_build_server_recycles={self.n_recycles}")
+
+    def shutdown(self):
+        """
+        Stop the build servers once the running builds are done.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._n_active == 0)
+            self.recycle_reason = "shutdown"
+            self._recycle()
+
+    @contextmanager
+    def _build(self) -> Iterator[None]:
+        with self._condition:
+            # no new builds while a recycle is pending, it waits for running builds
+            self._condition.wait_for(
+                lambda: self.recycle_reason is None or self._n_active == 0
+            )
+            if self.recycle_reason is not None:
+                self._recycle()
+            self._n_active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._n_active -= 1
+                self.n_builds += 1
+                self._condition.notify_all()
+
+    def run(
+        self, command: list[str], cwd: str, env: dict[str, str] | None, timeout: float
+    ) -> subprocess.CompletedProcess:
+        """
+        subprocess.run for a dotnet command (e.g. ["dotnet", "build"]).
+        """
+        warm = self.enabled and command[1] not in JOB_TEMP_COMMANDS
+        if not warm:
+            # does not use (or start) the build servers, no need to wait for recycles
+            return self._run_command(command, cwd, env, timeout, warm)
+        with self._build():
+            process_result = self._run_command(command, cwd, env, timeout, warm)
+        with self._condition:
+            self._check_health(process_result)
+        return process_result
+
+    def _run_command(
+        self,
+        command: list[str],
+        cwd: str,
+        env: dict[str, str] | None,
+        timeout: float,
+        warm: bool,
+    ) -> subprocess.CompletedProcess:
+        t0 = time.time()
+        process_result = self._run(
+            command + self._args(warm),
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+            cwd=cwd,
+            env=self._env(env, warm),
+        )
+        mode = "warm" if warm else "cold"
+        logging.info(f"GSMETRIC:dotnet_{command[1]}_time_{mode}={time.time() - t0:.2f}")
+        return process_result
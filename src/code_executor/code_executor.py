@@ -23,14 +23,19 @@ class CodeExecutor:
         source_project: CodeProject,
         test_project: CodeProject,
         exec_dir: str = None,
+        env: dict[str, str] | None = None,
     ):
         self.exec_dir = exec_dir
+        # environment of the build and test subprocesses, None = inherit
+        self.env = env
         logging.info(f"Creating exec dir: {self.exec_dir}")
         os.makedirs(self.exec_dir, exist_ok=True)
 
         self.source_project = source_code_formatter.format(source_project)
         self.test_project = test_code_formatter.format(test_project)
         self.testing_framework_program = testing_framework_program
+        # seconds of the last compile, set by execute
+        self.compile_time: float = None
 
         if source_code_wrapper:
             self.source_project = source_code_wrapper.wrap(self.source_project)
@@ -40,13 +45,13 @@ class CodeExecutor:
             self.source_project,
             self.test_project,
             self.exec_dir,
+            self.env,
         )
         try:
             start_time = time.time()
             test_program.compile()
-            logging.info(
-                f"Time to compile: {round(time.time() - start_time, 2)} seconds"
-            )
+            self.compile_time = time.time() - start_time
+            logging.info(f"Time to compile: {round(self.compile_time, 2)} seconds")
 
             start_time = time.time()
             test_program.run()
@@ -58,6 +63,8 @@ class CodeExecutor:
             raise Exception(
                 f"TimeoutExpired.\n\nstdout: {e.stdout}\n\nstderr: {e.stderr}"
             )
+        finally:
+            test_program.close()
 
         return ExecutionResult(
             total_tests=test_program.total_tests,
@@ -0,0 +1,75 @@
+import hashlib
+import logging
+
+from gs_common.CodeProject import CodeProject
+from gs_common.file_ops import DiskCache
+
+# increment to invalidate all cached results, e.g. after changing the executors
+CACHE_VERSION = 1
+
+
+class ExecutionCache:
+    """
+    Content addressed cache for the responses of execute_tests.
+    The key is a hash of the exact content of the source and test project and
+    the target language, so the same request is answered without building and
+    running the tests again.
+    """
+
+    # cache used by execute_tests, None = disabled (see configure)
+    default: "ExecutionCache" = None
+
+    def __init__(self, disk_cache: DiskCache):
+        self.disk_cache = disk_cache
+
+    @staticmethod
+    def configure(cache_dir: str | None, ttl_hours: float, max_size_mb: float):
+        """
+        Set ExecutionCache.default to a disk cache in cache_dir.
+        cache_dir None disables the cache.
+        """
+        if not cache_dir:
+            ExecutionCache.default = None
+            return
+        logging.info(f"Using execution cache in {cache_dir}")
+        ExecutionCache.default = ExecutionCache(
+            DiskCache(
+                cache_dir,
+                ttl_seconds=ttl_hours * 3600,
+                max_size_bytes=int(max_size_mb * 1024 * 1024),
+            )
+        )
+
+    @staticmethod
+    def make_key(
+        source_project: CodeProject, test_project: CodeProject, target_language: str
+    ) -> str:
+        key = "\0".join(
+            [
+                str(CACHE_VERSION),
+                target_language,
+                source_project.display_name,
+                source_project.content_hash(normalize=False),
+                test_project.display_name,
+                test_project.content_hash(normalize=False),
+            ]
+        )
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """
+        The stored response json or None.
+        """
+        try:
+            response = self.disk_cache.get(key)
+        except Exception as e:
+            logging.error(f"Error reading execution cache: {e}")
+            response = None
+        logging.info(f"GSMETRIC:execution_cache_hit={response is not None}")
+        return response
+
+    def set(self, key: str, response: str):
+        try:
+            self.disk_cache.set(key, response)
+        except Exception as e:
+            logging.error(f"Error writing execution cache: {e}")
@@ -0,0 +1,141 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+# job kinds with their own worker pool, see code_executor_workers_* in config.yaml
+JOB_KINDS = ["dotnetframework", "dotnet8", "java8", "java21", "upgrade_assistant"]
+
+
+class ExecutorBusyError(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    kind: str
+    job_dir: str
+    # environment for the subprocesses of the job
+    env: dict[str, str] = field(default_factory=dict)
+
+
+class ExecutorScheduler:
+    """
+    Bounds the number of concurrent builds per job kind (language) instead of
+    running one per grpc handler thread. A job waits in the queue of its kind
+    until a worker is free; if max_queue_depth jobs are already waiting or the
+    wait exceeds queue_timeout seconds it is rejected with ExecutorBusyError.
+
+    Every job gets its own temp dir in job_dir, so parallel builds do not share
+    scratch files. The NuGet scratch dir (locks of the global packages folder)
+    stays shared, else the locks would not work across jobs.
+    """
+
+    # scheduler used by main.py, see configure
+    default: "ExecutorScheduler" = None
+
+    def __init__(
+        self,
+        workers: dict[str, int],
+        max_queue_depth: int,
+        queue_timeout: float,
+    ):
+        self.workers = workers
+        self.max_queue_depth = max_queue_depth
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._slots = {
+            kind: threading.BoundedSemaphore(max(1, n_workers))
+            for kind, n_workers in workers.items()
+        }
+        self._queued = {kind: 0 for kind in workers}
+        self._running = {kind: 0 for kind in workers}
+        self.nuget_scratch_dir = os.environ.get(
+            "NUGET_SCRATCH", os.path.join(tempfile.gettempdir(), "NuGetScratch")
+        )
+
+    @staticmethod
+    def configure(config: dict):
+        workers = {kind: config[f"code_executor_workers_{kind}"] for kind in JOB_KINDS}
+        logging.info(f"Using executor scheduler with workers {workers}")
+        ExecutorScheduler.default = ExecutorScheduler(
+            workers,
+            config["code_executor_max_queue_depth"],
+            config["code_executor_queue_timeout_seconds"],
+        )
+
+    def n_queued(self, kind: str) -> int:
+        return self._queued[kind]
+
+    def n_running(self, kind: str) -> int:
+        return self._running[kind]
+
+    def _log_metrics(self, kind: str):
+        logging.info(f"GSMETRIC:executor_queue_depth_{kind}={self._queued[kind]}")
+        logging.info(f"GSMETRIC:executor_running_{kind}={self._running[kind]}")
+
+    def _acquire(self, kind: str):
+        slot = self._slots[kind]
+        with self._lock:
+            acquired = slot.acquire(blocking=False)
+            if not acquired:
+                if self._queued[kind] >= self.max_queue_depth:
+                    logging.info(f"GSMETRIC:executor_rejected_{kind}=1")
+                    raise ExecutorBusyError(
+                        f"code_executor busy: {self._queued[kind]} {kind} jobs queued"
+                    )
+                self._queued[kind] += 1
+                self._log_metrics(kind)
+        if not acquired:
+            t0 = time.time()
+            acquired = slot.acquire(timeout=self.queue_timeout)
+            with self._lock:
+                self._queued[kind] -= 1
+            logging.info(f"GSMETRIC:executor_queue_wait_{kind}={time.time() - t0:.2f}")
+            if not acquired:
+                logging.info(f"GSMETRIC:executor_rejected_{kind}=1")
+                raise ExecutorBusyError(
+                    f"code_executor busy: no {kind} worker free "
+                    f"after {self.queue_timeout} seconds"
+                )
+        with self._lock:
+            self._running[kind] += 1
+            self._log_metrics(kind)
+
+    def _release(self, kind: str):
+        with self._lock:
+            self._running[kind] -= 1
+            self._log_metrics(kind)
+        self._slots[kind].release()
+
+    def _job_env(self, tmp_dir: str) -> dict[str, str]:
+        env = dict(os.environ)
+        env.update(
+            {
+                "TMPDIR": tmp_dir,
+                "TMP": tmp_dir,
+                "TEMP": tmp_dir,
+                "NUGET_SCRATCH": self.nuget_scratch_dir,
+            }
+        )
+        return env
+
+    @contextmanager
+    def job(self, kind: str, job_dir: str) -> Iterator[Job]:
+        """
+        Wait for a free worker of kind and run the job in job_dir.
+        The caller removes job_dir afterwards (it contains the temp dir).
+        """
+        if kind not in self._slots:
+            raise ValueError(f"Unknown job kind: {kind}")
+        self._acquire(kind)
+        try:
+            tmp_dir = os.path.abspath(os.path.join(job_dir, ".tmp"))
+            os.makedirs(tmp_dir, exist_ok=True)
+            yield Job(kind=kind, job_dir=job_dir, env=self._job_env(tmp_dir))
+        finally:
+            self._release(kind)
@@ -24,6 +24,7 @@ class CodeExecutorFactory:
         source_project: str,
         test_project: str,
         save_dir: str,
+        env: dict[str, str] | None = None,
     ) -> CodeExecutor:
         # check if config is valid
         CodeExecutorFactory.check_config(config)
@@ -42,6 +43,7 @@ class CodeExecutorFactory:
             source_project,
             test_project,
             save_dir,
+            env,
         )
 
     @staticmethod
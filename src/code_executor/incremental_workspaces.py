@@ -0,0 +1,158 @@
+import filecmp
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+
+# dirs kept in a workspace between builds (build outputs and restored packages)
+BUILD_OUTPUT_DIRS = {"obj", "bin", "packages"}
+KEY_LENGTH = 16
+
+
+def sync_dir(source_dir: str, target_dir: str) -> int:
+    """
+    Make the files in target_dir equal to the files in source_dir, but keep the
+    build outputs (BUILD_OUTPUT_DIRS) of target_dir. Unchanged files are not
+    written, so their timestamps stay older than the build outputs.
+    Returns the number of written and removed files.
+    """
+    n_changed = 0
+    source_files = set()
+    for root, _, files in os.walk(source_dir):
+        rel_root = os.path.relpath(root, source_dir)
+        os.makedirs(os.path.join(target_dir, rel_root), exist_ok=True)
+        for file in files:
+            rel_path = os.path.normpath(os.path.join(rel_root, file))
+            source_files.add(rel_path)
+            source_file = os.path.join(source_dir, rel_path)
+            target_file = os.path.join(target_dir, rel_path)
+            if os.path.isfile(target_file) and filecmp.cmp(
+                source_file, target_file, shallow=False
+            ):
+                continue
+            shutil.copyfile(source_file, target_file)
+            n_changed += 1
+
+    for root, dirs, files in os.walk(target_dir):
+        dirs[:] = [d for d in dirs if d not in BUILD_OUTPUT_DIRS]
+        rel_root = os.path.relpath(root, target_dir)
+        for file in files:
+            rel_path = os.path.normpath(os.path.join(rel_root, file))
+            if rel_path not in source_files:
+                os.remove(os.path.join(root, file))
+                n_changed += 1
+    return n_changed
+
+
+@dataclass
+class Workspace:
+    key: str
+    path: str
+    last_used: float = 0.0
+    n_builds: int = 0
+    # False while a build runs; a killed build can leave broken outputs behind
+    clean: bool = True
+
+
+class IncrementalWorkspaces:
+    """
+    Persistent build dirs for the candidates of one project (e.g. the translations
+    of the TL picker), so that MSBuild only rebuilds what changed compared to the
+    previous candidate built in the same workspace.
+
+    The candidate is synced into the workspace (see sync_dir) instead of saved
+    into a fresh exec_dir. A workspace keeps its path: copying obj/ to another dir
+    would invalidate it, since the restore outputs contain absolute paths.
+    A workspace is used by one build at a time; at most max_per_project
+    workspaces per project and max_workspaces in total, the least recently used
+    idle workspace is removed if needed.
+    """
+
+    # workspaces used by NUnitProgram, None = disabled (see configure)
+    default: "IncrementalWorkspaces" = None
+
+    def __init__(self, base_dir: str, max_per_project: int, max_workspaces: int):
+        self.base_dir = os.path.abspath(base_dir)
+        self.max_per_project = max_per_project
+        self.max_workspaces = max_workspaces
+        self._lock = threading.Lock()
+        self._idle: list[Workspace] = []
+        self._in_use: list[Workspace] = []
+        self._n_created = 0
+        os.makedirs(self.base_dir, exist_ok=True)
+        # workspaces of an earlier process are not trusted
+        for entry in os.scandir(self.base_dir):
+            if entry.is_dir() and len(entry.name) == KEY_LENGTH:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    @staticmethod
+    def configure(base_dir: str | None, max_per_project: int, max_workspaces: int):
+        """
+        Set IncrementalWorkspaces.default to workspaces in base_dir.
+        base_dir None disables the incremental builds.
+        """
+        if not base_dir:
+            IncrementalWorkspaces.default = None
+            return
+        logging.info(f"Using incremental workspaces in {base_dir}")
+        IncrementalWorkspaces.default = IncrementalWorkspaces(
+            base_dir, max_per_project, max_workspaces
+        )
+
+    @staticmethod
+    def make_key(*names: str) -> str:
+        return hashlib.sha256("\0".join(names).encode()).hexdigest()[:KEY_LENGTH]
+
+    def acquire(self, key: str) -> Workspace | None:
+        """
+        The most recently used idle workspace of key or a new one; None if key
+        has max_per_project workspaces in use or no workspace can be removed.
+        """
+        with self._lock:
+            idle = [w for w in self._idle if w.key == key]
+            if idle:
+                workspace = max(idle, key=lambda w: w.last_used)
+                self._idle.remove(workspace)
+            else:
+                n_of_key = len([w for w in self._in_use if w.key == key])
+                if n_of_key >= self.max_per_project:
+                    workspace = None
+                elif len(self._idle) + len(self._in_use) >= self.max_workspaces:
+                    if self._idle:
+                        oldest = min(self._idle, key=lambda w: w.last_used)
+                        self._idle.remove(oldest)
+                        self._remove(oldest)
+                        workspace = self._create(key)
+                    else:
+                        workspace = None
+                else:
+                    workspace = self._create(key)
+            if workspace is not None:
+                self._in_use.append(workspace)
+        logging.info(
+            f"GSMETRIC:incremental_workspace_reused={workspace is not None and workspace.n_builds > 0}"
+        )
+        return workspace
+
+    def release(self, workspace: Workspace):
+        with self._lock:
+            self._in_use.remove(workspace)
+            workspace.last_used = time.time()
+            workspace.n_builds += 1
+            if workspace.clean:
+                self._idle.append(workspace)
+            else:
+                logging.warning("Removing workspace after an interrupted build")
+                self._remove(workspace)
+
+    def _create(self, key: str) -> Workspace:
+        self._n_created += 1
+        path = os.path.join(self.base_dir, key, str(self._n_created))
+        os.makedirs(path)
+        return Workspace(key=key, path=path)
+
+    def _remove(self, workspace: Workspace):
+        shutil.rmtree(workspace.path, ignore_errors=True)
@@ -0,0 +1,134 @@
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+from collections.abc import Callable
+
+# output of the gradle / mvnd client if the daemon failed, not the build
+DAEMON_ERRORS = [
+    "Gradle build daemon disappeared unexpectedly",
+    "Unable to start the daemon process",
+    "Could not connect to the Gradle daemon",
+    "org.mvndaemon.mvnd.common.DaemonException",
+]
+
+RunBuild = Callable[[list[str], str, dict[str, str]], subprocess.CompletedProcess]
+
+
+class JavaBuildDaemons:
+    """
+    Runs the gradle and maven builds of the JUnitProgram on long-lived daemons
+    (Gradle daemon, mvnd) instead of starting a new JVM for every candidate.
+
+    A daemon runs one build at a time and is only reused by builds with the same
+    JDK, so the daemons form a pool per JAVA_HOME (configured per language).
+    Gradle and mvnd start another daemon if all are busy, so the pool grows up
+    to the number of java workers of the ExecutorScheduler. Each job still builds
+    in its own project dir with its own project cache.
+
+    If a daemon fails (not the build), the build is repeated with the cold
+    command. After max_failures daemon failures in a row the warm mode of that
+    build tool is disabled.
+    """
+
+    # daemons used by JUnitProgram, None = cold builds
+    default: "JavaBuildDaemons" = None
+
+    def __init__(
+        self,
+        enabled: bool,
+        java_homes: dict[str, str | None],
+        max_failures: int,
+        which=shutil.which,
+    ):
+        self.enabled = enabled
+        self.java_homes = java_homes
+        self.max_failures = max_failures
+        self._which = which
+        self._lock = threading.Lock()
+        # consecutive daemon failures per build tool
+        self.n_failures: dict[str, int] = {}
+        self.disabled: set[str] = set()
+
+    @staticmethod
+    def configure(config: dict):
+        logging.info(
+            f"Using java build daemons: enabled={config['java_build_daemon_enabled']}"
+        )
+        JavaBuildDaemons.default = JavaBuildDaemons(
+            config["java_build_daemon_enabled"],
+            {
+                language: config[f"java_build_daemon_java_home_{language}"]
+                for language in ["java8", "java21"]
+            },
+            config["java_build_daemon_max_failures"],
+        )
+
+    def _env(self, language: str, env: dict[str, str] | None) -> dict[str, str]:
+        env = dict(os.environ if env is None else env)
+        java_home = self.java_homes.get(language)
+        if java_home:
+            env["JAVA_HOME"] = java_home
+        return env
+
+    def _warm_command(self, build_config: dict) -> list[str] | None:
+        command = build_config["daemon_command"]
+        tool = command[0]
+        if not self.enabled or tool in self.disabled:
+            return None
+        if self._which(tool) is None:
+            logging.warning(f"{tool} not found, using cold builds")
+            with self._lock:
+                self.disabled.add(tool)
+            return None
+        return command
+
+    def _on_daemon_result(self, tool: str, failed: bool):
+        with self._lock:
+            if not failed:
+                self.n_failures[tool] = 0
+                return
+            self.n_failures[tool] = self.n_failures.get(tool, 0) + 1
+            logging.info(f"GSMETRIC:java_build_daemon_failures_{tool}=1")
+            if self.n_failures[tool] >= self.max_failures:
+                logging.error(
+                    f"{tool} daemon failed {self.n_failures[tool]} times in a row, "
+                    "using cold builds"
+                )
+                self.disabled.add(tool)
+
+    def run(
+        self,
+        build_config: dict,
+        language: str,
+        cwd: str,
+        env: dict[str, str] | None,
+        run_build: RunBuild,
+    ) -> tuple[list[str], subprocess.CompletedProcess]:
+        """
+        Run the build of build_config (GRADLE_CONFIG / MAVEN_CONFIG) with
+        run_build(command, cwd, env); warm if possible, else cold.
+        Returns the command that produced the result and the result.
+        """
+        env = self._env(language, env)
+        command = self._warm_command(build_config)
+        if command is not None:
+            t0 = time.time()
+            process_result = run_build(command, cwd, env)
+            output = process_result.stdout + process_result.stderr
+            failed = any(error in output for error in DAEMON_ERRORS)
+            self._on_daemon_result(command[0], failed)
+            if not failed:
+                logging.info(
+                    f"GSMETRIC:java_build_time_warm_{language}={time.time() - t0:.2f}"
+                )
+                return command, process_result
+            logging.error(f"{command[0]} daemon failed, repeating the cold build")
+
+        command = build_config["command"]
+        t0 = time.time()
+        process_result = run_build(command, cwd, env)
+        logging.info(f"GSMETRIC:java_build_time_cold_{language}={time.time() - t0:.2f}")
+        return command, process_result
@@ -4,14 +4,18 @@ import re
 import subprocess
 
 from gs_common.CodeProject import CodeProject
+from gs_common.file_ops import BlobStore
 from junitparser import JUnitXml
 
+from src.code_executor.java_build_daemons import JavaBuildDaemons
 from src.code_executor.testing_framework_program import (
     TestingFrameworkProgram,
 )
 
 GRADLE_CONFIG = {
     "command": ["gradle", "test", "--build-cache", "--no-daemon"],
+    # see JavaBuildDaemons
+    "daemon_command": ["gradle", "test", "--build-cache", "--daemon"],
     "build_file": "build.gradle",
     "test_results_dir": "build/test-results/test",
     "success_message": "BUILD SUCCESSFUL",
@@ -20,6 +24,7 @@ GRADLE_CONFIG = {
 
 MAVEN_CONFIG = {
     "command": ["mvn", "test"],
+    "daemon_command": ["mvnd", "test"],
     "build_file": "pom.xml",
     "test_results_dir": "target/surefire-reports",
     "success_message": "BUILD SUCCESS",
@@ -33,9 +38,11 @@ class JUnitProgram(TestingFrameworkProgram):
         source_project: CodeProject,
         test_project: CodeProject,
         exec_dir: str,
+        env: dict[str, str] | None = None,
     ):
         self.source_project = source_project
         self.exec_dir = exec_dir
+        self.env = env
 
         if self.source_project.source_language == "java8":
             self.is_java8 = True
@@ -64,7 +71,7 @@ class JUnitProgram(TestingFrameworkProgram):
         )
 
         # save exec project to dir
-        self.source_project.save_to_dir(self.source_project_dir)
+        self.source_project.save_to_dir(self.source_project_dir, BlobStore.default)
 
         self.compile_only = True
         if test_project is not None:
@@ -73,7 +80,7 @@ class JUnitProgram(TestingFrameworkProgram):
             # remove build file from test project
             test_project.remove_file(self.config["build_file"])
             # save test project to same dir as source project
-            test_project.save_to_dir(self.source_project_dir)
+            test_project.save_to_dir(self.source_project_dir, BlobStore.default)
             if self.config["build_file"] == "pom.xml":
                 # using other test dir than default is hard with pom...
                 # rename GSTests to test
@@ -90,22 +97,40 @@ class JUnitProgram(TestingFrameworkProgram):
     def compile(self):
         pass
 
-    def _run_command(self, command, cwd, timeout=220):
+    def _run_process(
+        self, command, cwd, env, timeout=220
+    ) -> subprocess.CompletedProcess:
         process = subprocess.Popen(
-            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, cwd=cwd
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            cwd=cwd,
+            env=env,
         )
         try:
             stdout, stderr = process.communicate(timeout=timeout)
         except subprocess.TimeoutExpired:
             process.kill()
             raise
-        self.process_result = subprocess.CompletedProcess(
-            command, process.returncode, stdout, stderr
-        )
+        return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+
+    def _run_command(self, command, cwd, timeout=220):
+        self.process_result = self._run_process(command, cwd, self.env, timeout)
         self._check_subprocess_result(command, self.process_result)
 
     def run(self):
-        self._run_command(self.config["command"], self.source_project_dir)
+        if JavaBuildDaemons.default is None:
+            self._run_command(self.config["command"], self.source_project_dir)
+        else:
+            command, self.process_result = JavaBuildDaemons.default.run(
+                self.config,
+                self.source_project.source_language,
+                self.source_project_dir,
+                self.env,
+                self._run_process,
+            )
+            self._check_subprocess_result(command, self.process_result)
         return self._get_runtime()
 
     def check_results(self):
@@ -1,38 +1,265 @@
+import contextvars
 import json
 import logging
 import os
 import shutil
-import threading
+from concurrent import futures
 
 import yaml
 from dapr.ext.grpc import App, InvokeMethodRequest, InvokeMethodResponse
 from gs_common import setup_logging, timed
 from gs_common.CodeProject import CodeProject, ExecutionResult
 from gs_common.file_ops import (
+    BlobStore,
     generate_save_dir,
 )
+from gs_common.project_delta import apply_delta
 from gs_common.tracing import extract_trace_info
+from gs_common.wire_format import decode_request
 
+from src.code_executor.base_project_cache import BaseProjectCache
+from src.code_executor.build_server import DotnetBuildServer
+from src.code_executor.execution_cache import ExecutionCache
+from src.code_executor.executor_scheduler import ExecutorBusyError, ExecutorScheduler
 from src.code_executor.factories import CodeExecutorFactory
+from src.code_executor.incremental_workspaces import IncrementalWorkspaces
+from src.code_executor.java_build_daemons import JavaBuildDaemons
+from src.code_executor.restore_cache import RestoreCache
+from src.code_executor.source_build_cache import SourceBuildCache
 from src.code_executor.pre_migration_assessor import PreMigrationAssessor
 from src.code_executor.upgrade_assistant import UpgradeAssistant
 
 setup_logging("code_executor")
-app = App(max_grpc_message_length=128 * 1024 * 1024)
+# NOTE: more grpc threads than workers + queued jobs, so that the admission
+# control of the ExecutorScheduler limits the concurrency, not the thread pool
+GRPC_MAX_WORKERS = 64
+MAX_GRPC_MESSAGE_LENGTH = 128 * 1024 * 1024
+app = App(
+    thread_pool=futures.ThreadPoolExecutor(max_workers=GRPC_MAX_WORKERS),
+    options=[
+        ("grpc.max_send_message_length", MAX_GRPC_MESSAGE_LENGTH),
+        ("grpc.max_receive_message_length", MAX_GRPC_MESSAGE_LENGTH),
+    ],
+)
+# fields with ProjectDeltas -> fields of the projects reconstructed from them
+DELTA_FIELDS = {
+    "source_project_delta": "source_project",
+    "test_project_delta": "test_project",
+    "source_project_deltas": "source_projects",
+    "test_project_deltas": "test_projects",
+}
+# response if the base project of the deltas is not cached, see _resolve_deltas
+MISSING_BASE_RESPONSE = json.dumps({"missing_base": True})
+# response if the job was rejected by the ExecutorScheduler; the client retries later
+BUSY_RESPONSE = json.dumps({"busy": True})
+
 
-semaphore = threading.Semaphore(1)
+def get_scheduler() -> ExecutorScheduler:
+    if ExecutorScheduler.default is None:
+        with open("config.yaml", "r") as f:
+            ExecutorScheduler.configure(yaml.safe_load(f))
+    return ExecutorScheduler.default
 
 
 @app.method(name="execute_tests")
 @timed()
 def execute_tests(request: InvokeMethodRequest) -> InvokeMethodResponse:
     extract_trace_info(request)
-    req_json = json.loads(request.text())
-    source_project = CodeProject.model_validate(req_json["source_project"])
-    test_project = CodeProject.model_validate(req_json["test_project"])
+    req_json = decode_request(
+        request.data,
+        ["source_project", "test_project", "base_project"],
+        ["source_project_delta", "test_project_delta"],
+    )
+    try:
+        if not _resolve_deltas(req_json):
+            return InvokeMethodResponse(MISSING_BASE_RESPONSE)
+    except ValueError as e:
+        msg = f"Invalid project delta: {e}"
+        logging.error(msg)
+        return InvokeMethodResponse(_error_response(msg))
+    source_project: CodeProject = req_json["source_project"]
+    test_project: CodeProject = req_json["test_project"]
     target_language = req_json["target_language"]
 
     logging.info(f"got target_language: {target_language}")
+    return InvokeMethodResponse(
+        _execute_tests(source_project, test_project, target_language)
+    )
+
+
+@app.method(name="execute_tests_batch")
+@timed()
+def execute_tests_batch(request: InvokeMethodRequest) -> InvokeMethodResponse:
+    """
+    execute_tests for many candidates in one request: either one source_project
+    and a list of test_projects or a list of source_projects and one
+    test_project. The shared project is sent and parsed once, the candidates
+    run concurrently (up to the workers of their language).
+    With accept (max_failed_tests, min_passed_tests) no further candidates are
+    started once one result is acceptable.
+    Returns {"results": [...]}: the execute_tests response per candidate, in
+    order ({"busy": true} if rejected by the scheduler); null for candidates
+    that were not started.
+    The candidates can be sent as deltas against a base project, see
+    _resolve_deltas.
+    """
+    extract_trace_info(request)
+    req_json = decode_request(
+        request.data,
+        [
+            "source_project",
+            "source_projects",
+            "test_project",
+            "test_projects",
+            "base_project",
+        ],
+        list(DELTA_FIELDS),
+    )
+    n_deltas = sum(
+        len(req_json.get(key, [])) for key in DELTA_FIELDS if key.endswith("s")
+    )
+    try:
+        if not _resolve_deltas(req_json):
+            return InvokeMethodResponse(MISSING_BASE_RESPONSE)
+    except ValueError as e:
+        msg = f"Invalid project delta: {e}"
+        logging.error(msg)
+        results = [json.loads(_error_response(msg))] * n_deltas
+        return InvokeMethodResponse(json.dumps({"results": results}))
+    target_language = req_json["target_language"]
+    accept = req_json.get("accept")
+    if "source_projects" in req_json:
+        pairs = [
+            (source_project, req_json["test_project"])
+            for source_project in req_json["source_projects"]
+        ]
+    else:
+        pairs = [
+            (req_json["source_project"], test_project)
+            for test_project in req_json["test_projects"]
+        ]
+    logging.info(f"got target_language: {target_language}, {len(pairs)} candidates")
+    if not pairs:
+        return InvokeMethodResponse(json.dumps({"results": []}))
+
+    def execute(source_project: CodeProject, test_project: CodeProject) -> dict:
+        # the shared project is formatted in place -> one copy per candidate
+        return json.loads(
+            _execute_tests(
+                source_project.model_copy(deep=True),
+                test_project.model_copy(deep=True),
+                target_language,
+            )
+        )
+
+    kind = pairs[0][0].source_language
+    n_workers = max(1, get_scheduler().workers.get(kind, 1))
+    results: list[dict | None] = [None] * len(pairs)
+    with futures.ThreadPoolExecutor(max_workers=n_workers) as executor:
+        # copy_context: the candidates log with the trace info of the request
+        pending = {
+            executor.submit(contextvars.copy_context().run, execute, *pair): i
+            for i, pair in enumerate(pairs)
+        }
+        while pending:
+            done, _ = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+            if accept is not None and any(
+                result is not None and _is_acceptable(result, accept)
+                for result in results
+            ):
+                for future in pending:
+                    future.cancel()
+                # the running candidates still finish
+                pending = {f: i for f, i in pending.items() if not f.cancelled()}
+    logging.info(f"GSMETRIC:batch_skipped_candidates={results.count(None)}")
+    return InvokeMethodResponse(json.dumps({"results": results}))
+
+
+def _resolve_deltas(req_json: dict) -> bool:
+    """
+    Reconstruct the projects sent as ProjectDeltas (see DELTA_FIELDS) from the
+    base of the request: base_project, or the base with base_hash cached by an
+    earlier request (see BaseProjectCache). Returns False if the base is not
+    cached; the client sends the request again with base_project.
+    Raises ValueError if a delta cannot be applied to the base.
+    """
+    delta_keys = [key for key in DELTA_FIELDS if key in req_json]
+    if not delta_keys:
+        return True
+    base_project: CodeProject = req_json.pop("base_project", None)
+    cache = BaseProjectCache.default
+    if base_project is not None:
+        if cache is not None:
+            base_hash = cache.put(base_project)
+        else:
+            base_hash = base_project.content_hash(normalize=False)
+    else:
+        base_hash = req_json["base_hash"]
+        base_project = cache.get(base_hash) if cache is not None else None
+        if base_project is None:
+            logging.warning(f"Base project {base_hash} of the deltas is not cached")
+            return False
+
+    for key in delta_keys:
+        deltas = req_json.pop(key)
+        if isinstance(deltas, list):
+            # execute_tests_batch copies the projects of each candidate
+            req_json[DELTA_FIELDS[key]] = [
+                apply_delta(base_project, delta, base_hash) for delta in deltas
+            ]
+        else:
+            # the project is formatted in place, but shares files with the base
+            req_json[DELTA_FIELDS[key]] = apply_delta(
+                base_project, deltas, base_hash
+            ).model_copy(deep=True)
+    return True
+
+
+def _is_acceptable(result: dict, accept: dict) -> bool:
+    # same as AcceptanceCriterion of the goat_service
+    return (
+        # busy results have no error
+        result.get("error") == ""
+        and 0 <= int(result["failed_tests"]) <= accept["max_failed_tests"]
+        and int(result["passed_tests"]) >= accept["min_passed_tests"]
+    )
+
+
+def _error_response(msg: str) -> str:
+    """
+    execute_tests response of a failed execution.
+    """
+    return json.dumps(
+        {
+            "success": "false",
+            "error": msg,
+            "total_tests": -1,
+            "passed_tests": -1,
+            "failed_tests": 100,
+            "test_output": "",
+            "runtime": 1,
+        }
+    )
+
+
+def _execute_tests(
+    source_project: CodeProject, test_project: CodeProject, target_language: str
+) -> str:
+    """
+    Execute test_project against source_project; returns the json response.
+    """
+    cache_key = None
+    if ExecutionCache.default is not None:
+        cache_key = ExecutionCache.make_key(
+            source_project, test_project, target_language
+        )
+        cached_response = ExecutionCache.default.get(cache_key)
+        if cached_response is not None:
+            logging.info("Returning cached execution result")
+            return cached_response
+
     try:
         save_dir = generate_save_dir("code_executor")
         logging.info(f"source_language: {source_project.source_language}")
@@ -63,22 +290,19 @@ def execute_tests(request: InvokeMethodRequest) -> InvokeMethodResponse:
         else:
             msg = f"unknown combination {source_project.source_language=} + {target_language=}"
             logging.error(msg)
-            return InvokeMethodResponse(
-                json.dumps(
-                    {
-                        "success": "false",
-                        "error": msg,
-                        "total_tests": -1,
-                        "passed_tests": -1,
-                        "failed_tests": 100,
-                        "test_output": "",
-                        "runtime": 1,
-                    }
-                )
-            )
+            return _error_response(msg)
 
-        ce = CodeExecutorFactory.create(config, source_project, test_project, save_dir)
-        result: ExecutionResult = ce.execute()
+        # fail before waiting for a worker
+        CodeExecutorFactory.check_config(config)
+        with get_scheduler().job(source_project.source_language, save_dir) as job:
+            ce = CodeExecutorFactory.create(
+                config, source_project, test_project, save_dir, job.env
+            )
+            result: ExecutionResult = ce.execute()
+    except ExecutorBusyError as e:
+        # not a result of the candidate, must not be scored as a failure
+        logging.warning(f"Rejected execution: {e}")
+        return BUSY_RESPONSE
     except Exception as e:
         if os.path.exists(save_dir) and len(os.listdir(save_dir)) != 0:
             # add error message as file
@@ -87,85 +311,60 @@ def execute_tests(request: InvokeMethodRequest) -> InvokeMethodResponse:
 
         # return success false and the error message
         logging.error(f"success: false; Error: {str(e)}")
-        return InvokeMethodResponse(
-            json.dumps(
-                {
-                    "success": "false",
-                    "error": str(e),
-                    "total_tests": -1,
-                    "passed_tests": -1,
-                    "failed_tests": 100,
-                    "test_output": "",
-                    "runtime": 1,
-                }
-            )
-        )
+        return _error_response(str(e))
     finally:
         # cleanup the generated files
         shutil.rmtree(save_dir, ignore_errors=True)
 
-    if result.failed_tests == 0:
-        logging.info("success: true")
-        return InvokeMethodResponse(
-            json.dumps(
-                {
-                    "success": "true",
-                    "error": "",
-                    "total_tests": result.total_tests,
-                    "passed_tests": result.passed_tests,
-                    "failed_tests": result.failed_tests,
-                    "test_output": result.test_output,
-                    "runtime": result.runtime,
-                }
-            )
-        )
-    else:
-        logging.info("success: false")
-        return InvokeMethodResponse(
-            json.dumps(
-                {
-                    "success": "false",
-                    "error": "",
-                    "total_tests": result.total_tests,
-                    "passed_tests": result.passed_tests,
-                    "failed_tests": result.failed_tests,
-                    "test_output": result.test_output,
-                    "runtime": result.runtime,
-                }
-            )
-        )
+    success = result.failed_tests == 0
+    logging.info(f"success: {str(success).lower()}")
+    response = json.dumps(
+        {
+            "success": str(success).lower(),
+            "error": "",
+            "total_tests": result.total_tests,
+            "passed_tests": result.passed_tests,
+            "failed_tests": result.failed_tests,
+            "test_output": result.test_output,
+            "runtime": result.runtime,
+        }
+    )
+    # NOTE: only completed test runs are cached; errors can be transient
+    if cache_key is not None:
+        ExecutionCache.default.set(cache_key, response)
+    return response
 
 
 @app.method(name="call_upgrade_assistant")
 @timed()
 def call_upgrade_assistant(request: InvokeMethodRequest) -> InvokeMethodResponse:
-    with semaphore:
-        extract_trace_info(request)
-        req_json = json.loads(request.text())
-        source_project = CodeProject.model_validate(req_json["source_project"])
-        target_language = req_json["target_language"]
-        logging.info(f"got target_language: {target_language}")
-
-        try:
-            save_dir = generate_save_dir("upgrade_assistant")
-            ua = UpgradeAssistant(source_project, save_dir)
+    extract_trace_info(request)
+    req_json = decode_request(request.data, ["source_project"])
+    source_project: CodeProject = req_json["source_project"]
+    target_language = req_json["target_language"]
+    logging.info(f"got target_language: {target_language}")
+
+    try:
+        save_dir = generate_save_dir("upgrade_assistant")
+        with get_scheduler().job("upgrade_assistant", save_dir) as job:
+            ua = UpgradeAssistant(source_project, save_dir, job.env)
             upgraded_project = ua.upgrade()
-            return InvokeMethodResponse(
-                json.dumps({"upgraded_project": upgraded_project.model_dump()})
-            )
-        except Exception as e:
-            return InvokeMethodResponse(json.dumps({"error": str(e)}))
-        finally:
-            # cleanup the generated files
-            shutil.rmtree(save_dir, ignore_errors=True)
+        return InvokeMethodResponse(
+            json.dumps({"upgraded_project": upgraded_project.model_dump()})
+        )
+    except Exception as e:
+        return InvokeMethodResponse(json.dumps({"error": str(e)}))
+    finally:
+        # cleanup the generated files
+        shutil.rmtree(save_dir, ignore_errors=True)
 
 
 @app.method(name="call_assess")
 @timed()
 def call_assess(request: InvokeMethodRequest) -> InvokeMethodResponse:
     extract_trace_info(request)
-    req_json = json.loads(request.text())
-    source_project = CodeProject.model_validate(req_json["source_project"])
+    req_json = decode_request(request.data, ["source_project"])
+    source_project: CodeProject = req_json["source_project"]
     target_language = req_json["target_language"]
     logging.info(f"got target_language: {target_language}")
 
@@ -192,4 +391,32 @@ if __name__ == "__main__":
     with open("config.yaml", "r") as f:
         config = yaml.safe_load(f)
     backup_base_dir = config["backup_base_dir"]
+    ExecutorScheduler.configure(config)
+    DotnetBuildServer.configure(config)
+    JavaBuildDaemons.configure(config)
+    RestoreCache.configure(
+        config["restore_cache_dir"],
+        config["restore_cache_ttl_hours"],
+        config["restore_cache_max_size_mb"],
+    )
+    SourceBuildCache.configure(
+        config["source_build_cache_dir"],
+        config["source_build_cache_ttl_hours"],
+        config["source_build_cache_max_size_mb"],
+    )
+    IncrementalWorkspaces.configure(
+        config["incremental_workspace_dir"],
+        config["incremental_workspace_max_per_project"],
+        config["incremental_workspace_max"],
+    )
+    BlobStore.configure(
+        config["blob_store_dir"],
+        config["blob_store_max_size_mb"],
+    )
+    ExecutionCache.configure(
+        config["execution_cache_dir"],
+        config["execution_cache_ttl_hours"],
+        config["execution_cache_max_size_mb"],
+    )
+    BaseProjectCache.configure(config["base_project_cache_max_size_mb"])
     app.run(5001)
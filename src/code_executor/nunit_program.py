@@ -2,9 +2,19 @@ import logging
 import os
 import subprocess
 import xml.etree.ElementTree as ET
+from contextlib import ExitStack
 
 from gs_common.CodeProject import CodeProject
+from gs_common.file_ops import BlobStore
 
+from src.code_executor.build_server import DotnetBuildServer
+from src.code_executor.incremental_workspaces import (
+    IncrementalWorkspaces,
+    Workspace,
+    sync_dir,
+)
+from src.code_executor.restore_cache import RestoreCache
+from src.code_executor.source_build_cache import SourceBuildCache
 from src.code_executor.testing_framework_program import (
     TestingFrameworkProgram,
 )
@@ -16,9 +26,11 @@ class NUnitProgram(TestingFrameworkProgram):
         source_project: CodeProject,
         test_project: CodeProject,
         exec_dir: str,
+        env: dict[str, str] | None = None,
     ):
         self.source_project = source_project
         self.exec_dir = exec_dir
+        self.env = env
 
         if self.source_project.source_language == "dotnetframework":
             self.is_dotnetframework = True
@@ -40,6 +52,23 @@ class NUnitProgram(TestingFrameworkProgram):
             ".csproj", ""
         )
 
+        self._set_project_dirs()
+
+        # True if the test project references a build from the SourceBuildCache
+        self.source_is_cached = False
+        # workspace of the IncrementalWorkspaces the projects are built in, if any
+        self.workspace: Workspace | None = None
+
+        self._handle_dotnet_versions()
+        self._set_test_project_placeholders(test_project)
+
+        test_project.save_to_dir(self.test_project_dir, BlobStore.default)
+        self.source_project.save_to_dir(self.source_project_dir, BlobStore.default)
+
+        if IncrementalWorkspaces.default is not None:
+            self._use_workspace(test_project)
+
+    def _set_project_dirs(self):
         self.source_project_dir = os.path.join(self.exec_dir, self.source_project_name)
         # NOTE: test project must be -GSTests (to work with SetInternalsVisibleToTestProject)
         self.test_project_dir = os.path.join(
@@ -50,11 +79,38 @@ class NUnitProgram(TestingFrameworkProgram):
             self.source_project_dir, os.path.dirname(self.source_csproj_filename)
         )
 
-        self._handle_dotnet_versions()
-        self._set_test_project_placeholders(test_project)
-
-        test_project.save_to_dir(self.test_project_dir)
-        self.source_project.save_to_dir(self.source_project_dir)
+    def _use_workspace(self, test_project: CodeProject):
+        """
+        Build in a workspace of the IncrementalWorkspaces instead of exec_dir:
+        sync the saved projects into it, so that the build outputs of the previous
+        candidate of this project are reused for the unchanged files.
+        """
+        key = IncrementalWorkspaces.make_key(
+            self.source_project.source_language,
+            self.source_project.display_name,
+            test_project.display_name,
+            self.source_csproj_filename,
+            self.test_csproj_filename,
+        )
+        workspace = IncrementalWorkspaces.default.acquire(key)
+        if workspace is None:
+            logging.info("No incremental workspace available, building in exec_dir")
+            return
+        try:
+            n_changed = 0
+            for project_dir in [self.source_project_dir, self.test_project_dir]:
+                n_changed += sync_dir(
+                    project_dir,
+                    os.path.join(workspace.path, os.path.basename(project_dir)),
+                )
+        except BaseException:
+            workspace.clean = False
+            IncrementalWorkspaces.default.release(workspace)
+            raise
+        logging.info(f"GSMETRIC:incremental_workspace_changed_files={n_changed}")
+        self.workspace = workspace
+        self.exec_dir = workspace.path
+        self._set_project_dirs()
 
     def _get_csproj_filename(self, source_project: CodeProject) -> str:
         # search in files, not reference files
@@ -150,8 +206,8 @@ class NUnitProgram(TestingFrameworkProgram):
                                 f"<TargetFramework>{self.dotnet_version}</TargetFramework>"
                             )
                     if "<ProjectReference Include=" in line:
-                        lines[line_idx] = (
-                            f'<ProjectReference Include="../{self.source_project_name}/{self.source_csproj_filename}" />'
+                        lines[line_idx] = self._project_reference(
+                            f"../{self.source_project_name}"
                         )
 
                 # replace the source code with the modified lines
@@ -160,46 +216,140 @@ class NUnitProgram(TestingFrameworkProgram):
         else:
             raise Exception("No csproj file found in test project")
 
+    def _project_reference(self, source_project_dir: str) -> str:
+        return f'<ProjectReference Include="{source_project_dir}/{self.source_csproj_filename}" />'
+
     def compile(self):
-        # restore packages
-        if self.old_csproj_style:
-            packages_config_path = self._get_packages_config_path()
-            if packages_config_path:
-                # TODO: dont do msbuild restore after nuget restore
-                #  + remove nuget.targets from csproj
-                # restore packages via nuget before building
-                logging.info("Restoring packages with nuget")
+        # a workspace keeps the build of the source, no need for the cache
+        if SourceBuildCache.default is not None and self.workspace is None:
+            self._compile_against_cached_source()
+            return
+
+        with ExitStack() as stack:
+            # restore packages
+            if self.old_csproj_style:
+                packages_config_path = self._get_packages_config_path()
+                if packages_config_path and RestoreCache.default is not None:
+                    # packages of the same packages.config are restored once
+                    with open(
+                        os.path.join(self.dotnet_compile_dir, packages_config_path)
+                    ) as f:
+                        packages_config = f.read()
+                    stack.enter_context(
+                        RestoreCache.default.linked(
+                            "nuget",
+                            packages_config,
+                            lambda packages_dir: self._nuget_restore(
+                                packages_config_path, packages_dir
+                            ),
+                            os.path.join(self.dotnet_compile_dir, "packages"),
+                        )
+                    )
+                elif packages_config_path:
+                    self._nuget_restore(packages_config_path, "packages")
+                command = ["msbuild", "/t:restore", "/t:build"]
+            else:
+                command = ["dotnet", "build"]
+            self._run_command(command, self.test_project_dir)
+
+    def _compile_against_cached_source(self):
+        """
+        Build the source project once per content (SourceBuildCache) and only
+        build the test project here, against the cached build.
+        """
+
+        def build_source(entry_dir: str):
+            source_project_dir = os.path.join(entry_dir, self.source_project_name)
+            self.source_project.save_to_dir(source_project_dir, BlobStore.default)
+            compile_dir = os.path.join(
+                source_project_dir, os.path.dirname(self.source_csproj_filename)
+            )
+            if self.old_csproj_style:
+                packages_config_path = self._get_packages_config_path(compile_dir)
+                if packages_config_path:
+                    self._nuget_restore(packages_config_path, "packages", compile_dir)
+                command = ["msbuild", "/t:restore", "/t:build"]
+            else:
+                command = ["dotnet", "build"]
+            self._run_command(command, compile_dir)
+
+        with SourceBuildCache.default.built(
+            self.source_project.content_hash(normalize=False), build_source
+        ) as entry_dir:
+            # reference the cached build instead of the source in exec_dir
+            test_csproj_path = os.path.join(
+                self.test_project_dir, self.test_csproj_filename
+            )
+            with open(test_csproj_path, "r") as f:
+                test_csproj = f.read()
+            test_csproj = test_csproj.replace(
+                self._project_reference(f"../{self.source_project_name}"),
+                self._project_reference(
+                    os.path.join(entry_dir, self.source_project_name)
+                ),
+            )
+            # replace, the saved csproj can be a hardlink into the BlobStore
+            os.remove(test_csproj_path)
+            with open(test_csproj_path, "w") as f:
+                f.write(test_csproj)
+
+            if self.old_csproj_style:
                 command = [
-                    "nuget",
-                    "restore",
-                    packages_config_path,
-                    "-PackagesDirectory",
-                    "packages",
+                    "msbuild",
+                    "/t:restore",
+                    "/t:build",
+                    "/p:BuildProjectReferences=false",
                 ]
-                self._run_command(command, self.dotnet_compile_dir)
-            command = ["msbuild", "/t:restore", "/t:build"]
-        else:
-            command = ["dotnet", "build"]
-        self._run_command(command, self.test_project_dir)
+            else:
+                command = ["dotnet", "build", "-p:BuildProjectReferences=false"]
+            self._run_command(command, self.test_project_dir)
+        self.source_is_cached = True
+
+    def _nuget_restore(
+        self, packages_config_path: str, packages_dir: str, compile_dir: str = None
+    ):
+        # TODO: dont do msbuild restore after nuget restore
+        #  + remove nuget.targets from csproj
+        # restore packages via nuget before building
+        logging.info("Restoring packages with nuget")
+        command = [
+            "nuget",
+            "restore",
+            packages_config_path,
+            "-PackagesDirectory",
+            packages_dir,
+        ]
+        self._run_command(command, compile_dir or self.dotnet_compile_dir)
 
-    def _get_packages_config_path(self):
+    def _get_packages_config_path(self, compile_dir: str = None):
         # NOTE: our projects have only one csproj for now
         # NOTE: assumption: packages.config is in the same directory as csproj
         # NOTE: this is mostly true for the github projects
         # return relative path to packages.config file
-        for file in os.listdir(self.dotnet_compile_dir):
+        for file in os.listdir(compile_dir or self.dotnet_compile_dir):
             if file.endswith("packages.config"):
                 return file
         return None
 
     def _run_command(self, command, cwd):
-        self.process_result = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            timeout=60,
-            cwd=cwd,
-        )
+        if self.workspace is not None:
+            # reset once the process returned; a killed build can leave broken outputs
+            self.workspace.clean = False
+        if command[0] == "dotnet" and DotnetBuildServer.default is not None:
+            self.process_result = DotnetBuildServer.default.run(
+                command, cwd=cwd, env=self.env, timeout=60
+            )
+        else:
+            self.process_result = subprocess.run(
+                command,
+                capture_output=True,
+                text=True,
+                timeout=60,
+                cwd=cwd,
+                env=self.env,
+            )
+        if self.workspace is not None:
+            self.workspace.clean = True
         self._check_subprocess_result(command, self.process_result)
 
     def run(self):
@@ -224,9 +374,17 @@ class NUnitProgram(TestingFrameworkProgram):
                 "--logger",
                 "nunit;LogFileName=test_results.xml",
             ]
+            if self.source_is_cached:
+                # the test project is built; a build would also build the cached source
+                command.append("--no-build")
         self._run_command(command, self.test_project_dir)
         return self._get_runtime()
 
+    def close(self):
+        if self.workspace is not None:
+            IncrementalWorkspaces.default.release(self.workspace)
+            self.workspace = None
+
     def check_results(self):
         # parse the test_results.xml file
         # we only need this line:
@@ -8,6 +8,7 @@ import zipfile
 
 import requests
 from gs_common.CodeProject import CodeProject
+from gs_common.file_ops import BlobStore
 
 """
 ## Compatibility Checks
@@ -218,7 +219,7 @@ class PreMigrationAssessor:
         self.source_project = source_project
         self.save_dir = save_dir
         os.makedirs(self.save_dir, exist_ok=True)
-        self.source_project.save_to_dir(self.save_dir)
+        self.source_project.save_to_dir(self.save_dir, BlobStore.default)
 
         self.csproj_path, self.csproj_content = self._find_csproj()
         self.full_csproj_path = os.path.join(self.save_dir, self.csproj_path)
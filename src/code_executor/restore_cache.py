@@ -0,0 +1,225 @@
+import hashlib
+import logging
+import os
+import shutil
+import stat
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+
+from gs_common.CodeProject import normalize_source_code
+
+
+def _set_writable(path: str, writable: bool):
+    """
+    chmod path and everything below it to read-write or read-only.
+    """
+    write_bits = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+    for root, dirs, files in os.walk(path):
+        for name in [root] + [os.path.join(root, file) for file in files]:
+            mode = os.stat(name).st_mode
+            if writable:
+                os.chmod(name, mode | stat.S_IWUSR)
+            else:
+                os.chmod(name, mode & ~write_bits)
+
+
+def _dir_size(path: str) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                size += os.lstat(os.path.join(root, file)).st_size
+            except FileNotFoundError:
+                pass
+    return size
+
+
+class RestoreCache:
+    """
+    Restored dependencies (e.g. the packages of a packages.config) shared by all
+    candidates with the same dependency file, instead of a restore into every
+    exec_dir. Each entry is restored once into cache_dir/kind/key, made read-only
+    and linked into the exec_dir of the builds.
+
+    Population is safe across threads (one restore per key, the others wait) and
+    processes (restore into a temp dir, then an atomic rename).
+    Entries not used for ttl_seconds are removed; if the cache grows beyond
+    max_size_bytes the least recently used entries are removed. Entries in use by
+    a build of this process are never removed.
+    """
+
+    # cache used by the testing framework programs, None = disabled (see configure)
+    default: "RestoreCache" = None
+
+    def __init__(self, cache_dir: str, ttl_seconds: float, max_size_bytes: int):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.ttl_seconds = ttl_seconds
+        self.max_size_bytes = max_size_bytes
+        self._lock = threading.Lock()
+        self._key_locks: dict[str, threading.Lock] = {}
+        self._n_users: dict[str, int] = {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def configure(cache_dir: str | None, ttl_hours: float, max_size_mb: float):
+        """
+        Set RestoreCache.default to a cache in cache_dir.
+        cache_dir None disables the cache.
+        """
+        if not cache_dir:
+            RestoreCache.default = None
+            return
+        logging.info(f"Using restore cache in {cache_dir}")
+        RestoreCache.default = RestoreCache(
+            cache_dir,
+            ttl_seconds=ttl_hours * 3600,
+            max_size_bytes=int(max_size_mb * 1024 * 1024),
+        )
+
+    @staticmethod
+    def make_key(dependency_file: str) -> str:
+        """
+        Key of the content of a dependency file (e.g. packages.config);
+        whitespace-only differences give the same key.
+        """
+        return hashlib.sha256(
+            normalize_source_code(dependency_file).encode()
+        ).hexdigest()
+
+    def _entry_dir(self, kind: str, dependency_file: str) -> str:
+        return os.path.join(
+            self.cache_dir, kind, RestoreCache.make_key(dependency_file)
+        )
+
+    def _key_lock(self, entry_dir: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(entry_dir, threading.Lock())
+
+    def _is_populated(self, entry_dir: str) -> bool:
+        return os.path.isdir(entry_dir)
+
+    def _populate(self, entry_dir: str, restore: Callable[[str], None]):
+        tmp_dir = f"{entry_dir}.tmp-{uuid.uuid4().hex}"
+        try:
+            restore(tmp_dir)
+            os.makedirs(tmp_dir, exist_ok=True)
+            _set_writable(tmp_dir, False)
+            try:
+                os.rename(tmp_dir, entry_dir)
+            except OSError:
+                # another process populated the entry in the meantime
+                if not os.path.isdir(entry_dir):
+                    raise
+        finally:
+            if os.path.exists(tmp_dir):
+                self._remove(tmp_dir)
+
+    @contextmanager
+    def restored(
+        self, kind: str, dependency_file: str, restore: Callable[[str], None]
+    ) -> Iterator[str]:
+        """
+        Yield the dir with the dependencies of dependency_file. On a miss
+        restore(dir) is called to restore them into the (new, empty) dir.
+        The entry is not evicted until the context exits.
+        """
+        entry_dir = self._entry_dir(kind, dependency_file)
+        with self._key_lock(entry_dir):
+            with self._lock:
+                self._n_users[entry_dir] = self._n_users.get(entry_dir, 0) + 1
+            try:
+                hit = self._is_populated(entry_dir)
+                logging.info(f"GSMETRIC:restore_cache_hit_{kind}={hit}")
+                if hit:
+                    # mtime of the entry dir: time of the last use
+                    os.utime(entry_dir)
+                else:
+                    os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+                    t0 = time.time()
+                    self._populate(entry_dir, restore)
+                    logging.info(
+                        f"GSMETRIC:restore_cache_populate_time_{kind}={time.time() - t0:.2f}"
+                    )
+            except BaseException:
+                self._release(entry_dir)
+                raise
+        if not hit:
+            self.evict()
+        try:
+            yield entry_dir
+        finally:
+            self._release(entry_dir)
+
+    @contextmanager
+    def linked(
+        self,
+        kind: str,
+        dependency_file: str,
+        restore: Callable[[str], None],
+        target_dir: str,
+    ) -> Iterator[str]:
+        """
+        restored(), with the entry linked to target_dir (e.g. exec_dir/packages).
+        Copied if links are not supported.
+        """
+        with self.restored(kind, dependency_file, restore) as entry_dir:
+            # left by an earlier build in the same dir (e.g. a reused workspace)
+            if os.path.islink(target_dir):
+                os.unlink(target_dir)
+            elif os.path.isdir(target_dir):
+                self._remove(target_dir)
+            try:
+                os.symlink(entry_dir, target_dir, target_is_directory=True)
+            except OSError as e:
+                logging.warning(f"Cannot link restore cache entry, copying it: {e}")
+                shutil.copytree(entry_dir, target_dir)
+                _set_writable(target_dir, True)
+            yield entry_dir
+
+    def _release(self, entry_dir: str):
+        with self._lock:
+            self._n_users[entry_dir] -= 1
+            if self._n_users[entry_dir] == 0:
+                del self._n_users[entry_dir]
+
+    def evict(self):
+        now = time.time()
+        entries = []
+        for kind in os.scandir(self.cache_dir):
+            if not kind.is_dir():
+                continue
+            for entry in os.scandir(kind.path):
+                if not entry.is_dir() or ".tmp-" in entry.name:
+                    continue
+                try:
+                    last_used = entry.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                entries.append((last_used, entry.path))
+
+        # least recently used first
+        entries.sort()
+        sizes = {path: _dir_size(path) for _, path in entries}
+        total_size = sum(sizes.values())
+        for last_used, path in entries:
+            expired = now - last_used > self.ttl_seconds
+            if not expired and total_size <= self.max_size_bytes:
+                continue
+            with self._key_lock(path):
+                with self._lock:
+                    if path in self._n_users:
+                        continue
+                logging.info(f"Evicting restore cache entry {path}")
+                self._remove(path)
+            total_size -= sizes[path]
+        logging.info(f"GSMETRIC:restore_cache_size_mb={total_size / 1024 / 1024:.0f}")
+
+    def _remove(self, path: str):
+        try:
+            _set_writable(path, True)
+        except OSError:
+            pass
+        shutil.rmtree(path, ignore_errors=True)
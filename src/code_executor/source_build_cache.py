@@ -0,0 +1,83 @@
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+
+from src.code_executor.restore_cache import RestoreCache
+
+# written into an entry once its build succeeded
+COMPLETE_MARKER = ".gs-build-complete"
+
+
+class SourceBuildCache(RestoreCache):
+    """
+    Source projects built once per content and shared by the test builds of all
+    test projects for that source (e.g. the candidates of the UT picker), which
+    reference the cached build instead of building the source again.
+
+    Unlike RestoreCache the entries are built in place and stay writable, since
+    the build outputs (obj/) contain the absolute project path and a no-op restore
+    of a referencing project still touches them. So the test builds against one
+    entry are serialized (one lock per entry, held while the entry is in use).
+    Locking is only across the threads of one process, so every executor needs
+    its own cache_dir.
+    """
+
+    # cache used by NUnitProgram, None = disabled (see configure)
+    default: "SourceBuildCache" = None
+
+    @staticmethod
+    def configure(cache_dir: str | None, ttl_hours: float, max_size_mb: float):
+        """
+        Set SourceBuildCache.default to a cache in cache_dir.
+        cache_dir None disables the cache.
+        """
+        if not cache_dir:
+            SourceBuildCache.default = None
+            return
+        logging.info(f"Using source build cache in {cache_dir}")
+        SourceBuildCache.default = SourceBuildCache(
+            cache_dir,
+            ttl_seconds=ttl_hours * 3600,
+            max_size_bytes=int(max_size_mb * 1024 * 1024),
+        )
+
+    def __init__(self, cache_dir: str, ttl_seconds: float, max_size_bytes: int):
+        super().__init__(cache_dir, ttl_seconds, max_size_bytes)
+        self._use_locks: dict[str, threading.Lock] = {}
+
+    def _use_lock(self, entry_dir: str) -> threading.Lock:
+        with self._lock:
+            return self._use_locks.setdefault(entry_dir, threading.Lock())
+
+    def _is_populated(self, entry_dir: str) -> bool:
+        return os.path.isfile(os.path.join(entry_dir, COMPLETE_MARKER))
+
+    def _populate(self, entry_dir: str, build: Callable[[str], None]):
+        # leftover of a failed or interrupted build
+        self._remove(entry_dir)
+        try:
+            build(entry_dir)
+            with open(os.path.join(entry_dir, COMPLETE_MARKER), "w"):
+                pass
+        except BaseException:
+            self._remove(entry_dir)
+            raise
+
+    @contextmanager
+    def built(self, source_key: str, build: Callable[[str], None]) -> Iterator[str]:
+        """
+        Yield the dir with the build of the source project with source_key.
+        On a miss build(dir) is called to save and build the source in dir.
+        Only one caller at a time uses an entry, until the context exits.
+        """
+        # not the key lock of RestoreCache, restored() takes that one itself
+        t0 = time.time()
+        with self._use_lock(self._entry_dir("source", source_key)):
+            logging.info(
+                f"GSMETRIC:source_build_cache_wait_time={time.time() - t0:.2f}"
+            )
+            with self.restored("source", source_key, build) as entry_dir:
+                yield entry_dir
@@ -9,6 +9,7 @@ class TestingFrameworkProgram(ABC):
         test_project: CodeProject,
         source_project: CodeProject,
         exec_dir: str,
+        env: dict[str, str] | None = None,
     ):
         pass
 
@@ -23,3 +24,9 @@ class TestingFrameworkProgram(ABC):
     @abstractmethod
     def check_results(self) -> tuple[int, str]:
         pass
+
+    def close(self):
+        """
+        Release what the program holds beyond its exec_dir (e.g. a build workspace).
+        """
+        pass
@@ -3,14 +3,24 @@ import os
 import subprocess
 
 from gs_common.CodeProject import CodeProject
+from gs_common.file_ops import BlobStore
 
 
 class UpgradeAssistant:
-    def __init__(self, source_project: CodeProject, save_dir: str):
+    def __init__(
+        self,
+        source_project: CodeProject,
+        save_dir: str,
+        env: dict[str, str] | None = None,
+    ):
         self.source_project = source_project
         self.save_dir = save_dir
+        self.env = env
         os.makedirs(self.save_dir, exist_ok=True)
-        self.source_project.save_to_dir(self.save_dir)
+        # no hardlinks, the upgrade modifies the files in place
+        self.source_project.save_to_dir(
+            self.save_dir, BlobStore.default, hardlink=False
+        )
 
     def upgrade(self) -> CodeProject:
         # use cli upgrade assistant tool via subprocess
@@ -55,7 +65,12 @@ class UpgradeAssistant:
             csproj_name,
         ]
         result = subprocess.run(
-            command, cwd=path_to_csproj_dir, capture_output=True, text=True, timeout=60
+            command,
+            cwd=path_to_csproj_dir,
+            capture_output=True,
+            text=True,
+            timeout=60,
+            env=self.env,
         )
         if result.returncode != 0:
             msg = f"Upgrade Assistant Error:\nSTDOUT:\n{result.stdout}\n\nSTDERR:\n{result.stderr}"
@@ -78,6 +93,7 @@ class UpgradeAssistant:
                 capture_output=True,
                 text=True,
                 timeout=10,
+                env=self.env,
             )
             if result.returncode != 0:
                 msg = f"Error adding System.Drawing.Common:\nSTDOUT:\n{result.stdout}\n\nSTDERR:\n{result.stderr}"
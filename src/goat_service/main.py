@@ -1,6 +1,5 @@
 from dapr.ext.grpc import App, InvokeMethodRequest
 from gs_common import setup_logging, timed
-from gs_common.dev import daprcache
 from gs_common.proto.tl_generator_pb2 import PlanGeneratorResponse, TLGeneratorResponse
 from gs_common.proto.tl_generator_pb2 import ReturnCode as TLGeneratorReturnCode
 from gs_common.proto.tl_picker_pb2 import TLPickerResponse
@@ -35,7 +34,6 @@ def generate_plan(request: InvokeMethodRequest) -> PlanGeneratorResponse:
 
 
 @app.method(name="generate_unittests")
-# @daprcache(3)
 @timed()
 def generate_unittests(request: InvokeMethodRequest) -> UTGeneratorResponse:
     resp = ut_gen_service.generate_unittests(request)
@@ -51,7 +49,6 @@ def pick_unittests(request: InvokeMethodRequest) -> UTPickerResponse:
 
 
 @app.method(name="generate_translations")
-# @daprcache(3)
 @timed()
 def generate_translations(request: InvokeMethodRequest) -> TLGeneratorResponse:
     resp = tl_gen_service.generate_translations(request)
@@ -66,6 +63,12 @@ def pick_translation(request: InvokeMethodRequest) -> TLPickerResponse:
     return tl_picker_service.pick_translation(request)
 
 
+@app.method(name="generate_and_pick_translation")
+@timed()
+def generate_and_pick_translation(request: InvokeMethodRequest) -> TLPickerResponse:
+    return tl_picker_service.generate_and_pick_translation(request, tl_gen_service)
+
+
 if __name__ == "__main__":
     tl_gen_service = TLGenService()
     tl_picker_service = TLPickerService()
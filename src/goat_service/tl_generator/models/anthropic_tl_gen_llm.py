@@ -9,13 +9,16 @@ from langchain_core.outputs import LLMResult
 
 from src.goat_service.tl_generator.models.tl_gen_llm import TLGenLLM, TLGenResult
 from src.goat_service.tl_generator.prompts.tl_prompter import TLPrompter
+from src.goat_service.utils.llm_fan_out import agenerate_fan_out
 
 
 class AnthropicTLGenLLM(TLGenLLM):
-    def __init__(self, model, n_generations, temperature):
+    def __init__(self, model, n_generations, temperature, max_concurrency=5):
         self.model = model
         self.n_generations = n_generations
         self.temperature = temperature
+        # NOTE: anthropic has no n parameter -> n_generations parallel calls
+        self.max_concurrency = max_concurrency
         logging.info(f"Using model: {self.model}")
         self.llm = self.create_llm(self.n_generations)
 
@@ -28,20 +31,7 @@ class AnthropicTLGenLLM(TLGenLLM):
             max_retries=0,
         )
 
-    def generate_translations(
-        self, prompter: TLPrompter
-    ) -> tuple[LLMResult, ChatPromptTemplate, str]:
-        llm_result, prompt, question = self._generate_translations(prompter)
-
-        tl_projects = prompter.process_llm_result(llm_result)
-        return TLGenResult(
-            tl_projects=tl_projects,
-            llm_result=llm_result,
-            prompt=prompt,
-            question=question,
-        )
-
-    def _generate_translations(self, prompter: TLPrompter) -> TLGenResult:
+    async def _generate_translations(self, prompter: TLPrompter) -> TLGenResult:
         prompt = prompter.get_prompt()
         question = prompter.get_question()
         chain = LLMChain(
@@ -51,8 +41,8 @@ class AnthropicTLGenLLM(TLGenLLM):
         )
 
         t0 = time.time()
-        llm_result: LLMResult = chain.generate(
-            input_list=[{"question": question}],
+        llm_result: LLMResult = await agenerate_fan_out(
+            chain, question, self.n_generations, self.max_concurrency
         )
         t_gen = time.time() - t0
         logging.info(f"Time to generate: {t_gen:.1f}s")
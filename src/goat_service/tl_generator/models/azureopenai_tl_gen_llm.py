@@ -3,6 +3,9 @@ from src.goat_service.tl_generator.models.openai_tl_gen_llm import OpenAITLGenLL
 
 
 class AzureOpenAITLGenLLM(OpenAITLGenLLM):
+    # stream_options needs a newer api_version
+    stream_usage = False
+
     def create_llm(self, n_generations):
         return AzureChatOpenAI(
             model=self.model,
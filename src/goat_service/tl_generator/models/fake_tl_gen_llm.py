@@ -8,6 +8,7 @@ from src.goat_service.tl_generator.models.tl_gen_llm import TLGenLLM, TLGenResul
 from src.goat_service.tl_generator.prompts.tl_prompter import (
     TLPrompter,
 )
+from src.goat_service.utils.llm_cache import GenerateResult
 
 
 class FakeTLGenLLM(TLGenLLM):
@@ -31,3 +32,6 @@ class FakeTLGenLLM(TLGenLLM):
 
     def generate_translations(self, prompter: TLPrompter) -> TLGenResult:
         return prompter.process_llm_result(self.debug_llm_result)
+
+    async def agenerate_llm_result(self, prompter: TLPrompter) -> GenerateResult:
+        return self.debug_llm_result, self.prompt, self.question
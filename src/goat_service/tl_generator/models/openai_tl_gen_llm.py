@@ -8,20 +8,26 @@ from langchain.chains.llm import LLMChain
 from langchain.prompts.chat import ChatPromptTemplate
 from langchain_community.callbacks.manager import get_openai_callback
 from langchain_core.messages import AIMessage, HumanMessage
-from langchain_core.outputs import Generation, LLMResult
+from langchain_core.outputs import ChatGeneration, Generation, LLMResult
 from langchain_openai import ChatOpenAI
 
-from src.goat_service.tl_generator.models.tl_gen_llm import TLGenLLM, TLGenResult
+from src.goat_service.tl_generator.models.tl_gen_llm import TLGenLLM
 from src.goat_service.tl_generator.prompts.tl_prompter import (
     TLPrompter,
 )
+from src.goat_service.utils.generation_listener import notify_generation
 
 
 class OpenAITLGenLLM(TLGenLLM):
-    def __init__(self, model, n_generations, temperature):
+    # stream_options={"include_usage": True} for the token usage of streamed calls
+    stream_usage = True
+
+    def __init__(self, model, n_generations, temperature, stream_operations=False):
         self.model = model
         self.n_generations = n_generations
         self.temperature = temperature
+        # stream the generations and apply their operations while they arrive
+        self.stream_operations = stream_operations
         logging.info(f"Using model: {self.model}")
         self.llm = self.create_llm(self.n_generations)
         # NOTE: make a new llm for async continuation to not have conflicts
@@ -37,33 +43,27 @@ class OpenAITLGenLLM(TLGenLLM):
             max_retries=0,
         )
 
-    def generate_translations(self, prompter: TLPrompter) -> TLGenResult:
-        llm_result, prompt, question = asyncio.run(
-            self._generate_translations(prompter)
-        )
-
-        tl_projects = prompter.process_llm_result(llm_result)
-        return TLGenResult(
-            tl_projects=tl_projects,
-            llm_result=llm_result,
-            prompt=prompt,
-            question=question,
-        )
-
     async def _generate_translations(
         self, prompter: TLPrompter
     ) -> tuple[LLMResult, ChatPromptTemplate, str]:
         prompt: ChatPromptTemplate = prompter.get_prompt()
         question = prompter.get_question()
-        chain = LLMChain(
-            llm=self.llm,
-            prompt=prompt,
-            return_final_only=False,
-        )
+        streamed = self.stream_operations and prompter.streaming_applier() is not None
         with get_openai_callback() as cb:
             t0 = time.time()
             logging.info("I am calling the TL LLM now...")
-            llm_result: LLMResult = chain.generate(input_list=[{"question": question}])
+            if streamed:
+                llm_result = await self._astream_generations(prompter, prompt, question)
+                cb.on_llm_end(llm_result)
+            else:
+                chain = LLMChain(
+                    llm=self.llm,
+                    prompt=prompt,
+                    return_final_only=False,
+                )
+                llm_result: LLMResult = await chain.agenerate(
+                    input_list=[{"question": question}]
+                )
             logging.info(
                 f"len(llm_result.generations): {len(llm_result.generations[0])}"
             )
@@ -86,6 +86,10 @@ class OpenAITLGenLLM(TLGenLLM):
                     )
                     cont_tasks.append(task)
                     cont_idx.append(i)
+                elif not streamed:
+                    # complete generations can be used while the others continue
+                    # (streamed ones are notified as soon as they are complete)
+                    notify_generation(gen)
 
             if cont_tasks:
                 cont_results: list[Generation] = await asyncio.gather(
@@ -106,6 +110,63 @@ class OpenAITLGenLLM(TLGenLLM):
 
         return llm_result, prompt, question
 
+    async def _astream_generations(
+        self, prompter: TLPrompter, prompt: ChatPromptTemplate, question: str
+    ) -> LLMResult:
+        """
+        Stream all n generations (choices) of one completion; the langchain
+        stream only yields the first choice. The text of each choice is fed to
+        its StreamingOperationApplier as it arrives. A generation that is
+        complete is added to the prompter (see TLPrompter.add_streamed_result)
+        and notified right away, its candidate is ready at that point.
+        Returns the same LLMResult as the LLMChain call, e.g. for the llm cache.
+        """
+        messages = prompt.format_messages(question=question)
+        kwargs = {"stream": True}
+        if self.stream_usage:
+            kwargs["stream_options"] = {"include_usage": True}
+        payload = self.llm._get_request_payload(messages, **kwargs)
+
+        texts: dict[int, list[str]] = {}
+        appliers = {}
+        generations: dict[int, ChatGeneration] = {}
+        token_usage = {}
+        response = await self.llm.async_client.create(**payload)
+        async with response:
+            async for chunk in response:
+                if chunk.usage is not None:
+                    token_usage = chunk.usage.model_dump(exclude_none=True)
+                for choice in chunk.choices:
+                    i = choice.index
+                    if i not in appliers:
+                        texts[i] = []
+                        appliers[i] = prompter.streaming_applier()
+                    if choice.delta is not None and choice.delta.content:
+                        texts[i].append(choice.delta.content)
+                        appliers[i].feed(choice.delta.content)
+                    if choice.finish_reason is None:
+                        continue
+                    text = "".join(texts[i])
+                    generations[i] = ChatGeneration(
+                        message=AIMessage(content=text),
+                        generation_info={"finish_reason": choice.finish_reason},
+                    )
+                    if choice.finish_reason == "stop":
+                        prompter.add_streamed_result(text, appliers[i])
+                        notify_generation(generations[i])
+
+        for i in range(self.n_generations):
+            if i not in generations:
+                # stream ended without a finish_reason -> continued like a cut off one
+                generations[i] = ChatGeneration(
+                    message=AIMessage(content="".join(texts.get(i, []))),
+                    generation_info={"finish_reason": None},
+                )
+        return LLMResult(
+            generations=[[generations[i] for i in sorted(generations)]],
+            llm_output={"token_usage": token_usage, "model_name": self.model},
+        )
+
 
 async def generate_continuation(
     last_gen: Generation, llm: ChatOpenAI, prompt: ChatPromptTemplate, question: str
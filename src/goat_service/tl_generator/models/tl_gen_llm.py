@@ -6,6 +6,9 @@ from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel
 
 from src.goat_service.tl_generator.prompts.tl_prompter import TLPrompter
+from src.goat_service.utils.event_loop import run_coroutine
+from src.goat_service.utils.llm_cache import GenerateResult, generate_with_cache
+from src.goat_service.utils.llm_hedging import timed_generate
 
 
 @dataclass
@@ -21,6 +24,35 @@ class TLGenLLM(ABC):
     def __init__(self, model, n_generations, temperature):
         pass
 
-    @abstractmethod
     def generate_translations(self, prompter: TLPrompter) -> TLGenResult:
-        pass
+        llm_result, prompt, question = run_coroutine(
+            self.agenerate_llm_result(prompter)
+        )
+        return self.process_llm_result(prompter, (llm_result, prompt, question))
+
+    async def agenerate_llm_result(self, prompter: TLPrompter) -> GenerateResult:
+        """
+        Cached llm call; the latency of real llm calls is recorded for hedging.
+        """
+        return await generate_with_cache(
+            self,
+            prompter,
+            lambda: timed_generate(
+                self.model, lambda: self._generate_translations(prompter)
+            ),
+        )
+
+    async def _generate_translations(self, prompter: TLPrompter) -> GenerateResult:
+        raise NotImplementedError()
+
+    def process_llm_result(
+        self, prompter: TLPrompter, generate_result: GenerateResult
+    ) -> TLGenResult:
+        llm_result, prompt, question = generate_result
+        tl_projects = prompter.process_llm_result(llm_result)
+        return TLGenResult(
+            tl_projects=tl_projects,
+            llm_result=llm_result,
+            prompt=prompt,
+            question=question,
+        )
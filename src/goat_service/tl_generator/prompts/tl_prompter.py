@@ -1,20 +1,32 @@
+import asyncio
+import copy
 import logging
-from copy import deepcopy
+import multiprocessing
 from abc import ABC
+from collections.abc import AsyncIterator
+from concurrent.futures import ProcessPoolExecutor
 
-from gs_common.CodeProject import CodeProject
+from gs_common import setup_logging
+from gs_common.CodeProject import CodeFile, CodeProject
+from gs_common.tracing import current_company_id, current_trace_id, current_user_id
 from langchain.prompts.chat import (
     ChatPromptTemplate,
     HumanMessagePromptTemplate,
 )
 from langchain_core.outputs.llm_result import LLMResult
 
-from src.goat_service.utils.operation_applier import OperationApplier
+from src.goat_service.utils.operation_applier import (
+    OperationApplier,
+    StreamingOperationApplier,
+)
 
 
 class TLPrompter(ABC):
     system_message: str
     examples: list[str] = []
+    # optional pool to convert generations in parallel (see start_process_pool)
+    process_pool: ProcessPoolExecutor = None
+    n_process_workers: int = 0
 
     def __init__(
         self,
@@ -22,15 +34,18 @@ class TLPrompter(ABC):
         instruction: str = None,
         test_project: CodeProject = None,
     ):
-        self.source_project = source_project
+        # the prompt and the conversion use the projects without reference files;
+        # copies, the projects of the caller are used again (e.g. as delta base)
+        self.source_project = source_project.copy_on_write()
         self.instruction = instruction
-        self.test_project = test_project
+        self.test_project = test_project.copy_on_write() if test_project else None
         self.additional_info = self.get_additional_info()
+        # candidates of generations that were applied while they were streamed,
+        # by generation text (see add_streamed_result)
+        self.streamed_results: dict[str, tuple[CodeProject, bool]] = {}
 
         # backup reference_files and log filenames
-        self.source_project_reference_files = deepcopy(
-            self.source_project.reference_files
-        )
+        self.source_project_reference_files = source_project.reference_files
         self.source_project.reference_files = []
         logging.info(
             f"Source project filenames: {[f.file_name for f in source_project.files]}"
@@ -41,6 +56,45 @@ class TLPrompter(ABC):
                 f"Test project filenames: {[f.file_name for f in test_project.files]}"
             )
 
+    @staticmethod
+    def start_process_pool(n_workers: int):
+        """
+        Convert llm generations in a pool of n_workers processes instead of
+        the request thread. n_workers <= 1 keeps the serial mode.
+        """
+        if n_workers <= 1 or TLPrompter.process_pool is not None:
+            return
+        logging.info(f"Starting process pool with {n_workers} workers")
+        # NOTE: spawn instead of fork; forking the multithreaded grpc server is not safe
+        TLPrompter.process_pool = ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=setup_logging,
+            initargs=("goat_service",),
+        )
+        TLPrompter.n_process_workers = n_workers
+
+    def streaming_applier(self) -> StreamingOperationApplier | None:
+        """
+        Applier for a generation that is streamed by the llm; None if the
+        prompter converts generations differently (overrides
+        convert_to_code_project), the generation is converted afterwards then.
+        """
+        if type(self).convert_to_code_project is not TLPrompter.convert_to_code_project:
+            return None
+        return StreamingOperationApplier(self.source_project)
+
+    def add_streamed_result(self, generation: str, applier: StreamingOperationApplier):
+        """
+        Keep the candidate of a complete streamed generation: converting the
+        same generation later returns it instead of parsing and applying the
+        generation again.
+        """
+        new_project, success = applier.finish()
+        # same as convert_to_code_project
+        new_project.reference_files = list(self.source_project_reference_files)
+        self.streamed_results[generation] = (new_project, success)
+
     def get_additional_info(self) -> str:
         return None
 
@@ -79,39 +133,24 @@ class TLPrompter(ABC):
         raw_generations = [generation.text for generation in response.generations[0]]
         parsed_projects = []
         bad_projects = []
-        unique_generations = []
+        unique_idx = self.unique_generations(raw_generations)
 
-        for i, gen in enumerate(raw_generations):
-            # NOTE: openai json mode is not available w langchain yet
-            # sometimes llm generates json formatting around generation
-            # remove in beginning and end
-            if gen.startswith("```json\n"):
-                gen = gen[8:]
-            if gen.endswith("\n```"):
-                gen = gen[:-4]
-
-            # filter out duplicate generations
-            gen_body = gen
-            if "file_operations" in gen_body:
-                gen_body = gen.split("file_operations")[1]
-
-            if gen_body in unique_generations:
-                logging.warning(f"Skipping duplicate generation {i}")
-                continue
-            unique_generations.append(gen_body)
-
-            try:
-                parsed, fully_successful = self.convert_to_code_project(gen)
-                if not fully_successful:
-                    bad_projects.append(parsed)
-                else:
-                    parsed_projects.append(parsed)
-            except Exception as e:
+        converted = self.convert_all_to_code_projects([gen for _, gen in unique_idx])
+        for (i, _), result in zip(unique_idx, converted):
+            if isinstance(result, Exception):
                 # if converting to json fails, skip it
-                logging.error(f"Failed to convert generation {i} to CodeProject: {e}")
+                logging.error(
+                    f"Failed to convert generation {i} to CodeProject: {result}"
+                )
+                continue
+            parsed, fully_successful = result
+            if not fully_successful:
+                bad_projects.append(parsed)
+            else:
+                parsed_projects.append(parsed)
         n_fully_successful = len(parsed_projects)
         n_not_fully_successful = len(bad_projects)
-        n_duplicates = len(raw_generations) - len(unique_generations)
+        n_duplicates = len(raw_generations) - len(unique_idx)
         n_failed = (
             len(raw_generations)
             - n_fully_successful
@@ -125,9 +164,252 @@ class TLPrompter(ABC):
         parsed_projects.extend(bad_projects)
         return parsed_projects
 
+    def unique_generations(self, raw_generations: list[str]) -> list[tuple[int, str]]:
+        """
+        Strip json formatting around the generations and drop duplicates.
+        Returns (index, generation) of the remaining generations, in order.
+        """
+        seen_bodies: set[str] = set()
+        unique_idx = []
+        for i, gen in enumerate(raw_generations):
+            gen = self.unique_generation(i, gen, seen_bodies)
+            if gen is not None:
+                unique_idx.append((i, gen))
+        return unique_idx
+
+    def unique_generation(self, i: int, gen: str, seen_bodies: set[str]) -> str | None:
+        """
+        Strip json formatting around generation i; None if it is a duplicate of
+        an earlier generation (seen_bodies, updated with the generation).
+        """
+        # NOTE: openai json mode is not available w langchain yet
+        # sometimes llm generates json formatting around generation
+        # remove in beginning and end
+        if gen.startswith("```json\n"):
+            gen = gen[8:]
+        if gen.endswith("\n```"):
+            gen = gen[:-4]
+
+        # filter out duplicate generations
+        gen_body = gen
+        if "file_operations" in gen_body:
+            gen_body = gen.split("file_operations")[1]
+
+        if gen_body in seen_bodies:
+            logging.warning(f"Skipping duplicate generation {i}")
+            return None
+        seen_bodies.add(gen_body)
+        return gen
+
+    async def aiter_code_projects(
+        self, generations: AsyncIterator[str]
+    ) -> AsyncIterator[tuple[CodeProject, bool]]:
+        """
+        Like process_llm_result, but for generations that arrive one at a time
+        (e.g. as the llm completes them): convert each generation as soon as it
+        arrives and yield each (project, success) as soon as it is converted.
+        Duplicates and failed conversions are logged and skipped. Closing the
+        generations iterator is left to the caller.
+        """
+        loop = asyncio.get_running_loop()
+        trace_info = (
+            current_trace_id.get(),
+            current_company_id.get(),
+            current_user_id.get(),
+        )
+        pool_prompter = self._pool_prompter()
+        seen_bodies: set[str] = set()
+        n_generations = 0
+        futures: dict[asyncio.Future, int] = {}
+        next_generation = asyncio.ensure_future(anext(generations, None))
+        pending = {next_generation}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                if next_generation in done:
+                    gen = next_generation.result()
+                    if gen is not None:
+                        i = n_generations
+                        n_generations += 1
+                        gen = self.unique_generation(i, gen, seen_bodies)
+                        if gen is not None:
+                            future = self._convert_async(
+                                loop, pool_prompter, gen, trace_info
+                            )
+                            futures[future] = i
+                            pending.add(future)
+                        next_generation = asyncio.ensure_future(
+                            anext(generations, None)
+                        )
+                        pending.add(next_generation)
+                for future in sorted(done & futures.keys(), key=futures.get):
+                    result = future.exception() or future.result()
+                    if pool_prompter is not None and isinstance(result, list):
+                        result = self._restore_reference_files(result[0])
+                    if isinstance(result, Exception):
+                        logging.error(
+                            f"Failed to convert generation {futures[future]} to CodeProject: {result}"
+                        )
+                        continue
+                    yield result
+        finally:
+            for future in pending:
+                future.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def _convert_async(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        pool_prompter: "TLPrompter | None",
+        gen: str,
+        trace_info: tuple,
+    ) -> asyncio.Future:
+        streamed = self.streamed_results.get(gen)
+        if streamed is not None:
+            future = loop.create_future()
+            future.set_result(streamed)
+            return future
+        if pool_prompter is not None:
+            # NOTE: one task per generation -> the prompter is pickled for each
+            return loop.run_in_executor(
+                TLPrompter.process_pool,
+                _convert_generations,
+                pool_prompter,
+                [gen],
+                trace_info,
+            )
+        return asyncio.ensure_future(
+            asyncio.to_thread(self.convert_to_code_project, gen)
+        )
+
+    def convert_all_to_code_projects(
+        self, generations: list[str]
+    ) -> list[tuple[CodeProject, bool] | Exception]:
+        """
+        Convert all generations, in the process pool if available.
+        Returns one (project, success) tuple or Exception per generation, in order.
+        """
+        streamed = [self.streamed_results.get(gen) for gen in generations]
+        if any(result is not None for result in streamed):
+            remaining = [
+                gen for gen, result in zip(generations, streamed) if result is None
+            ]
+            converted = iter(self.convert_all_to_code_projects(remaining))
+            return [
+                result if result is not None else next(converted) for result in streamed
+            ]
+
+        if TLPrompter.process_pool is not None and len(generations) > 1:
+            try:
+                return self._convert_all_in_process_pool(generations)
+            except Exception as e:
+                logging.error(f"Process pool failed, converting serially: {e}")
+
+        results = []
+        for gen in generations:
+            try:
+                results.append(self.convert_to_code_project(gen))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def _convert_all_in_process_pool(
+        self, generations: list[str]
+    ) -> list[tuple[CodeProject, bool] | Exception]:
+        # one chunk per worker -> the prompter is only pickled once per worker
+        n_chunks = min(TLPrompter.n_process_workers, len(generations))
+        chunk_size = -(-len(generations) // n_chunks)
+        trace_info = (
+            current_trace_id.get(),
+            current_company_id.get(),
+            current_user_id.get(),
+        )
+        pool_prompter = self._pool_prompter()
+        futures = [
+            TLPrompter.process_pool.submit(
+                _convert_generations,
+                pool_prompter,
+                generations[i : i + chunk_size],
+                trace_info,
+            )
+            for i in range(0, len(generations), chunk_size)
+        ]
+        results = []
+        for future in futures:
+            for result in future.result():
+                results.append(self._restore_reference_files(result))
+        return results
+
+    def _pool_prompter(self) -> "TLPrompter | None":
+        """
+        Copy of the prompter for the tasks of the process pool, None without pool.
+        The conversion does not read the reference files, they are only attached
+        to the results and re-attached by _restore_reference_files. So the copy
+        has placeholders without content, which are pickled for every task
+        instead of the reference files.
+        """
+        if TLPrompter.process_pool is None:
+            return None
+        pool_prompter = copy.copy(self)
+        pool_prompter.streamed_results = {}
+        pool_prompter.source_project_reference_files = [
+            CodeFile(file_name=f.file_name) for f in self.source_project_reference_files
+        ]
+        return pool_prompter
+
+    def _restore_reference_files(
+        self, result: tuple[CodeProject, bool, bool] | Exception
+    ) -> tuple[CodeProject, bool] | Exception:
+        """
+        Re-attach the source reference files to a result of _convert_generations.
+        """
+        if isinstance(result, Exception):
+            return result
+        parsed, success, shares_reference_files = result
+        if shares_reference_files:
+            parsed.reference_files = list(self.source_project_reference_files)
+        return parsed, success
+
     def convert_to_code_project(self, generation: str) -> tuple[CodeProject, bool]:
         da = OperationApplier(self.source_project, generation)
         new_project, success = da.apply()
-        # add reference files
-        new_project.reference_files = deepcopy(self.source_project_reference_files)
+        # add reference files (CodeFiles are shared between candidates)
+        new_project.reference_files = list(self.source_project_reference_files)
         return new_project, success
+
+
+def _convert_generations(
+    prompter: TLPrompter, generations: list[str], trace_info: tuple
+) -> list[tuple[CodeProject, bool, bool] | Exception]:
+    """
+    Worker function for TLPrompter.process_pool, prompter is a _pool_prompter.
+    Returns (project, success, shares_reference_files) or Exception per generation.
+    """
+    trace_id, company_id, user_id = trace_info
+    current_trace_id.set(trace_id)
+    current_company_id.set(company_id)
+    current_user_id.set(user_id)
+
+    results = []
+    for gen in generations:
+        try:
+            parsed, success = prompter.convert_to_code_project(gen)
+        except Exception as e:
+            # NOTE: not all exceptions can be pickled; keep only the message
+            results.append(Exception(str(e)))
+            continue
+        # do not send the reference file placeholders back; the caller
+        # re-attaches the reference files
+        ref_files = prompter.source_project_reference_files
+        shares_reference_files = (
+            isinstance(parsed, CodeProject)
+            and len(ref_files) > 0
+            and len(parsed.reference_files) == len(ref_files)
+            and all(a is b for a, b in zip(parsed.reference_files, ref_files))
+        )
+        if shares_reference_files:
+            parsed.reference_files = []
+        results.append((parsed, success, shares_reference_files))
+    return results
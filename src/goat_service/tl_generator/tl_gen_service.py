@@ -1,4 +1,3 @@
-import asyncio
 import logging
 import xml.etree.ElementTree as ET
 
@@ -10,6 +9,7 @@ from gs_common.file_ops import (
     backup_dict_in_background,
     generate_save_dir,
 )
+from gs_common.project_delta import delta_size, make_delta
 from gs_common.proto.common_pb2 import CodeProject as ProtoCodeProject
 from gs_common.proto.tl_generator_pb2 import (
     PlanGeneratorResponse,
@@ -18,6 +18,7 @@ from gs_common.proto.tl_generator_pb2 import (
     TLGeneratorResponse,
 )
 from gs_common.tracing import current_company_id, current_trace_id, extract_trace_info
+from gs_common.wire_format import WireFormat
 from langchain_core.tracers.context import tracing_v2_enabled
 
 from src.goat_service.tl_generator.models.anthropic_tl_gen_llm import AnthropicTLGenLLM
@@ -43,6 +44,7 @@ from src.goat_service.tl_generator.prompts.universal_plan_prompter import (
     AIPlan,
     UniversalPlanPrompter,
 )
+from src.goat_service.tl_generator.prompts.tl_prompter import TLPrompter
 from src.goat_service.tl_generator.prompts.universal_tl_prompter import (
     UniversalTLPrompter,
 )
@@ -50,13 +52,31 @@ from src.goat_service.utils.grpc_code_executor_calls import (
     _call_pre_migration_assessor,
     _call_upgrade_assistant,
 )
+from src.goat_service.utils.dapr_client_pool import DaprClientPool
+from src.goat_service.utils.event_loop import run_coroutine
+from src.goat_service.utils.llm_cache import GenerateResult, LLMCache
+from src.goat_service.utils.llm_hedging import LLMHedger
 
 
 class TLGenService:
     def __init__(self):
         with open("config.yaml", "r") as f:
             self.config = yaml.safe_load(f)
+        DaprClientPool.configure(self.config["dapr_client_pool_size"])
+        WireFormat.configure(self.config)
         self.backup_base_dir = self.config["backup_base_dir"]
+        TLPrompter.start_process_pool(self.config["n_process_workers"])
+        LLMCache.configure(
+            self.config["llm_cache_dir"],
+            self.config["llm_cache_ttl_hours"],
+            self.config["llm_cache_max_size_mb"],
+        )
+        self.hedger: LLMHedger = None
+        if self.config["hedge_latency_percentile"] is not None:
+            self.hedger = LLMHedger(
+                self.config["hedge_latency_percentile"],
+                self.config["hedge_default_delay"],
+            )
         self.tl_gen_llm: TLGenLLM = self.initialize_tl_gen_llm(
             self.config["tl_model"],
             self.config["n_tl_generations"],
@@ -92,16 +112,31 @@ class TLGenService:
         if debug_output:
             return FakeTLGenLLM(debug_output)
         elif "GS-" in model:
-            return AzureOpenAITLGenLLM(model, n_generations, temperature)
+            return AzureOpenAITLGenLLM(
+                model,
+                n_generations,
+                temperature,
+                self.config["tl_gen_stream_operations"],
+            )
         elif "gpt" in model or model.startswith("o1"):
-            return OpenAITLGenLLM(model, n_generations, temperature)
+            return OpenAITLGenLLM(
+                model,
+                n_generations,
+                temperature,
+                self.config["tl_gen_stream_operations"],
+            )
         elif "claude" in model:
-            return AnthropicTLGenLLM(model, n_generations, temperature)
+            return AnthropicTLGenLLM(
+                model,
+                n_generations,
+                temperature,
+                self.config["anthropic_max_concurrency"],
+            )
         else:
             raise Exception(f"Unsupported model: {model}")
 
     def assess(self, request: InvokeMethodRequest) -> TLGeneratorResponse:
-        source_project, target_language, _, _ = self.parse_tl_request(request)
+        source_project, target_language, _, _, _ = self.parse_tl_request(request)
 
         if target_language != "dotnet8":
             return TLGeneratorResponse(
@@ -110,7 +145,7 @@ class TLGenService:
             )
 
         try:
-            response = asyncio.run(
+            response = run_coroutine(
                 _call_pre_migration_assessor(source_project, target_language)
             )
             if "error" in response:
@@ -136,10 +171,23 @@ class TLGenService:
         self,
         request: InvokeMethodRequest,
     ) -> TLGeneratorResponse:
-        source_project, target_language, instruction, model = self.parse_tl_request(
-            request
+        source_project, target_language, instruction, model, solution_deltas = (
+            self.parse_tl_request(request)
         )
+        response = self._generate_translations(
+            source_project, target_language, instruction, model
+        )
+        if solution_deltas:
+            return self.to_solution_deltas(response, source_project)
+        return response
 
+    def _generate_translations(
+        self,
+        source_project: CodeProject,
+        target_language: str,
+        instruction: str,
+        model: str,
+    ) -> TLGeneratorResponse:
         if model == "UPGRADE_DOTNET_PROJECT":
             return self.start_upgrade_assistant_request(source_project, target_language)
         if model == "RESTRUCTURE_PROJECT_FROM_ASPNET_TO_ASPNETCORE":
@@ -178,7 +226,7 @@ class TLGenService:
         self,
         request: InvokeMethodRequest,
     ) -> PlanGeneratorResponse:
-        source_project, _, instruction, _ = self.parse_tl_request(request)
+        source_project, _, instruction, _, _ = self.parse_tl_request(request)
 
         tl_gen_result: TLGenResult = None
         try:
@@ -187,19 +235,10 @@ class TLGenService:
             else:
                 prompter = UniversalPlanPrompter(source_project, instruction)
 
-            try:
-                tl_gen_result: TLGenResult = (
-                    self.gslite_tl_gen_llm.generate_translations(prompter)
-                )
-            except Exception as e:
-                logging.error(f"Error generating plan: {e}")
-                logging.info("Retrying with backup model")
-                tl_gen_result: TLGenResult = (
-                    self.backup_gslite_tl_gen_llm.generate_translations(prompter)
-                )
-            logging.info(
-                f"Finished with {len(tl_gen_result.tl_projects )} tl_projects "
+            tl_gen_result: TLGenResult = self.generate_with_backup(
+                self.gslite_tl_gen_llm, self.backup_gslite_tl_gen_llm, prompter
             )
+            logging.info(f"Finished with {len(tl_gen_result.tl_projects)} tl_projects ")
             if not tl_gen_result.tl_projects:
                 return TLGeneratorResponse(
                     error="No plan generated", return_code=ReturnCode.ERROR
@@ -227,6 +266,41 @@ class TLGenService:
             else:
                 self.backup(tl_gen_result)
 
+    def generate_with_backup(
+        self, tl_gen_llm: TLGenLLM, backup_tl_gen_llm: TLGenLLM, prompter: TLPrompter
+    ) -> TLGenResult:
+        """
+        Generate with tl_gen_llm; the backup llm is used if it fails or, with
+        hedging enabled, if it is slower than usual (see LLMHedger).
+        """
+        if self.hedger is None or isinstance(tl_gen_llm, FakeTLGenLLM):
+            try:
+                return tl_gen_llm.generate_translations(prompter)
+            except Exception as e:
+                logging.error(f"Error generating translations: {e}")
+                logging.info("Retrying with backup model")
+                return backup_tl_gen_llm.generate_translations(prompter)
+
+        generate_result = run_coroutine(
+            self.agenerate_with_backup(tl_gen_llm, backup_tl_gen_llm, prompter)
+        )
+        return tl_gen_llm.process_llm_result(prompter, generate_result)
+
+    async def agenerate_with_backup(
+        self, tl_gen_llm: TLGenLLM, backup_tl_gen_llm: TLGenLLM, prompter: TLPrompter
+    ) -> GenerateResult:
+        """
+        Like generate_with_backup, but only the llm call (no processing).
+        """
+        if self.hedger is not None:
+            return await self.hedger.generate(tl_gen_llm, backup_tl_gen_llm, prompter)
+        try:
+            return await tl_gen_llm.agenerate_llm_result(prompter)
+        except Exception as e:
+            logging.error(f"Error generating translations: {e}")
+            logging.info("Retrying with backup model")
+            return await backup_tl_gen_llm.agenerate_llm_result(prompter)
+
     def _is_aspnet_project(self, source_project: CodeProject) -> bool:
         # search for csproj
         for file in source_project.files:
@@ -245,53 +319,18 @@ class TLGenService:
     ) -> TLGeneratorResponse:
         tl_gen_result: TLGenResult = None
         try:
-            if target_language == "gslite":
-                prompter = UniversalTLPrompter(source_project, instruction)
-
-            elif target_language == "dotnet8":
-                if instruction == "":
-                    return TLGeneratorResponse(
-                        error="Instruction is required for dotnet8 improvement",
-                        return_code=ReturnCode.ERROR,
-                    )
-                prompter = DotNet8ImproveTLPrompter(source_project, instruction)
-
-            elif target_language == "java21":
-                if instruction == "":
-                    prompter = Java8ToJava21TLPrompter(source_project)
-                else:
-                    prompter = Java21ImprovePrompter(source_project, instruction)
-
-            else:
-                return TLGeneratorResponse(
-                    error=f"Unsupported target language: {target_language}",
-                    return_code=ReturnCode.ERROR,
+            try:
+                prompter = self.get_tl_prompter(
+                    source_project, target_language, instruction
                 )
+            except ValueError as e:
+                return TLGeneratorResponse(error=str(e), return_code=ReturnCode.ERROR)
 
-            try:
-                if target_language == "gslite":
-                    tl_gen_result: TLGenResult = (
-                        self.gslite_tl_gen_llm.generate_translations(prompter)
-                    )
-                else:
-                    tl_gen_result: TLGenResult = self.tl_gen_llm.generate_translations(
-                        prompter
-                    )
-            except Exception as e:
-                logging.error(f"Error generating translations: {e}")
-                logging.info("Retrying with backup model")
-                if target_language == "gslite":
-                    tl_gen_result = self.backup_gslite_tl_gen_llm.generate_translations(
-                        prompter
-                    )
-                else:
-                    tl_gen_result = self.backup_tl_gen_llm.generate_translations(
-                        prompter
-                    )
-
-            logging.info(
-                f"Finished with {len(tl_gen_result.tl_projects )} tl_projects "
+            tl_gen_result: TLGenResult = self.generate_with_backup(
+                *self.get_tl_gen_llms(target_language), prompter
             )
+
+            logging.info(f"Finished with {len(tl_gen_result.tl_projects)} tl_projects ")
             if not tl_gen_result.tl_projects:
                 return TLGeneratorResponse(
                     error="No generated translations", return_code=ReturnCode.ERROR
@@ -316,6 +355,61 @@ class TLGenService:
             else:
                 self.backup(tl_gen_result)
 
+    @staticmethod
+    def to_solution_deltas(
+        response: TLGeneratorResponse, source_project: CodeProject
+    ) -> TLGeneratorResponse:
+        """
+        response with the solutions as solution_deltas against source_project.
+        Solutions that cannot be sent as deltas stay in solutions.
+        """
+        base_hash = source_project.content_hash(normalize=False)
+        solutions = []
+        for solution in response.solutions:
+            try:
+                project = CodeProject.model_validate(MessageToDict(solution))
+                delta = make_delta(source_project, project, base_hash)
+            except Exception as e:
+                logging.error(f"Failed to make project delta: {e}")
+                delta = None
+            if delta is None:
+                solutions.append(solution)
+                continue
+            logging.info(f"GSMETRIC:solution_delta_files={delta_size(delta)}")
+            response.solution_deltas.append(delta)
+        del response.solutions[:]
+        response.solutions.extend(solutions)
+        return response
+
+    def get_tl_prompter(
+        self,
+        source_project: CodeProject,
+        target_language: str,
+        instruction: str,
+    ) -> TLPrompter:
+        """
+        Raises ValueError if the request cannot be handled.
+        """
+        if target_language == "gslite":
+            return UniversalTLPrompter(source_project, instruction)
+        elif target_language == "dotnet8":
+            if instruction == "":
+                raise ValueError("Instruction is required for dotnet8 improvement")
+            return DotNet8ImproveTLPrompter(source_project, instruction)
+        elif target_language == "java21":
+            if instruction == "":
+                return Java8ToJava21TLPrompter(source_project)
+            return Java21ImprovePrompter(source_project, instruction)
+        raise ValueError(f"Unsupported target language: {target_language}")
+
+    def get_tl_gen_llms(self, target_language: str) -> tuple[TLGenLLM, TLGenLLM]:
+        """
+        (tl_gen_llm, backup_tl_gen_llm) for target_language.
+        """
+        if target_language == "gslite":
+            return self.gslite_tl_gen_llm, self.backup_gslite_tl_gen_llm
+        return self.tl_gen_llm, self.backup_tl_gen_llm
+
     def parse_tl_request(self, request: InvokeMethodRequest):
         extract_trace_info(request)
         req_proto = TLGeneratorRequest()
@@ -330,7 +424,13 @@ class TLGenService:
         logging.info("Instruction:" + instruction.replace("\n", " "))
         model = req_proto.model
         logging.info(f"Model: {model}")
-        return source_project, target_language, instruction, model
+        return (
+            source_project,
+            target_language,
+            instruction,
+            model,
+            req_proto.solution_deltas,
+        )
 
     def backup(
         self,
@@ -356,7 +456,7 @@ class TLGenService:
         target_language: str,
     ) -> TLGeneratorResponse:
         try:
-            response = asyncio.run(
+            response = run_coroutine(
                 _call_upgrade_assistant(source_project, target_language)
             )
             if "error" in response:
@@ -1,29 +1,50 @@
-import asyncio
-import json
 import logging
 import os
 
-from dapr.aio.clients import DaprClient
+import yaml
 from dapr.ext.grpc import InvokeMethodRequest
 from google.protobuf.json_format import MessageToDict
 from gs_common.CodeProject import CodeFile, CodeProject, ExecutionResult
 from gs_common.proto.common_pb2 import CodeProject as ProtoCodeProject
+from gs_common.project_delta import apply_delta
 from gs_common.proto.tl_picker_pb2 import (
     ReturnCode,
+    TLGenerateAndPickRequest,
     TLPickerRequest,
     TLPickerResponse,
 )
-from gs_common.tracing import current_company_id, extract_trace_info, inject_trace_info
+from gs_common.tracing import current_company_id, extract_trace_info
+from gs_common.wire_format import WireFormat
 
+from src.goat_service.tl_generator.tl_gen_service import TLGenService
 from src.goat_service.tl_picker.most_changes_tl_picker import MostChangesTLPicker
 from src.goat_service.tl_picker.tl_picker import TLPicker
-from src.goat_service.utils.language_service_map import LANGUAGE_SERVICE_MAP
+from src.goat_service.tl_picker.tl_pipeline import TLPipeline, TLPipelineResult
+from src.goat_service.utils.dapr_client_pool import DaprClientPool
+from src.goat_service.utils.event_loop import run_coroutine
+from src.goat_service.utils.execution_fan_out import (
+    AcceptanceCriterion,
+    execute_batch_until_accepted,
+    execute_candidate,
+    execution_timeout,
+)
+from src.goat_service.utils.grpc_code_executor_calls import SOURCE_CANDIDATES
+from src.goat_service.utils.project_delta_sender import ProjectDeltaSender
 from src.goat_service.utils.user_metric_utils import log_user_metrics
 
 
 class TLPickerService:
     def __init__(self):
-        pass
+        with open("config.yaml", "r") as f:
+            self.config = yaml.safe_load(f)
+        DaprClientPool.configure(self.config["dapr_client_pool_size"])
+        WireFormat.configure(self.config)
+        ProjectDeltaSender.configure(self.config)
+        # stop executing the other candidates once one is acceptable (None: never)
+        self.acceptance_criterion = AcceptanceCriterion.from_config(
+            self.config, "tl_picker"
+        )
+        self.batch_size = self.config["code_executor_batch_size"]
 
     def pick_translation(self, request: InvokeMethodRequest) -> TLPickerResponse:
         logging.info("Happy easter from tl picker")
@@ -41,6 +62,13 @@ class TLPickerService:
                 tl_projects.append(CodeProject.model_validate(MessageToDict(p)))
             except Exception as e:
                 logging.error(f"Failed to parse project: {e}")
+        if req_proto.translation_deltas:
+            base_hash = source_project.content_hash(normalize=False)
+        for delta in req_proto.translation_deltas:
+            try:
+                tl_projects.append(apply_delta(source_project, delta, base_hash))
+            except Exception as e:
+                logging.error(f"Failed to apply project delta: {e}")
         logging.info(
             f"Got {len(tl_projects)} tl_projects for {source_project.display_name}"
         )
@@ -49,29 +77,117 @@ class TLPickerService:
         log_user_metrics([source_project], target_language, stage="tlinput")
         log_user_metrics(tl_projects, target_language, stage="tleval")
 
-        if target_language == "dotnetframework" or target_language == "dotnet8":
-            tl_picker = TLPicker(source_project)
-        elif target_language == "java8" or target_language == "java21":
-            tl_picker = MostChangesTLPicker(source_project)
-        else:
-            logging.error(f"Unsupported target language: {target_language}")
+        tl_picker = self.get_tl_picker(source_project, target_language)
+        if tl_picker is None:
+            return self.unsupported_language_response(target_language)
+
+        results: list[ExecutionResult] = run_coroutine(
+            self._execute_tests(
+                tl_projects,
+                source_project,
+                test_project,
+                target_language,
+                self.acceptance_criterion,
+            ),
+            timeout=execution_timeout(len(tl_projects)),
+        )
+        return self.pick_best_response(tl_picker, tl_projects, results, target_language)
+
+    def generate_and_pick_translation(
+        self, request: InvokeMethodRequest, tl_gen_service: TLGenService
+    ) -> TLPickerResponse:
+        """
+        Generate the translations and execute each one as soon as it is
+        converted (see TLPipeline) instead of generate_translations followed
+        by pick_translation.
+        """
+        extract_trace_info(request)
+        req_proto = TLGenerateAndPickRequest()
+        request.unpack(req_proto)
+        source_project = CodeProject.model_validate(
+            MessageToDict(req_proto.source_project)
+        )
+        test_project = CodeProject.model_validate(MessageToDict(req_proto.test_project))
+        target_language = req_proto.target_language
+        instruction = req_proto.instruction
+        log_user_metrics([source_project], target_language, stage="tlinput")
+
+        tl_picker = self.get_tl_picker(source_project, target_language)
+        if tl_picker is None:
+            return self.unsupported_language_response(target_language)
+
+        pipeline_result: TLPipelineResult = None
+        try:
+            prompter = tl_gen_service.get_tl_prompter(
+                source_project, target_language, instruction
+            )
+            tl_gen_llm, backup_tl_gen_llm = tl_gen_service.get_tl_gen_llms(
+                target_language
+            )
+            pipeline = TLPipeline(
+                lambda tl_project: execute_candidate(
+                    tl_project,
+                    tl_project,
+                    test_project,
+                    target_language,
+                    base_project=source_project,
+                ),
+                self.acceptance_criterion,
+            )
+            pipeline_result = run_coroutine(
+                pipeline.run(
+                    lambda: tl_gen_service.agenerate_with_backup(
+                        tl_gen_llm, backup_tl_gen_llm, prompter
+                    ),
+                    prompter,
+                )
+            )
+        except Exception as e:
+            msg = f"Error generating translations: {e}"
+            logging.error(msg)
+            return TLPickerResponse(error=msg, return_code=ReturnCode.ERROR)
+
+        tl_projects = pipeline_result.tl_gen_result.tl_projects
+        if not tl_projects:
+            logging.error("No tl_projects generated")
             return TLPickerResponse(
-                solution=ProtoCodeProject(source_language="", files=[]),
-                test_output="",
-                error=f"Unsupported target language: {target_language}",
-                return_code=ReturnCode.ERROR,
+                error="No generated translations", return_code=ReturnCode.ERROR
             )
+        tl_gen_service.backup(pipeline_result.tl_gen_result)
+        log_user_metrics(tl_projects, target_language, stage="tleval")
+        return self.pick_best_response(
+            tl_picker, tl_projects, pipeline_result.results, target_language
+        )
 
-        results: list[ExecutionResult] = asyncio.run(
-            self._execute_tests(tl_projects, test_project, target_language)
+    def get_tl_picker(
+        self, source_project: CodeProject, target_language: str
+    ) -> TLPicker | None:
+        if target_language == "dotnetframework" or target_language == "dotnet8":
+            return TLPicker(source_project)
+        elif target_language == "java8" or target_language == "java21":
+            return MostChangesTLPicker(source_project)
+        return None
+
+    def unsupported_language_response(self, target_language: str) -> TLPickerResponse:
+        logging.error(f"Unsupported target language: {target_language}")
+        return TLPickerResponse(
+            solution=ProtoCodeProject(source_language="", files=[]),
+            test_output="",
+            error=f"Unsupported target language: {target_language}",
+            return_code=ReturnCode.ERROR,
         )
 
+    def pick_best_response(
+        self,
+        tl_picker: TLPicker,
+        tl_projects: list[CodeProject],
+        results: list[ExecutionResult | Exception],
+        target_language: str,
+    ) -> TLPickerResponse:
         # loop through results and log exceptions
         for result in results:
             if isinstance(result, Exception):
-                logging.error(
-                    f"Failed to execute tl_project: {result.project.display_name}. Got exception: {result}"
-                )
+                logging.error(f"Failed to execute tl_project. Got exception: {result}")
                 continue
 
         # remove exceptions from results
@@ -138,58 +254,16 @@ class TLPickerService:
         )
 
     async def _execute_tests(
-        self, tl_projects, test_project, target_language
-    ) -> list[ExecutionResult]:
-        tasks = []
-        for tl_project in tl_projects:
-            data = {
-                "source_project": tl_project.model_dump(),
-                "test_project": test_project.model_dump(),
-                "target_language": target_language,
-            }
-
-            async with DaprClient(headers_callback=inject_trace_info) as d:
-                service_name = LANGUAGE_SERVICE_MAP.get(
-                    target_language, "code-executor"
-                )
-                task = d.invoke_method(
-                    service_name,
-                    "execute_tests",
-                    data=json.dumps(data),
-                    timeout=60 * 5,
-                )
-                tasks.append(task)
-
-        responses = await asyncio.gather(*tasks, return_exceptions=True)
-        if len(responses) != len(tl_projects):
-            logging.error(
-                f"len(responses): {len(responses)} != len(tl_projects): {len(tl_projects)}"
-            )
-            # just continue; cannot be fixed
-
-        results = []
-        for tl_project, response in zip(tl_projects, responses):
-            if isinstance(response, Exception):
-                results.append(response)
-                continue
-            response = json.loads(response.data)
-            # TODO: better solution
-            max_error_length = 10_000
-            if len(response["error"]) > max_error_length:
-                logging.error(
-                    f"Error message is too long: {len(response['error'])} characters. Truncating to {max_error_length} characters."
-                )
-                response["error"] = response["error"][:max_error_length]
-
-            result = ExecutionResult(
-                project=tl_project,
-                success=True if response["success"] == "true" else False,
-                error=response["error"],
-                total_tests=int(response["total_tests"]),
-                passed_tests=int(response["passed_tests"]),
-                failed_tests=int(response["failed_tests"]),
-                test_output=response["test_output"],
-                runtime=int(response["runtime"]),
-            )
-            results.append(result)
-        return results
+        self, tl_projects, source_project, test_project, target_language, is_acceptable
+    ) -> list[ExecutionResult | Exception]:
+        # batches: the test project is sent once per batch, the translations as
+        # deltas against the source project (if configured)
+        return await execute_batch_until_accepted(
+            SOURCE_CANDIDATES,
+            tl_projects,
+            test_project,
+            target_language,
+            is_acceptable,
+            self.batch_size,
+            base_project=source_project,
+        )
@@ -0,0 +1,211 @@
+import asyncio
+import contextvars
+import logging
+import time
+from collections import Counter
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import dataclass, field, replace
+
+from gs_common.CodeProject import CodeProject, ExecutionResult
+from langchain_core.outputs import Generation, LLMResult
+
+from src.goat_service.tl_generator.models.tl_gen_llm import TLGenResult
+from src.goat_service.tl_generator.prompts.tl_prompter import TLPrompter
+from src.goat_service.utils.generation_listener import current_generation_listener
+from src.goat_service.utils.llm_cache import GenerateResult
+
+
+@dataclass
+class TLPipelineResult:
+    tl_gen_result: TLGenResult
+    # one ExecutionResult or Exception per executed candidate, in submission order
+    results: list[ExecutionResult | Exception] = field(default_factory=list)
+    stopped_early: bool = False
+    time_saved: float = 0.0
+
+
+class TLPipeline:
+    """
+    Generate translation candidates and execute the tests of each candidate as
+    soon as it is converted, instead of converting all candidates first and then
+    executing all of them (staged flow). Generations that the llm completes
+    before the others (see notify_generation) are converted and executed while
+    the llm call is still running. Stops once a candidate is acceptable (see
+    AcceptanceCriterion), the llm call is cancelled then if it is still running;
+    with is_acceptable None all candidates are executed.
+    """
+
+    def __init__(
+        self,
+        execute_tests: Callable[[CodeProject], Awaitable[ExecutionResult]],
+        is_acceptable: Callable[[ExecutionResult], bool] | None,
+    ):
+        self.execute_tests = execute_tests
+        self.is_acceptable = is_acceptable
+
+    async def run(
+        self,
+        generate: Callable[[], Awaitable[GenerateResult]],
+        prompter: TLPrompter,
+    ) -> TLPipelineResult:
+        t0 = time.time()
+        # the llm call reports complete generations to the queue (see
+        # notify_generation) while it generates the others
+        streamed: asyncio.Queue[Generation] = asyncio.Queue()
+        context = contextvars.copy_context()
+        context.run(current_generation_listener.set, streamed.put_nowait)
+        generate_task = asyncio.create_task(generate(), context=context)
+        t_generated = None
+
+        def on_generated(task: asyncio.Task):
+            nonlocal t_generated
+            t_generated = time.time()
+
+        generate_task.add_done_callback(on_generated)
+        # all generations received so far
+        generations: list[Generation] = []
+        generation_texts = self._generation_texts(generate_task, streamed, generations)
+
+        tl_projects: list[CodeProject] = []
+        tasks: list[asyncio.Task] = []
+        # (submitted, finished) time of each task
+        timings: dict[asyncio.Task, list[float]] = {}
+        # candidates with the same content are executed once
+        task_by_hash: dict[str, asyncio.Task] = {}
+        duplicates: dict[asyncio.Task, list[CodeProject]] = {}
+        stopped_early = False
+        t_converted = None
+
+        def on_done(task: asyncio.Task):
+            timings[task].append(time.time())
+
+        candidates = prompter.aiter_code_projects(generation_texts)
+        next_candidate = asyncio.ensure_future(anext(candidates, None))
+        pending = {next_candidate}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                if next_candidate in done:
+                    candidate = next_candidate.result()
+                    if candidate is None:
+                        t_converted = time.time()
+                    else:
+                        tl_project, _ = candidate
+                        tl_projects.append(tl_project)
+                        content_hash = tl_project.content_hash()
+                        if content_hash in task_by_hash:
+                            duplicates[task_by_hash[content_hash]].append(tl_project)
+                        else:
+                            task = asyncio.create_task(self.execute_tests(tl_project))
+                            timings[task] = [time.time()]
+                            task.add_done_callback(on_done)
+                            tasks.append(task)
+                            task_by_hash[content_hash] = task
+                            duplicates[task] = []
+                            pending.add(task)
+                        next_candidate = asyncio.ensure_future(anext(candidates, None))
+                        pending.add(next_candidate)
+                stopped_early = self.is_acceptable is not None and any(
+                    task in done
+                    and not task.cancelled()
+                    and not task.exception()
+                    and self.is_acceptable(task.result())
+                    for task in tasks
+                )
+                if stopped_early:
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            await candidates.aclose()
+            await generation_texts.aclose()
+            generate_task.cancel()
+            await asyncio.gather(generate_task, return_exceptions=True)
+        t_end = time.time()
+
+        if not generate_task.cancelled() and generate_task.exception() is None:
+            llm_result, prompt, question = generate_task.result()
+        else:
+            # stopped early before the llm call returned
+            llm_result = LLMResult(generations=[generations])
+            prompt, question = prompter.get_prompt(), prompter.get_question()
+
+        results = []
+        for task in tasks:
+            if task.cancelled():
+                continue
+            results.append(task.exception() or task.result())
+            if not task.exception():
+                for duplicate in duplicates[task]:
+                    results.append(replace(task.result(), project=duplicate))
+
+        # staged flow: the llm call, all conversions, then the slowest execution;
+        # a lower bound (conversions of streamed generations and cancelled
+        # executions only count after the llm call / until cancellation)
+        t_generated = t_generated or t_end
+        t_convert = max(0.0, (t_converted or t_end) - t_generated)
+        execution_times = [t[-1] - t[0] for t in timings.values()]
+        t_staged = t_generated - t0 + t_convert + max(execution_times, default=0.0)
+        time_saved = max(0.0, t_staged - (t_end - t0))
+
+        n_executed = len([task for task in tasks if not task.cancelled()])
+        n_duplicate_candidates = len(tl_projects) - len(tasks)
+        logging.info(
+            f"Pipeline executed {n_executed}/{len(tasks)} unique candidates, "
+            f"{len(tasks) - n_executed} cancelled, {stopped_early=}"
+        )
+        logging.info(f"GSMETRIC:{n_duplicate_candidates=}")
+        logging.info(f"GSMETRIC:tl_pipeline_stopped_early={stopped_early}")
+        logging.info(f"GSMETRIC:tl_pipeline_time_saved={time_saved:.2f}")
+        return TLPipelineResult(
+            tl_gen_result=TLGenResult(
+                tl_projects=tl_projects,
+                llm_result=llm_result,
+                prompt=prompt,
+                question=question,
+            ),
+            results=results,
+            stopped_early=stopped_early,
+            time_saved=time_saved,
+        )
+
+    @staticmethod
+    async def _generation_texts(
+        generate_task: asyncio.Task,
+        streamed: asyncio.Queue[Generation],
+        generations: list[Generation],
+    ) -> AsyncIterator[str]:
+        """
+        The texts of the generations reported to streamed while generate_task
+        runs, then the generations of its result that were not reported
+        (e.g. llms that return all generations at once, llm cache hits).
+        Appends each generation to generations. Raises the error of
+        generate_task if it fails.
+        """
+        while not generate_task.done():
+            next_generation = asyncio.ensure_future(streamed.get())
+            try:
+                await asyncio.wait(
+                    {next_generation, generate_task},
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+            finally:
+                next_generation.cancel()
+            if next_generation.done() and not next_generation.cancelled():
+                generations.append(next_generation.result())
+                yield generations[-1].text
+        while not streamed.empty():
+            generations.append(streamed.get_nowait())
+            yield generations[-1].text
+
+        llm_result, _, _ = generate_task.result()
+        n_streamed = Counter(generation.text for generation in generations)
+        for generation in llm_result.generations[0]:
+            if n_streamed[generation.text] > 0:
+                n_streamed[generation.text] -= 1
+                continue
+            generations.append(generation)
+            yield generation.text
@@ -9,13 +9,18 @@ from langchain_anthropic import ChatAnthropic
 
 from src.goat_service.tl_generator.prompts.tl_prompter import TLPrompter
 from src.goat_service.ut_generator.models.ut_gen_llm import UTGenLLM, UTGenResult
+from src.goat_service.utils.event_loop import run_coroutine
+from src.goat_service.utils.llm_cache import generate_with_cache
+from src.goat_service.utils.llm_fan_out import agenerate_fan_out
 
 
 class AnthropicUTGenLLM(UTGenLLM):
-    def __init__(self, model, n_generations, temperature):
+    def __init__(self, model, n_generations, temperature, max_concurrency=5):
         self.model = model
         self.n_generations = n_generations
         self.temperature = temperature
+        # NOTE: anthropic has no n parameter -> n_generations parallel calls
+        self.max_concurrency = max_concurrency
         logging.info(f"Using model: {self.model}")
         self.llm = self.create_llm(self.n_generations)
 
@@ -31,7 +36,11 @@ class AnthropicUTGenLLM(UTGenLLM):
     def generate_unittests(
         self, prompter: TLPrompter
     ) -> tuple[LLMResult, ChatPromptTemplate, str]:
-        llm_result, prompt, question = self._generate_unittests(prompter)
+        llm_result, prompt, question = run_coroutine(
+            generate_with_cache(
+                self, prompter, lambda: self._generate_unittests(prompter)
+            )
+        )
 
         ut_projects = prompter.process_llm_result(llm_result)
         return UTGenResult(
@@ -41,7 +50,7 @@ class AnthropicUTGenLLM(UTGenLLM):
             question=question,
         )
 
-    def _generate_unittests(self, prompter: TLPrompter) -> UTGenResult:
+    async def _generate_unittests(self, prompter: TLPrompter) -> UTGenResult:
         prompt = prompter.get_prompt()
         question = prompter.get_question()
         chain = LLMChain(
@@ -51,8 +60,8 @@ class AnthropicUTGenLLM(UTGenLLM):
         )
 
         t0 = time.time()
-        llm_result: LLMResult = chain.generate(
-            input_list=[{"question": question}],
+        llm_result: LLMResult = await agenerate_fan_out(
+            chain, question, self.n_generations, self.max_concurrency
         )
         t_gen = time.time() - t0
         logging.info(f"Time to generate: {t_gen:.1f}s")
@@ -10,6 +10,8 @@ from langchain_openai import ChatOpenAI
 
 from src.goat_service.tl_generator.prompts.tl_prompter import TLPrompter
 from src.goat_service.ut_generator.models.ut_gen_llm import UTGenLLM, UTGenResult
+from src.goat_service.utils.event_loop import run_coroutine
+from src.goat_service.utils.llm_cache import generate_with_cache
 
 
 class OpenAIUTGenLLM(UTGenLLM):
@@ -32,7 +34,11 @@ class OpenAIUTGenLLM(UTGenLLM):
     def generate_unittests(
         self, prompter: TLPrompter
     ) -> tuple[LLMResult, ChatPromptTemplate, str]:
-        llm_result, prompt, question = self._generate_unittests(prompter)
+        llm_result, prompt, question = run_coroutine(
+            generate_with_cache(
+                self, prompter, lambda: self._generate_unittests(prompter)
+            )
+        )
 
         ut_projects = prompter.process_llm_result(llm_result)
         return UTGenResult(
@@ -42,7 +48,7 @@ class OpenAIUTGenLLM(UTGenLLM):
             question=question,
         )
 
-    def _generate_unittests(self, prompter: TLPrompter) -> UTGenResult:
+    async def _generate_unittests(self, prompter: TLPrompter) -> UTGenResult:
         prompt = prompter.get_prompt()
         question = prompter.get_question()
         chain = LLMChain(
@@ -54,7 +60,7 @@ class OpenAIUTGenLLM(UTGenLLM):
         with get_openai_callback() as cb:
             t0 = time.time()
             logging.info("I am calling the UT LLM now...")
-            llm_result: LLMResult = chain.generate(
+            llm_result: LLMResult = await chain.agenerate(
                 input_list=[{"question": question}],
             )
             t_gen = time.time() - t0
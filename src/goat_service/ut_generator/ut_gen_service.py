@@ -13,6 +13,7 @@ from gs_common.proto.common_pb2 import CodeProject as ProtoCodeProject
 from gs_common.tracing import extract_trace_info
 
 from dataset.util import load_example_project
+from src.goat_service.tl_generator.prompts.tl_prompter import TLPrompter
 from src.goat_service.ut_generator.models.anthropic_ut_gen_llm import AnthropicUTGenLLM
 from src.goat_service.ut_generator.models.azureopenai_ut_gen_llm import (
     AzureOpenAIUTGenLLM,
@@ -38,6 +39,7 @@ from src.goat_service.ut_generator.prompts.universal_ut_prompter import (
 from src.goat_service.ut_generator.utils.ut_postprocessor import (
     UnitTestPostProcessor,
 )
+from src.goat_service.utils.llm_cache import LLMCache
 
 
 class UTGenService:
@@ -45,6 +47,12 @@ class UTGenService:
         with open("config.yaml", "r") as f:
             self.config = yaml.safe_load(f)
         self.backup_base_dir = self.config["backup_base_dir"]
+        TLPrompter.start_process_pool(self.config["n_process_workers"])
+        LLMCache.configure(
+            self.config["llm_cache_dir"],
+            self.config["llm_cache_ttl_hours"],
+            self.config["llm_cache_max_size_mb"],
+        )
         self.use_nunit_dummy_test_project = self.config[
             "mode_ut_gen_use_nunit_dummy_test_project"
         ]
@@ -87,7 +95,12 @@ class UTGenService:
         elif "gpt" in model or model.startswith("o1"):
             return OpenAIUTGenLLM(model, n_generations, temperature)
         elif "claude" in model:
-            return AnthropicUTGenLLM(model, n_generations, temperature)
+            return AnthropicUTGenLLM(
+                model,
+                n_generations,
+                temperature,
+                self.config["anthropic_max_concurrency"],
+            )
         else:
             raise Exception(f"Unsupported model: {model}")
 
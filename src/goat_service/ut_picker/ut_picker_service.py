@@ -1,25 +1,39 @@
-import asyncio
-import json
 import logging
 import os
 
-from dapr.aio.clients import DaprClient
+import yaml
 from dapr.ext.grpc import InvokeMethodRequest
 from google.protobuf.json_format import MessageToDict
 from gs_common.CodeProject import CodeProject, ExecutionResult
 from gs_common.proto.common_pb2 import CodeProject as ProtoCodeProject
 from gs_common.proto.ut_picker_pb2 import ReturnCode, UTPickerRequest, UTPickerResponse
-from gs_common.tracing import extract_trace_info, inject_trace_info
+from gs_common.tracing import extract_trace_info
+from gs_common.wire_format import WireFormat
 
 from src.goat_service.ut_picker.ut_picker import UTPicker
 from src.goat_service.ut_picker.nunit_ut_picker import NUnitUTPicker
-from src.goat_service.utils.language_service_map import LANGUAGE_SERVICE_MAP
+from src.goat_service.utils.dapr_client_pool import DaprClientPool
+from src.goat_service.utils.event_loop import run_coroutine
+from src.goat_service.utils.execution_fan_out import (
+    AcceptanceCriterion,
+    execute_batch_until_accepted,
+    execution_timeout,
+)
+from src.goat_service.utils.grpc_code_executor_calls import TEST_CANDIDATES
 from src.goat_service.utils.user_metric_utils import log_user_metrics
 
 
 class UTPickerService:
     def __init__(self):
-        pass
+        with open("config.yaml", "r") as f:
+            self.config = yaml.safe_load(f)
+        DaprClientPool.configure(self.config["dapr_client_pool_size"])
+        WireFormat.configure(self.config)
+        # stop executing the other candidates once one is acceptable (None: never)
+        self.acceptance_criterion = AcceptanceCriterion.from_config(
+            self.config, "ut_picker"
+        )
+        self.batch_size = self.config["code_executor_batch_size"]
 
     def pick_unittests(
         self,
@@ -54,15 +68,21 @@ class UTPickerService:
         logging.info(
             f"Got {len(test_projects)} test_projects to execute for source_project: {source_project.display_name}"
         )
-        results: list[ExecutionResult] = asyncio.run(
-            self._execute_tests(source_project, test_projects, target_language)
+        results: list[ExecutionResult] = run_coroutine(
+            self._execute_tests(
+                source_project,
+                test_projects,
+                target_language,
+                self.acceptance_criterion,
+            ),
+            timeout=execution_timeout(len(test_projects)),
         )
 
         # loop through results and log exceptions
         for result in results:
             if isinstance(result, Exception):
                 logging.error(
-                    f"Failed to execute test_project: {result.project.display_name}. Got exception: {result}"
+                    f"Failed to execute test_project. Got exception: {result}"
                 )
                 continue
 
@@ -115,58 +135,14 @@ class UTPickerService:
         )
 
     async def _execute_tests(
-        self, source_project, test_projects, target_language
-    ) -> list[ExecutionResult]:
-        tasks = []
-        for test_project in test_projects:
-            data = {
-                "source_project": source_project.model_dump(),
-                "test_project": test_project.model_dump(),
-                "target_language": target_language,
-            }
-
-            async with DaprClient(headers_callback=inject_trace_info) as d:
-                service_name = LANGUAGE_SERVICE_MAP.get(
-                    target_language, "code-executor"
-                )
-                task = d.invoke_method(
-                    service_name,
-                    "execute_tests",
-                    data=json.dumps(data),
-                    timeout=60 * 5,
-                )
-                tasks.append(task)
-
-        responses = await asyncio.gather(*tasks, return_exceptions=True)
-        if len(responses) != len(test_projects):
-            logging.error(
-                f"len(responses): {len(responses)} != len(test_projects): {len(test_projects)}"
-            )
-            # just continue; cannot be fixed
-
-        results = []
-        for test_project, response in zip(test_projects, responses):
-            if isinstance(response, Exception):
-                results.append(response)
-                continue
-            response = json.loads(response.data)
-            # TODO: better solution
-            max_error_length = 10_000
-            if len(response["error"]) > max_error_length:
-                logging.error(
-                    f"Error message is too long: {len(response['error'])} characters. Truncating to {max_error_length} characters."
-                )
-                response["error"] = response["error"][:max_error_length]
-
-            result = ExecutionResult(
-                project=test_project,
-                success=True if response["success"] == "true" else False,
-                error=response["error"],
-                total_tests=int(response["total_tests"]),
-                passed_tests=int(response["passed_tests"]),
-                failed_tests=int(response["failed_tests"]),
-                test_output=response["test_output"],
-                runtime=int(response["runtime"]),
-            )
-            results.append(result)
-        return results
+        self, source_project, test_projects, target_language, is_acceptable
+    ) -> list[ExecutionResult | Exception]:
+        # batches: the source project is sent once per batch of test projects
+        return await execute_batch_until_accepted(
+            TEST_CANDIDATES,
+            test_projects,
+            source_project,
+            target_language,
+            is_acceptable,
+            self.batch_size,
+        )
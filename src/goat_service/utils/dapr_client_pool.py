@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+
+import grpc
+from dapr.aio.clients import DaprClient
+from dapr.clients.grpc._response import InvokeMethodResponse
+from dapr.conf import settings
+from gs_common.tracing import inject_trace_info
+
+
+def _is_connection_error(e: Exception) -> bool:
+    """
+    True if the request did not reach the sidecar -> safe to reconnect and retry.
+    """
+    return (
+        isinstance(e, grpc.aio.AioRpcError) and e.code() == grpc.StatusCode.UNAVAILABLE
+    )
+
+
+class DaprClientPool:
+    """
+    Long-lived DaprClients shared by all requests instead of a new client (and
+    grpc channel) per call. The clients belong to the event loop they are opened
+    on, so the pool should only be used from the service event loop (see
+    event_loop.py). The trace headers are still generated per call from the
+    caller's context by inject_trace_info.
+    Methods are invoked over grpc (see configure), so every call reuses the
+    channel of its client.
+    """
+
+    default: "DaprClientPool" = None
+
+    def __init__(
+        self,
+        size: int,
+        client_factory: Callable[[], DaprClient] = None,
+    ):
+        self.size = max(1, size)
+        self.client_factory = client_factory or DaprClient
+        self.clients: list[DaprClient | None] = [None] * self.size
+        self.n_opened = 0
+        self._next = 0
+        self._loop: asyncio.AbstractEventLoop = None
+
+    @staticmethod
+    def configure(size: int):
+        if DaprClientPool.default is not None:
+            return
+        # NOTE: the sdk invokes methods over http by default, which opens a new
+        # aiohttp session per call and does not use the pooled grpc channels.
+        # Set on the settings, the DAPR_API_METHOD_INVOCATION_PROTOCOL env
+        # variable is only read when dapr is imported.
+        settings.DAPR_API_METHOD_INVOCATION_PROTOCOL = "grpc"
+        logging.info(f"Using dapr client pool with {size} clients")
+        DaprClientPool.default = DaprClientPool(size)
+
+    @property
+    def n_open(self) -> int:
+        return sum(client is not None for client in self.clients)
+
+    def _get_client(self) -> tuple[int, DaprClient]:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            if self._loop is not None:
+                # NOTE: the old clients cannot be closed from another loop
+                logging.warning("Dapr client pool used from a new event loop")
+            self._loop = loop
+            self.clients = [None] * self.size
+
+        index = self._next
+        self._next = (index + 1) % self.size
+        if self.clients[index] is None:
+            self.clients[index] = self.client_factory()
+            self.n_opened += 1
+            logging.info(f"GSMETRIC:dapr_channels_opened={self.n_opened}")
+            logging.info(f"GSMETRIC:dapr_channels_open={self.n_open}")
+        return index, self.clients[index]
+
+    async def _reconnect(self, index: int, client: DaprClient):
+        # another call may already have replaced the client
+        if self.clients[index] is client:
+            self.clients[index] = None
+        try:
+            await client.close()
+        except Exception as e:
+            logging.warning(f"Error closing dapr client: {e}")
+
+    async def invoke_method(
+        self, app_id: str, method_name: str, data: str | bytes, timeout: int
+    ) -> InvokeMethodResponse:
+        """
+        DaprClient.invoke_method with one of the pooled clients.
+        On a connection error the client is replaced and the call retried once.
+        """
+        for attempt in range(2):
+            index, client = self._get_client()
+            t0 = time.time()
+            try:
+                # NOTE: over grpc the headers_callback of the client is not used
+                response = await client.invoke_method(
+                    app_id,
+                    method_name,
+                    data=data,
+                    metadata=tuple(inject_trace_info().items()),
+                    timeout=timeout,
+                )
+            except Exception as e:
+                if not _is_connection_error(e):
+                    raise
+                logging.error(
+                    f"Dapr connection error calling {app_id}/{method_name}: {e}"
+                )
+                await self._reconnect(index, client)
+                if attempt > 0:
+                    raise
+                continue
+            logging.info(
+                f"GSMETRIC:dapr_invoke_latency_{method_name}={time.time() - t0:.2f}"
+            )
+            return response
+
+    async def close(self):
+        clients = [client for client in self.clients if client is not None]
+        self.clients = [None] * self.size
+        for client in clients:
+            await client.close()
+
+
+async def invoke_method(
+    app_id: str, method_name: str, data: str | bytes, timeout: int
+) -> InvokeMethodResponse:
+    """
+    Invoke a method of another service with DaprClientPool.default.
+    """
+    if DaprClientPool.default is None:
+        DaprClientPool.configure(1)
+    return await DaprClientPool.default.invoke_method(
+        app_id, method_name, data, timeout
+    )
@@ -0,0 +1,87 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import logging
+import threading
+from typing import Coroutine, TypeVar
+
+T = TypeVar("T")
+
+# NOTE: one event loop for the whole process; the grpc handler threads only wait
+# for their coroutine, all llm requests are multiplexed on this loop
+_loop: asyncio.AbstractEventLoop = None
+_loop_thread: threading.Thread = None
+_lock = threading.Lock()
+
+# longest wait of run_coroutine; the calls it runs have shorter timeouts of
+# their own, this only keeps a stuck coroutine from blocking its thread forever
+DEFAULT_TIMEOUT_SECONDS = 1800.0
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the long-lived event loop of the service, start it on first use.
+    """
+    global _loop, _loop_thread
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            logging.info("Starting event loop thread")
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(
+                target=_loop.run_forever, name="event-loop", daemon=True
+            )
+            _loop_thread.start()
+        return _loop
+
+
+def run_coroutine(
+    coro: Coroutine[None, None, T], timeout: float | None = DEFAULT_TIMEOUT_SECONDS
+) -> T:
+    """
+    Run coro on the long-lived event loop and block until it is done.
+    The caller's contextvars (trace ids for logging) are visible in the coroutine.
+    Raises TimeoutError and cancels the coroutine if it takes longer than timeout
+    seconds (None = wait forever).
+    """
+    loop = get_event_loop()
+    if threading.current_thread() is _loop_thread:
+        coro.close()
+        raise RuntimeError("run_coroutine cannot be called from the event loop")
+
+    context = contextvars.copy_context()
+    future: concurrent.futures.Future = concurrent.futures.Future()
+    tasks: list[asyncio.Task] = []
+
+    def start_task():
+        if future.cancelled():
+            # timed out before the task was started
+            coro.close()
+            return
+        task = loop.create_task(coro, context=context)
+        tasks.append(task)
+
+        def set_result(task: asyncio.Task):
+            try:
+                if task.cancelled():
+                    future.cancel()
+                elif task.exception() is not None:
+                    future.set_exception(task.exception())
+                else:
+                    future.set_result(task.result())
+            except concurrent.futures.InvalidStateError:
+                # the caller timed out and cancelled the future in the meantime
+                pass
+
+        task.add_done_callback(set_result)
+
+    def cancel_task():
+        for task in tasks:
+            task.cancel()
+
+    loop.call_soon_threadsafe(start_task)
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        loop.call_soon_threadsafe(cancel_task)
+        raise TimeoutError(f"Coroutine did not finish within {timeout}s") from None
@@ -0,0 +1,311 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass, replace
+from typing import TypeVar
+
+from gs_common.CodeProject import CodeProject, ExecutionResult
+
+from src.goat_service.utils.grpc_code_executor_calls import (
+    EXECUTION_TIMEOUT_SECONDS,
+    SOURCE_CANDIDATES,
+    _call_execute_tests,
+    _call_execute_tests_batch,
+)
+
+T = TypeVar("T")
+
+# executions rejected by a busy code executor (see ExecutorScheduler) are retried
+# BUSY_RETRIES times, the first time after BUSY_BACKOFF_SECONDS, then doubled
+BUSY_RETRIES = 3
+BUSY_BACKOFF_SECONDS = 10.0
+
+
+class CodeExecutorBusyError(Exception):
+    """
+    The code executor rejected the execution (too many queued jobs) and all
+    retries; the candidate itself was not executed.
+    """
+
+
+def execution_timeout(n_candidates: int) -> float:
+    """
+    Generous bound for executing n_candidates with execute_candidate or
+    execute_batch_until_accepted (e.g. the timeout of run_coroutine): the
+    candidates one after another, each with all busy retries.
+    """
+    backoff = BUSY_BACKOFF_SECONDS * (2**BUSY_RETRIES - 1)
+    per_candidate = (BUSY_RETRIES + 1) * EXECUTION_TIMEOUT_SECONDS + backoff
+    return max(n_candidates, 1) * per_candidate
+
+
+@dataclass
+class AcceptanceCriterion:
+    """
+    A candidate is good enough to stop executing the others if it compiled and has
+    at most max_failed_tests failed and at least min_passed_tests passed tests.
+    """
+
+    max_failed_tests: int = 0
+    min_passed_tests: int = 1
+
+    @staticmethod
+    def from_config(config: dict, prefix: str) -> "AcceptanceCriterion | None":
+        """
+        None (execute all candidates) if {prefix}_accept_max_failed_tests is null.
+        """
+        max_failed_tests = config[f"{prefix}_accept_max_failed_tests"]
+        if max_failed_tests is None:
+            return None
+        return AcceptanceCriterion(
+            max_failed_tests, config[f"{prefix}_accept_min_passed_tests"]
+        )
+
+    def __call__(self, result: ExecutionResult) -> bool:
+        return (
+            result.error == ""
+            and 0 <= result.failed_tests <= self.max_failed_tests
+            and result.passed_tests >= self.min_passed_tests
+        )
+
+
+async def gather_until_accepted(
+    executions: list[Awaitable[T]],
+    is_acceptable: Callable[[T], bool] | None,
+) -> list[T | Exception]:
+    """
+    Like asyncio.gather(*executions, return_exceptions=True), but the remaining
+    executions are cancelled as soon as one result is acceptable.
+    Returns the results of the finished executions, in the order of executions.
+    With is_acceptable None all executions are awaited.
+    """
+    tasks = [asyncio.ensure_future(execution) for execution in executions]
+    results: dict[asyncio.Future, T | Exception] = {}
+    accepted = False
+    pending = set(tasks)
+    try:
+        while pending and not accepted:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                results[task] = task.exception() or task.result()
+                if (
+                    is_acceptable is not None
+                    and not isinstance(results[task], Exception)
+                    and is_acceptable(results[task])
+                ):
+                    accepted = True
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    if accepted:
+        logging.info(
+            f"Accepted a result, cancelled {len(pending)}/{len(tasks)} executions"
+        )
+    return [results[task] for task in tasks if task in results]
+
+
+def group_by_content(candidates: list[CodeProject]) -> list[list[CodeProject]]:
+    """
+    Group candidates with the same CodeProject.content_hash, in order of first
+    occurrence.
+    """
+    groups: dict[str, list[CodeProject]] = {}
+    for candidate in candidates:
+        groups.setdefault(candidate.content_hash(), []).append(candidate)
+    n_duplicate_candidates = len(candidates) - len(groups)
+    logging.info(f"GSMETRIC:{n_duplicate_candidates=}")
+    return list(groups.values())
+
+
+async def execute_unique_until_accepted(
+    candidates: list[CodeProject],
+    execute: Callable[[CodeProject], Awaitable[ExecutionResult]],
+    is_acceptable: Callable[[ExecutionResult], bool] | None,
+) -> list[ExecutionResult | Exception]:
+    """
+    gather_until_accepted for candidates, but candidates with the same content
+    are executed once and the result is copied for the duplicates.
+    """
+    groups = group_by_content(candidates)
+    results = await gather_until_accepted(
+        [execute(group[0]) for group in groups], is_acceptable
+    )
+    logging.info(f"GSMETRIC:n_cancelled_executions={len(groups) - len(results)}")
+    duplicates = {id(group[0]): group[1:] for group in groups}
+    fanned_out = []
+    for result in results:
+        fanned_out.append(result)
+        if isinstance(result, ExecutionResult):
+            for duplicate in duplicates.get(id(result.project), []):
+                fanned_out.append(replace(result, project=duplicate))
+    return fanned_out
+
+
+async def execute_candidate(
+    candidate: CodeProject,
+    source_project: CodeProject,
+    test_project: CodeProject,
+    target_language: str,
+    base_project: CodeProject | None = None,
+) -> ExecutionResult:
+    """
+    Execute test_project against source_project; candidate is the one of the two
+    that is picked (the translation or the test project).
+    base_project: the project source_project is derived from, see _call_execute_tests.
+    """
+    for attempt in range(BUSY_RETRIES + 1):
+        if attempt > 0:
+            await _busy_backoff(attempt)
+        response = await _call_execute_tests(
+            source_project, test_project, target_language, base_project
+        )
+        if not response.get("busy"):
+            return _to_execution_result(candidate, response)
+    raise CodeExecutorBusyError("Code executor is busy")
+
+
+async def execute_batch_until_accepted(
+    candidate_field: str,
+    candidates: list[CodeProject],
+    shared_project: CodeProject,
+    target_language: str,
+    is_acceptable: AcceptanceCriterion | None,
+    batch_size: int | None,
+    base_project: CodeProject | None = None,
+) -> list[ExecutionResult | Exception]:
+    """
+    execute_unique_until_accepted in execute_tests_batch requests of up to
+    batch_size candidates each, sent concurrently so that they are spread over
+    the code executor replicas. candidate_field says which side the candidates
+    are (SOURCE_CANDIDATES or TEST_CANDIDATES), shared_project is the other.
+    The code executor stops starting candidates once one is acceptable, the
+    other requests are cancelled. A failed request gives an exception for each
+    of its candidates. batch_size None: one execute_tests request per candidate.
+    base_project: the project the source candidates are derived from, to send
+    them as deltas (see _call_execute_tests_batch).
+    """
+    if batch_size is None:
+
+        def execute(candidate: CodeProject) -> Awaitable[ExecutionResult]:
+            if candidate_field == SOURCE_CANDIDATES:
+                return execute_candidate(
+                    candidate, candidate, shared_project, target_language, base_project
+                )
+            return execute_candidate(
+                candidate, shared_project, candidate, target_language
+            )
+
+        return await execute_unique_until_accepted(candidates, execute, is_acceptable)
+
+    groups = group_by_content(candidates)
+    unique_candidates = [group[0] for group in groups]
+    chunks = [
+        unique_candidates[i : i + max(1, batch_size)]
+        for i in range(0, len(unique_candidates), max(1, batch_size))
+    ]
+    accept = asdict(is_acceptable) if is_acceptable is not None else None
+
+    async def execute_chunk(
+        chunk: list[CodeProject],
+    ) -> list[tuple[CodeProject, ExecutionResult | Exception | None]]:
+        # None: not started, another candidate was accepted
+        results: dict[int, ExecutionResult | Exception | None] = {}
+        remaining = chunk
+        accepted = False
+        for attempt in range(BUSY_RETRIES + 1):
+            if attempt > 0:
+                await _busy_backoff(attempt)
+            try:
+                response = await _call_execute_tests_batch(
+                    candidate_field,
+                    remaining,
+                    shared_project,
+                    target_language,
+                    accept,
+                    base_project,
+                )
+            except Exception as e:
+                logging.error(f"Failed to execute {len(remaining)} candidates: {e}")
+                results.update({id(candidate): e for candidate in remaining})
+                break
+            busy = []
+            for candidate, candidate_response in zip(remaining, response["results"]):
+                if candidate_response is None:
+                    results[id(candidate)] = None
+                elif candidate_response.get("busy"):
+                    busy.append(candidate)
+                else:
+                    results[id(candidate)] = _to_execution_result(
+                        candidate, candidate_response
+                    )
+            remaining = busy
+            accepted = is_acceptable is not None and any(
+                isinstance(r, ExecutionResult) and is_acceptable(r)
+                for r in results.values()
+            )
+            if not remaining or accepted:
+                break
+        for candidate in remaining:
+            if id(candidate) not in results:
+                # the rejected candidates are not needed once one is accepted
+                results[id(candidate)] = (
+                    None if accepted else CodeExecutorBusyError("Code executor is busy")
+                )
+        return [(candidate, results[id(candidate)]) for candidate in chunk]
+
+    chunk_results = await gather_until_accepted(
+        [execute_chunk(chunk) for chunk in chunks],
+        (
+            lambda results: any(
+                isinstance(r, ExecutionResult) and is_acceptable(r) for _, r in results
+            )
+        )
+        if is_acceptable is not None
+        else None,
+    )
+
+    duplicates = {id(group[0]): group[1:] for group in groups}
+    results = []
+    for chunk_result in chunk_results:
+        for candidate, result in chunk_result:
+            if result is None:
+                continue
+            results.append(result)
+            if isinstance(result, ExecutionResult):
+                for duplicate in duplicates[id(candidate)]:
+                    results.append(replace(result, project=duplicate))
+    n_executed = sum(r is not None for rs in chunk_results for _, r in rs)
+    logging.info(f"GSMETRIC:n_cancelled_executions={len(groups) - n_executed}")
+    return results
+
+
+async def _busy_backoff(attempt: int):
+    delay = BUSY_BACKOFF_SECONDS * 2 ** (attempt - 1)
+    logging.warning(f"Code executor is busy, retrying in {delay:.0f}s")
+    logging.info(f"GSMETRIC:code_executor_busy_retry={attempt}")
+    await asyncio.sleep(delay)
+
+
+def _to_execution_result(candidate: CodeProject, response: dict) -> ExecutionResult:
+    # TODO: better solution
+    max_error_length = 10_000
+    if len(response["error"]) > max_error_length:
+        logging.error(
+            f"Error message is too long: {len(response['error'])} characters. Truncating to {max_error_length} characters."
+        )
+        response["error"] = response["error"][:max_error_length]
+
+    return ExecutionResult(
+        project=candidate,
+        success=True if response["success"] == "true" else False,
+        error=response["error"],
+        total_tests=int(response["total_tests"]),
+        passed_tests=int(response["passed_tests"]),
+        failed_tests=int(response["failed_tests"]),
+        test_output=response["test_output"],
+        runtime=int(response["runtime"]),
+    )
@@ -0,0 +1,20 @@
+from collections.abc import Callable
+from contextvars import ContextVar
+
+from langchain_core.outputs import Generation
+
+# called with each generation of an llm call as soon as it is complete, before
+# the call returns all generations (set by TLPipeline around the llm call)
+current_generation_listener: ContextVar[Callable[[Generation], None] | None] = (
+    ContextVar("current_generation_listener", default=None)
+)
+
+
+def notify_generation(generation: Generation):
+    """
+    Pass a complete generation to the listener of the current llm call, if any.
+    Generations that are not notified are only seen in the result of the call.
+    """
+    listener = current_generation_listener.get()
+    if listener is not None:
+        listener(generation)
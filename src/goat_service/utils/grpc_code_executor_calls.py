@@ -1,37 +1,155 @@
 import json
+import logging
 
-from dapr.aio.clients import DaprClient
-from gs_common.tracing import inject_trace_info
+from gs_common.CodeProject import CodeProject
+from gs_common.wire_format import encode_request
+
+from src.goat_service.utils.dapr_client_pool import invoke_method
+from src.goat_service.utils.language_service_map import LANGUAGE_SERVICE_MAP
+from src.goat_service.utils.project_delta_sender import ProjectDeltaSender
+
+# timeout of the code executor for the execution of one candidate
+EXECUTION_TIMEOUT_SECONDS = 60 * 5
+
+# candidate sides of execute_tests_batch -> field of the shared project
+SOURCE_CANDIDATES = "source_projects"
+TEST_CANDIDATES = "test_projects"
+BATCH_SHARED_FIELDS = {
+    SOURCE_CANDIDATES: "test_project",
+    TEST_CANDIDATES: "source_project",
+}
+
+
+async def _invoke_with_base(
+    service_name: str,
+    method_name: str,
+    data: dict,
+    candidate_fields: dict,
+    base_project: CodeProject | None,
+    timeout: int,
+) -> dict:
+    """
+    invoke_method for a request with candidates derived from base_project: with
+    ProjectDeltaSender.default the candidate_fields are sent as deltas against
+    base_project, else (or if base_project is None) as they are.
+    """
+    sender = ProjectDeltaSender.default
+    delta_fields = None
+    if sender is not None and base_project is not None:
+        base_hash = base_project.content_hash(normalize=False)
+        delta_fields = sender.delta_fields(candidate_fields, base_project, base_hash)
+    if delta_fields is None:
+        response = await invoke_method(
+            service_name,
+            method_name,
+            data=encode_request({**data, **candidate_fields}),
+            timeout=timeout,
+        )
+        return json.loads(response.data)
+
+    data = {**data, **delta_fields}
+    if sender.was_sent(base_hash):
+        response = await invoke_method(
+            service_name,
+            method_name,
+            data=encode_request({**data, "base_hash": base_hash}),
+            timeout=timeout,
+        )
+        response = json.loads(response.data)
+        if not response.get("missing_base"):
+            logging.info("GSMETRIC:base_project_sent=False")
+            return response
+        logging.info("Code executor is missing the base project, sending it")
+    response = await invoke_method(
+        service_name,
+        method_name,
+        data=encode_request({**data, "base_project": base_project}),
+        timeout=timeout,
+    )
+    sender.mark_sent(base_hash)
+    logging.info("GSMETRIC:base_project_sent=True")
+    return json.loads(response.data)
 
 
 async def _call_upgrade_assistant(source_project, target_language) -> dict:
     data = {
-        "source_project": source_project.model_dump(),
+        "source_project": source_project,
         "target_language": target_language,
     }
-    async with DaprClient(headers_callback=inject_trace_info) as d:
-        task = d.invoke_method(
-            "code-executor",
-            "call_upgrade_assistant",
-            data=json.dumps(data),
-            # TODO: good to set here? or via k8s? i dont get error; probably need to catch or something and send to frontend as timeout err
-            timeout=120,
-        )
-        response = await task
+    response = await invoke_method(
+        "code-executor",
+        "call_upgrade_assistant",
+        data=encode_request(data),
+        # TODO: good to set here? or via k8s? i dont get error; probably need to catch or something and send to frontend as timeout err
+        timeout=120,
+    )
     return json.loads(response.data)
 
 
 async def _call_pre_migration_assessor(source_project, target_language) -> dict:
     data = {
-        "source_project": source_project.model_dump(),
+        "source_project": source_project,
         "target_language": target_language,
     }
-    async with DaprClient(headers_callback=inject_trace_info) as d:
-        task = d.invoke_method(
-            "code-executor",
-            "call_assess",
-            data=json.dumps(data),
-            timeout=120,
-        )
-        response = await task
+    response = await invoke_method(
+        "code-executor",
+        "call_assess",
+        data=encode_request(data),
+        timeout=120,
+    )
     return json.loads(response.data)
+
+
+async def _call_execute_tests(
+    source_project, test_project, target_language, base_project=None
+) -> dict:
+    """
+    base_project: the project source_project is derived from (e.g. the source of
+    a translation), to send source_project as a delta (see _invoke_with_base).
+    """
+    data = {
+        "test_project": test_project,
+        "target_language": target_language,
+    }
+    service_name = LANGUAGE_SERVICE_MAP.get(target_language, "code-executor")
+    return await _invoke_with_base(
+        service_name,
+        "execute_tests",
+        data,
+        {"source_project": source_project},
+        base_project,
+        timeout=EXECUTION_TIMEOUT_SECONDS,
+    )
+
+
+async def _call_execute_tests_batch(
+    candidate_field,
+    candidates,
+    shared_project,
+    target_language,
+    accept,
+    base_project=None,
+) -> dict:
+    """
+    execute_tests_batch: each of candidates is executed with shared_project.
+    candidate_field is the side of the candidates: SOURCE_CANDIDATES (e.g.
+    translations, executed against one test project) or TEST_CANDIDATES (test
+    projects, executed against one source project).
+    base_project: the project the candidates are derived from, to send them as
+    deltas (see _invoke_with_base).
+    """
+    data = {
+        "target_language": target_language,
+        "accept": accept,
+        BATCH_SHARED_FIELDS[candidate_field]: shared_project,
+    }
+    service_name = LANGUAGE_SERVICE_MAP.get(target_language, "code-executor")
+    return await _invoke_with_base(
+        service_name,
+        "execute_tests_batch",
+        data,
+        {candidate_field: candidates},
+        base_project,
+        # worst case: the candidates run one after another
+        timeout=EXECUTION_TIMEOUT_SECONDS * len(candidates),
+    )
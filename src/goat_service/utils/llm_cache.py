@@ -0,0 +1,126 @@
+import asyncio
+import hashlib
+import json
+import logging
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable
+
+from gs_common.file_ops import DiskCache
+from langchain_core.outputs import LLMResult
+from langchain_core.prompts import ChatPromptTemplate
+
+# (llm_result, prompt, question) as returned by the _generate_* methods of the llms
+GenerateResult = tuple[LLMResult, ChatPromptTemplate, str]
+
+
+class LLMCacheBackend(ABC):
+    """
+    Storage of serialized llm results by key.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> str | None:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: str):
+        pass
+
+
+class DiskLLMCacheBackend(DiskCache, LLMCacheBackend):
+    """
+    One file per key in cache_dir, with ttl and LRU eviction (see DiskCache).
+    """
+
+
+class LLMCache:
+    """
+    Content addressed cache for llm results.
+    The key is a hash of the rendered prompt and the model parameters, so the
+    same request to the same model returns the stored generations.
+    """
+
+    # cache used by all llms, None = disabled (see configure)
+    default: "LLMCache" = None
+
+    def __init__(self, backend: LLMCacheBackend):
+        self.backend = backend
+
+    @staticmethod
+    def configure(cache_dir: str | None, ttl_hours: float, max_size_mb: float):
+        """
+        Set LLMCache.default to a disk cache in cache_dir.
+        cache_dir None disables the cache.
+        """
+        if not cache_dir:
+            LLMCache.default = None
+            return
+        if LLMCache.default is not None:
+            return
+        logging.info(f"Using llm cache in {cache_dir}")
+        LLMCache.default = LLMCache(
+            DiskLLMCacheBackend(
+                cache_dir,
+                ttl_seconds=ttl_hours * 3600,
+                max_size_bytes=int(max_size_mb * 1024 * 1024),
+            )
+        )
+
+    @staticmethod
+    def make_key(llm, prompt: ChatPromptTemplate, question: str) -> str:
+        messages = prompt.format_messages(question=question)
+        key_data = {
+            "llm": type(llm).__name__,
+            "model": llm.model,
+            "n_generations": llm.n_generations,
+            "temperature": llm.temperature,
+            "messages": [[m.type, m.content] for m in messages],
+        }
+        key_str = json.dumps(key_data, sort_keys=True)
+        return hashlib.sha256(key_str.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> LLMResult | None:
+        try:
+            value = self.backend.get(key)
+            if value is None:
+                return None
+            return LLMResult.model_validate_json(value)
+        except Exception as e:
+            logging.error(f"Error reading llm cache: {e}")
+            return None
+
+    def set(self, key: str, llm_result: LLMResult):
+        try:
+            self.backend.set(key, llm_result.model_dump_json())
+        except Exception as e:
+            logging.error(f"Error writing llm cache: {e}")
+
+    async def generate(
+        self, llm, prompter, generate: Callable[[], Awaitable[GenerateResult]]
+    ) -> GenerateResult:
+        prompt = prompter.get_prompt()
+        question = prompter.get_question()
+        key = self.make_key(llm, prompt, question)
+
+        # NOTE: disk io in a thread to not block the event loop
+        llm_result = await asyncio.to_thread(self.get, key)
+        llm_cache_hit = llm_result is not None
+        logging.info(f"GSMETRIC:{llm_cache_hit=}")
+        if llm_cache_hit:
+            return llm_result, prompt, question
+
+        llm_result, prompt, question = await generate()
+        await asyncio.to_thread(self.set, key, llm_result)
+        return llm_result, prompt, question
+
+
+async def generate_with_cache(
+    llm, prompter, generate: Callable[[], Awaitable[GenerateResult]]
+) -> GenerateResult:
+    """
+    Await generate() unless LLMCache.default has a result for the same prompt
+    and model parameters.
+    """
+    if LLMCache.default is None:
+        return await generate()
+    return await LLMCache.default.generate(llm, prompter, generate)
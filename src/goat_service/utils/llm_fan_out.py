@@ -0,0 +1,50 @@
+import asyncio
+import logging
+
+from langchain.chains.llm import LLMChain
+from langchain_core.outputs import LLMResult
+
+from src.goat_service.utils.generation_listener import notify_generation
+
+
+async def agenerate_fan_out(
+    chain: LLMChain, question: str, n_generations: int, max_concurrency: int
+) -> LLMResult:
+    """
+    Generate n_generations samples with n_generations single-sample calls
+    (for models without the n parameter), at most max_concurrency at a time.
+    The samples are merged into one LLMResult like a call with n=n_generations.
+    Each sample is passed to notify_generation as soon as its call returns.
+    Failed calls are dropped; raises the first error if all calls fail.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def generate_one() -> LLMResult:
+        async with semaphore:
+            result = await chain.agenerate(input_list=[{"question": question}])
+        for generation in result.generations[0]:
+            notify_generation(generation)
+        return result
+
+    results = await asyncio.gather(
+        *[generate_one() for _ in range(n_generations)], return_exceptions=True
+    )
+
+    generations = []
+    llm_outputs = []
+    errors = []
+    for i, result in enumerate(results):
+        if isinstance(result, BaseException):
+            logging.error(f"Error in fan-out generation {i}: {result}")
+            errors.append(result)
+            continue
+        generations.extend(result.generations[0])
+        llm_outputs.append(result.llm_output)
+
+    if not generations:
+        raise errors[0]
+    logging.info(f"Fan-out generated {len(generations)}/{n_generations} samples")
+    return LLMResult(
+        generations=[generations],
+        llm_output=llm_outputs[0] if llm_outputs else None,
+    )
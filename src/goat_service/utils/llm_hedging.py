@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from src.goat_service.utils.llm_cache import GenerateResult
+
+
+class LatencyHistogram:
+    """
+    Latencies of the last window_size llm calls of one model.
+    """
+
+    def __init__(self, window_size: int = 200):
+        self.samples: deque[float] = deque(maxlen=window_size)
+
+    def record(self, latency: float):
+        self.samples.append(latency)
+
+    def percentile(self, p: float) -> float | None:
+        """
+        p in [0, 1]; None if there are no samples yet.
+        """
+        if not self.samples:
+            return None
+        sorted_samples = sorted(self.samples)
+        index = min(len(sorted_samples) - 1, int(p * len(sorted_samples)))
+        return sorted_samples[index]
+
+
+# latency histograms by model name, recorded by the llms for every llm call
+latency_histograms: dict[str, LatencyHistogram] = {}
+
+
+def record_latency(model: str, latency: float):
+    latency_histograms.setdefault(model, LatencyHistogram()).record(latency)
+    logging.info(f"GSMETRIC:llm_latency_{model}={latency:.2f}")
+
+
+class LLMHedger:
+    """
+    Run the primary llm and fire the backup llm in parallel if the primary has
+    not answered after the hedge_percentile latency of the primary model.
+    The first successful result wins, the other call is cancelled.
+    """
+
+    def __init__(
+        self,
+        hedge_percentile: float,
+        default_delay: float,
+        min_samples: int = 20,
+    ):
+        self.hedge_percentile = hedge_percentile
+        # hedge delay in seconds until there are min_samples latencies of a model
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+
+    def hedge_delay(self, model: str) -> float:
+        histogram = latency_histograms.get(model)
+        if histogram is None or len(histogram.samples) < self.min_samples:
+            return self.default_delay
+        return histogram.percentile(self.hedge_percentile)
+
+    async def generate(self, primary, backup, prompter) -> GenerateResult:
+        """
+        primary and backup are llms with an async agenerate_llm_result(prompter).
+        """
+        delay = self.hedge_delay(primary.model)
+        primary_task = asyncio.create_task(primary.agenerate_llm_result(prompter))
+        tasks = [primary_task]
+        try:
+            done, _ = await asyncio.wait({primary_task}, timeout=delay)
+            if done:
+                if primary_task.exception() is None:
+                    return primary_task.result()
+                logging.error(
+                    f"Error generating with primary model: {primary_task.exception()}"
+                )
+                logging.info("Retrying with backup model")
+                return await backup.agenerate_llm_result(prompter)
+
+            logging.info(
+                f"Primary model {primary.model} did not answer within {delay:.1f}s, "
+                f"starting backup model {backup.model}"
+            )
+            logging.info("GSMETRIC:llm_hedge_fired=True")
+            backup_task = asyncio.create_task(backup.agenerate_llm_result(prompter))
+            tasks.append(backup_task)
+            names = {primary_task: "primary", backup_task: "backup"}
+            pending = {primary_task, backup_task}
+            errors = []
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                # prefer the primary if both finished at the same time
+                for task in sorted(done, key=lambda t: t is not primary_task):
+                    if task.exception() is None:
+                        logging.info(f"GSMETRIC:llm_hedge_winner={names[task]}")
+                        return task.result()
+                    logging.error(
+                        f"Error generating with {names[task]} model: {task.exception()}"
+                    )
+                    errors.append(task.exception())
+            raise errors[0]
+        finally:
+            # the losing call, or both if this call is cancelled (e.g. by TLPipeline)
+            pending = [task for task in tasks if not task.done()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def timed_generate(model: str, generate) -> GenerateResult:
+    """
+    Await generate() and record its latency for model.
+    Failed and cancelled (e.g. hedged) calls are recorded too, their elapsed
+    time as a lower bound of the latency: without them the samples are cut off
+    at the hedge delay and the hedge delay keeps shrinking.
+    """
+    t0 = time.time()
+    try:
+        return await generate()
+    finally:
+        record_latency(model, time.time() - t0)
@@ -1,8 +1,8 @@
-import copy
 import difflib
 import logging
 import os
 import re
+import time
 from textwrap import dedent
 
 from gs_common.CodeProject import CodeProject
@@ -62,6 +62,29 @@ ONLY EVER RETURN CODE IN A *SEARCH/REPLACE BLOCK*!
 """
 
 
+VALID_PATH_PATTERN = re.compile(r"^[\w\-./\\]+$")
+
+
+# lines that can change the state of a *SEARCH/REPLACE* block, all other lines
+# are block content
+MARKER_LINE_PATTERN = re.compile(r"(?m)^(?:<<<< SEARCH.*|====|>>>> REPLACE)$")
+
+_SEARCH_LINE = 1  # exactly "<<<< SEARCH"
+_SEARCH_START_LINE = 2  # starts with "<<<< SEARCH"
+_DIVIDER_LINE = 3
+_REPLACE_LINE = 4
+
+
+def _marker_kind(line: str) -> int | None:
+    if line.startswith("<<<< SEARCH"):
+        return _SEARCH_LINE if line == "<<<< SEARCH" else _SEARCH_START_LINE
+    if line == "====":
+        return _DIVIDER_LINE
+    if line == ">>>> REPLACE":
+        return _REPLACE_LINE
+    return None
+
+
 # class to represent a file operation (not used in any prompts)
 class FileOperation(BaseModel):
     file_name: str
@@ -70,161 +93,222 @@ class FileOperation(BaseModel):
 
 
 class OperationApplier:
+    # time limit in seconds for the whitespace tolerant search of a block
+    fuzzy_match_time_budget: float = 1.0
+
     def __init__(self, source_project: CodeProject, generation: str):
         self.source_project = source_project
         # convert the generation to a list of file operations
         # parse all file operations from the generation
         self.file_operations: list[FileOperation] = []
         self.all_success = True
-        gen_lines = generation.split("\n")
-        valid_path_pattern = re.compile(r"^[\w\-./\\]+$")
-
-        for i, line in enumerate(gen_lines):
-            if line.startswith("<<<< SEARCH"):
-                # get the file name
-                file_name = gen_lines[i - 1]
-                if not file_name:
-                    logging.warning(f"Empty file name: {file_name}")
-                    self.all_success = False
-                    continue
-                if file_name[0] == '"' or file_name[0] == "'" or file_name[0] == "`":
-                    file_name = file_name[1:]
-                if file_name[-1] == '"' or file_name[-1] == "'" or file_name[-1] == "`":
-                    file_name = file_name[:-1]
-
-                file_name = os.path.normpath(file_name)
-                # HACK: if the llm included the project name in the file path, remove it
-                if file_name.startswith(source_project.display_name + "/"):
-                    file_name = file_name[len(source_project.display_name) + 1 :]
-
-                # check if it is a valid file path
-                if not valid_path_pattern.match(file_name):
-                    logging.warning(f"Invalid file name: {file_name}")
-                    self.all_success = False
-                    continue
-
-                # get the search block
-                search_block = ""
-                valid_block = False
-                for j in range(i + 1, len(gen_lines)):
-                    if gen_lines[j] == "<<<< SEARCH" or gen_lines[j] == ">>>> REPLACE":
-                        search_block += gen_lines[j] + "\n"
-                        valid_block = False
-                        break
-                    if gen_lines[j] == "====":
-                        valid_block = True
-                        break
-                    search_block += gen_lines[j] + "\n"
-                if not valid_block:
-                    logging.warning(
-                        f"Invalid search block for file {file_name}:\n{search_block}"
-                    )
-                    self.all_success = False
-                    continue
-                # get the replace block
-                replace_block = ""
-                valid_block = False
-                for j in range(j + 1, len(gen_lines)):
-                    if gen_lines[j] == "====" or gen_lines[j] == "<<<< SEARCH":
-                        replace_block += gen_lines[j] + "\n"
-                        valid_block = False
-                        break
-                    if gen_lines[j] == ">>>> REPLACE":
-                        valid_block = True
-                        break
-                    replace_block += gen_lines[j] + "\n"
-                if not valid_block:
-                    logging.warning(
-                        f"Invalid replace block for file {file_name}:\n{replace_block}"
+        # Blocks are parsed in a single pass over the marker lines. Positions are
+        # "line start" and "start of the next line" offsets into the generation,
+        # so all blocks are slices of it.
+        # open blocks in their search phase as (file name, start of the search
+        # block); they react the same way to every line and end together
+        self._search_group: list[tuple[str | None, int]] = []
+        # open blocks in their replace phase; they all passed the same ==== line
+        # and therefore share the replace block
+        self._replace_group: list[tuple[str | None, int]] = []
+        self._divider: tuple[int, int] = (-1, -1)
+
+        self._generation = generation
+        for match in MARKER_LINE_PATTERN.finditer(generation):
+            self._parse_line(
+                match.start(), match.end() + 1, _marker_kind(match.group())
+            )
+        self._close_open_blocks(len(generation))
+
+    def _block_text(self, start: int, stop: int) -> str:
+        return self._generation[start:stop]
+
+    def _start_block(self, line_start: int, next_line_start: int):
+        # the file name is on the line in front of <<<< SEARCH
+        # (the last line if <<<< SEARCH is the first line, like gen_lines[-1])
+        if line_start == 0:
+            name_start = self._generation.rfind("\n") + 1
+            name_line = self._generation[name_start:]
+        else:
+            name_start = self._generation.rfind("\n", 0, line_start - 1) + 1
+            name_line = self._generation[name_start : line_start - 1]
+        file_name = self.parse_file_name(name_line)
+        if file_name is not None:
+            # the search block starts after the <<<< SEARCH line
+            self._search_group.append((file_name, next_line_start))
+
+    def _parse_line(self, line_start: int, next_line_start: int, kind: int):
+        if self._replace_group:
+            if kind == _DIVIDER_LINE or kind == _SEARCH_LINE:
+                self._invalidate_group(self._replace_group, "replace", next_line_start)
+                self._replace_group = []
+            elif kind == _REPLACE_LINE:
+                divider_start, replace_start = self._divider
+                replace_block = self._block_text(replace_start, line_start)
+                for file_name, search_start in self._replace_group:
+                    self._add_operation(
+                        file_name,
+                        self._block_text(search_start, divider_start),
+                        replace_block,
                     )
-                    self.all_success = False
-                    continue
+                self._replace_group = []
+
+        if self._search_group:
+            if kind == _SEARCH_LINE or kind == _REPLACE_LINE:
+                self._invalidate_group(self._search_group, "search", next_line_start)
+                self._search_group = []
+            elif kind == _DIVIDER_LINE:
+                self._replace_group = self._search_group
+                self._divider = (line_start, next_line_start)
+                self._search_group = []
+
+        if kind == _SEARCH_LINE or kind == _SEARCH_START_LINE:
+            self._start_block(line_start, next_line_start)
+
+    def _close_open_blocks(self, end: int):
+        # blocks that are still open at the end of the generation are invalid
+        if self._search_group:
+            self._invalidate_group(self._search_group, "search", end)
+        if self._replace_group:
+            self._invalidate_group(self._replace_group, "replace", end)
+        self._search_group = []
+        self._replace_group = []
+
+    def _invalidate_group(
+        self, group: list[tuple[str | None, int]], kind: str, stop: int
+    ):
+        # log the block of the oldest state only, the others are suffixes of it
+        file_name, start = group[0]
+        if kind == "replace":
+            start = self._divider[1]
+        block = self._block_text(start, stop)
+        if len(group) > 1:
+            file_name = f"{file_name} (and {len(group) - 1} overlapping blocks)"
+        logging.warning(f"Invalid {kind} block for file {file_name}:\n{block}")
+        self.all_success = False
+
+    def _add_operation(self, file_name: str, search_block: str, replace_block: str):
+        self.file_operations.append(
+            FileOperation(
+                file_name=file_name,
+                search_block=search_block,
+                replace_block=replace_block,
+            )
+        )
 
-                self.file_operations.append(
-                    FileOperation(
-                        file_name=file_name,
-                        search_block=search_block,
-                        replace_block=replace_block,
-                    )
-                )
+    def parse_file_name(self, file_name: str) -> str | None:
+        """
+        Clean up the file name line in front of a <<<< SEARCH marker.
+        Returns None (and marks the generation as not fully successful) if invalid.
+        """
+        if not file_name:
+            logging.warning(f"Empty file name: {file_name}")
+            self.all_success = False
+            return None
+        if file_name[0] == '"' or file_name[0] == "'" or file_name[0] == "`":
+            file_name = file_name[1:]
+        if file_name[-1] == '"' or file_name[-1] == "'" or file_name[-1] == "`":
+            file_name = file_name[:-1]
+
+        file_name = os.path.normpath(file_name)
+        # HACK: if the llm included the project name in the file path, remove it
+        if file_name.startswith(self.source_project.display_name + "/"):
+            file_name = file_name[len(self.source_project.display_name) + 1 :]
+
+        # check if it is a valid file path
+        if not VALID_PATH_PATTERN.match(file_name):
+            logging.warning(f"Invalid file name: {file_name}")
+            self.all_success = False
+            return None
+        return file_name
 
     def apply(self) -> tuple[CodeProject, bool]:
-        # Create a deep copy of the source project
-        target_project: CodeProject = copy.deepcopy(self.source_project)
+        # Create a copy-on-write copy of the source project
+        # -> unchanged files are shared with the source project
+        target_project: CodeProject = self.source_project.copy_on_write()
 
         logging.info(f"Applying {len(self.file_operations)} file operations")
         for file_operation in self.file_operations:
-            # do not allow absolute paths
-            if file_operation.file_name.startswith("/"):
-                self.all_success = False
-                logging.warning(
-                    f"Absolute paths are not allowed: {file_operation.file_name}"
-                )
-                continue
-            # do not allow paths with ".."
-            if "../" in file_operation.file_name:
-                self.all_success = False
-                logging.warning(
-                    f"Paths with '..' are not allowed: {file_operation.file_name}"
-                )
-                continue
+            self.apply_operation(target_project, file_operation)
 
-            if file_operation.search_block == "" and file_operation.replace_block == "":
-                success = target_project.remove_file(file_operation.file_name)
-                if not success:
-                    self.all_success = False
-                    continue
-                logging.info(f"Deleted file {file_operation.file_name}")
-                continue
-
-            if file_operation.search_block == "":
-                # add the file to the target project
-                target_project.add_file(
-                    file_operation.file_name, file_operation.replace_block
-                )
-                logging.info(f"Created file {file_operation.file_name}")
-                continue
+        # add debug information to the target project
+        # target_project = self.save_debug_info(target_project)
 
-            source_file = target_project.get_file(file_operation.file_name)
-            if source_file is None:
-                self.all_success = False
-                logging.warning(f"No source file found for {file_operation.file_name}")
-                continue
+        return target_project, self.all_success
 
-            # remove file encoding characters at the beginning of the file
-            source_code = source_file.source_code
-            removed_encoding = ""
-            if source_code.startswith("\ufeff"):
-                source_code = source_code[1:]
-                removed_encoding = "\ufeff"
-            if file_operation.search_block.startswith("\ufeff"):
-                file_operation.search_block = file_operation.search_block[1:]
-            if file_operation.replace_block.startswith("\ufeff"):
-                file_operation.replace_block = file_operation.replace_block[1:]
-
-            new_code = self.replace_code_block(
-                source_code, file_operation.search_block, file_operation.replace_block
+    def apply_operation(
+        self, target_project: CodeProject, file_operation: FileOperation
+    ):
+        """
+        Apply a single file operation to target_project.
+        Marks the generation as not fully successful if it cannot be applied.
+        """
+        # do not allow absolute paths
+        if file_operation.file_name.startswith("/"):
+            self.all_success = False
+            logging.warning(
+                f"Absolute paths are not allowed: {file_operation.file_name}"
+            )
+            return
+        # do not allow paths with ".."
+        if "../" in file_operation.file_name:
+            self.all_success = False
+            logging.warning(
+                f"Paths with '..' are not allowed: {file_operation.file_name}"
             )
+            return
 
-            if new_code is None:
+        if file_operation.search_block == "" and file_operation.replace_block == "":
+            success = target_project.remove_file(file_operation.file_name)
+            if not success:
                 self.all_success = False
-                logging.warning(
-                    f"Failed to update file {file_operation.file_name} with \n\nsearch block:\n\n{file_operation.search_block}\n\nreplace block:\n\n{file_operation.replace_block}"
-                )
-                continue
-
-            if removed_encoding:
-                new_code = removed_encoding + new_code
+                return
+            logging.info(f"Deleted file {file_operation.file_name}")
+            return
+
+        if file_operation.search_block == "":
+            # add the file to the target project
+            target_project.add_file(
+                file_operation.file_name, file_operation.replace_block
+            )
+            logging.info(f"Created file {file_operation.file_name}")
+            return
+
+        source_file = target_project.get_file(file_operation.file_name)
+        if source_file is None:
+            self.all_success = False
+            logging.warning(f"No source file found for {file_operation.file_name}")
+            return
+
+        # remove file encoding characters at the beginning of the file
+        source_code = source_file.source_code
+        removed_encoding = ""
+        if source_code.startswith("\ufeff"):
+            source_code = source_code[1:]
+            removed_encoding = "\ufeff"
+        if file_operation.search_block.startswith("\ufeff"):
+            file_operation.search_block = file_operation.search_block[1:]
+        if file_operation.replace_block.startswith("\ufeff"):
+            file_operation.replace_block = file_operation.replace_block[1:]
+
+        new_code = self.replace_code_block(
+            source_code, file_operation.search_block, file_operation.replace_block
+        )
 
-            source_file.source_code = new_code
-            logging.info(
-                f"Updated file {file_operation.file_name} with \nsearch block:\n{file_operation.search_block}\n\nreplace block:\n{file_operation.replace_block}"
+        if new_code is None:
+            self.all_success = False
+            logging.warning(
+                f"Failed to update file {file_operation.file_name} with \n\nsearch block:\n\n{file_operation.search_block}\n\nreplace block:\n\n{file_operation.replace_block}"
             )
+            return
 
-        # add debug information to the target project
-        # target_project = self.save_debug_info(target_project)
+        if removed_encoding:
+            new_code = removed_encoding + new_code
 
-        return target_project, self.all_success
+        target_project.update_file(file_operation.file_name, new_code)
+        logging.info(
+            f"Updated file {file_operation.file_name} with \nsearch block:\n{file_operation.search_block}\n\nreplace block:\n{file_operation.replace_block}"
+        )
 
     def replace_code_block(self, code_file_content, search_block, replace_block):
         if search_block in code_file_content:
@@ -236,28 +320,139 @@ class OperationApplier:
 
         # Split the search block into lines
         search_lines = search_block_dedented.splitlines()
-
-        # Escape each line and build the regex pattern
-        escaped_lines = [re.escape(line.lstrip()) for line in search_lines]
-        pattern = r"(?m)^\s*" + r"\s*\n^\s*".join(escaped_lines)
-
-        # Define a function to adjust the indentation of the replace block
-        def adjust_replace_block(match):
-            # Get the indentation of the first line of the matched block
-            first_line = match.group(0).splitlines()[0]
-            indent = re.match(r"^\s*", first_line).group(0)
-            # Adjust the replace block's indentation
-            replace_lines = replace_block_dedented.splitlines()
-            adjusted_replace = "\n".join(
-                indent + line if line.strip() else line for line in replace_lines
+        if not search_lines:
+            logging.warning("Search block only contains whitespace")
+            return None
+
+        # Find the first whitespace tolerant match of the search lines
+        try:
+            match = self.find_fuzzy_match(code_file_content, search_lines)
+        except TimeoutError:
+            logging.warning(
+                f"Fuzzy matching exceeded {self.fuzzy_match_time_budget}s; giving up"
             )
-            return adjusted_replace
-
-        # Use re.sub to perform the replacement
-        new_code_file_content = re.sub(
-            pattern, adjust_replace_block, code_file_content, count=1
+            return None
+        if match is None:
+            return code_file_content
+        match_start, match_end = match
+
+        # Get the indentation of the first line of the matched block
+        first_line = code_file_content[match_start:match_end].splitlines()[0]
+        indent = first_line[: len(first_line) - len(first_line.lstrip())]
+        # Adjust the replace block's indentation
+        replace_lines = replace_block_dedented.splitlines()
+        adjusted_replace = "\n".join(
+            indent + line if line.strip() else line for line in replace_lines
         )
-        return new_code_file_content
+        return (
+            code_file_content[:match_start]
+            + adjusted_replace
+            + code_file_content[match_end:]
+        )
+
+    def find_fuzzy_match(
+        self, code_file_content: str, search_lines: list[str]
+    ) -> tuple[int, int] | None:
+        """
+        Find the first occurrence of search_lines in code_file_content, ignoring
+        leading and trailing whitespace and extra blank lines (empty search lines
+        need one blank line each). This is the match of the former regex
+        ^\\s*line1\\s*\\n^\\s*line2..., found in linear time with KMP over the
+        stripped non-blank lines instead of backtracking.
+        Returns the (start, end) offsets of the match or None.
+        Raises TimeoutError if it takes longer than fuzzy_match_time_budget.
+        """
+        deadline = time.monotonic() + self.fuzzy_match_time_budget
+
+        # non-empty search lines with the number of empty lines in front of them
+        patterns: list[tuple[str, int]] = []
+        n_empty = 0
+        for line in search_lines:
+            line = line.lstrip()
+            if line:
+                patterns.append((line, n_empty))
+                n_empty = 0
+            else:
+                n_empty += 1
+
+        # non-blank lines of the file as (line number, start offset, line)
+        lines = []
+        line_start = 0
+        for i, line in enumerate(code_file_content.split("\n")):
+            if line.strip():
+                lines.append((i, line_start, line))
+            line_start += len(line) + 1
+
+        # the last search line only has to be a prefix of its line, all others
+        # have to match the whole (stripped) line
+        *head, (last, _) = patterns
+        head_keys = [line.rstrip() for line, _ in head]
+        # KMP failure function for head_keys
+        failure = [0] * len(head_keys)
+        k = 0
+        for i in range(1, len(head_keys)):
+            while k and head_keys[i] != head_keys[k]:
+                k = failure[k - 1]
+            if head_keys[i] == head_keys[k]:
+                k += 1
+            failure[i] = k
+
+        # head lines that need more than the stripped comparison of KMP:
+        # empty search lines in front of them or trailing whitespace
+        extra_checks = [
+            j
+            for j, (pattern, gap) in enumerate(head)
+            if (j and gap) or pattern != head_keys[j]
+        ]
+
+        def matches_at(first: int) -> bool:
+            # head_keys already match the stripped lines starting at first
+            last_index = first + len(head)
+            if last_index >= len(lines):
+                return False
+            if not lines[last_index][2].lstrip().startswith(last):
+                return False
+            for j in extra_checks + [len(head)]:
+                line_no, _, line = lines[first + j]
+                gap = patterns[j][1]
+                # extra blank lines are allowed, empty search lines need one each
+                if j and line_no - lines[first + j - 1][0] - 1 < gap:
+                    return False
+                if not line.lstrip().startswith(patterns[j][0]):
+                    return False
+            return True
+
+        k = 0
+        for i, (_, _, line) in enumerate(lines):
+            if i % 1024 == 0 and time.monotonic() > deadline:
+                raise TimeoutError()
+            if head_keys:
+                key = line.strip()
+                while k and key != head_keys[k]:
+                    k = failure[k - 1]
+                if key == head_keys[k]:
+                    k += 1
+                if k < len(head_keys):
+                    continue
+                first = i - len(head_keys) + 1
+                k = failure[k - 1]
+            else:
+                first = i
+            if not matches_at(first):
+                continue
+
+            # the match starts at the first blank line in front of it
+            if first == 0:
+                match_start = 0
+            else:
+                _, prev_line_start, prev_line = lines[first - 1]
+                match_start = prev_line_start + len(prev_line) + 1
+            _, last_start, last_line = lines[first + len(patterns) - 1]
+            match_end = (
+                last_start + len(last_line) - len(last_line.lstrip()) + len(last)
+            )
+            return match_start, match_end
+        return None
 
     def save_debug_info(self, target_project: CodeProject):
         # use difflib to make a text file with all the changes
@@ -304,3 +499,108 @@ class OperationApplier:
             op_file += "-" * 80 + "\n"
         target_project.add_file("operations.txt", op_file)
         return target_project
+
+
+class StreamingOperationApplier(OperationApplier):
+    """
+    Incremental version of OperationApplier for streamed LLM output (see
+    OpenAITLGenLLM._generate_translations).
+    Every *SEARCH/REPLACE* block is parsed and applied to target_project as soon
+    as its >>>> REPLACE line arrives, so the candidate is ready right after the
+    last chunk. Any chunking of a generation gives the same file operations and
+    result as OperationApplier(source_project, generation).apply().
+    """
+
+    def __init__(self, source_project: CodeProject):
+        super().__init__(source_project, "")
+        self.target_project: CodeProject = source_project.copy_on_write()
+        self._lines: list[str] = []
+        self._partial_line: list[str] = []
+        self._n_applied = 0
+        # <<<< SEARCH on the first line takes its file name from the last line
+        # (see OperationApplier._start_block), so its operation has to wait
+        self._first_line_block = False
+        self._unnamed_operation: FileOperation | None = None
+        self._finished = False
+
+    def feed(self, chunk: str) -> list[FileOperation]:
+        """
+        Consume the next chunk of the generation.
+        Returns the file operations that were completed and applied by this chunk.
+        """
+        if self._finished:
+            raise RuntimeError("Cannot feed a finished StreamingOperationApplier")
+        self._partial_line.append(chunk)
+        if "\n" not in chunk:
+            return []
+
+        *lines, rest = "".join(self._partial_line).split("\n")
+        self._partial_line = [rest]
+        for line in lines:
+            self._feed_line(line)
+        return self._apply_parsed()
+
+    def finish(self) -> tuple[CodeProject, bool]:
+        """
+        Flush the last line and close all open blocks.
+        Returns the target project and whether all operations were applied.
+        """
+        if self._finished:
+            return self.target_project, self.all_success
+
+        self._feed_line("".join(self._partial_line))
+        self._partial_line = []
+        self._finished = True
+        self._close_open_blocks(len(self._lines))
+
+        if self._first_line_block:
+            file_name = self.parse_file_name(self._lines[-1])
+            if self._unnamed_operation is not None:
+                if file_name is None:
+                    self.file_operations.remove(self._unnamed_operation)
+                else:
+                    self._unnamed_operation.file_name = file_name
+            self._unnamed_operation = None
+
+        self._apply_parsed()
+        return self.target_project, self.all_success
+
+    def apply(self) -> tuple[CodeProject, bool]:
+        return self.finish()
+
+    def _feed_line(self, line: str):
+        # positions are line numbers
+        self._lines.append(line)
+        kind = _marker_kind(line)
+        if kind is not None:
+            i = len(self._lines) - 1
+            self._parse_line(i, i + 1, kind)
+
+    def _block_text(self, start: int, stop: int) -> str:
+        return "".join(line + "\n" for line in self._lines[start:stop])
+
+    def _start_block(self, line_start: int, next_line_start: int):
+        if line_start == 0:
+            self._first_line_block = True
+            self._search_group.append((None, next_line_start))
+            return
+        file_name = self.parse_file_name(self._lines[line_start - 1])
+        if file_name is not None:
+            self._search_group.append((file_name, next_line_start))
+
+    def _add_operation(
+        self, file_name: str | None, search_block: str, replace_block: str
+    ):
+        super()._add_operation(file_name or "", search_block, replace_block)
+        if file_name is None:
+            self._unnamed_operation = self.file_operations[-1]
+
+    def _apply_parsed(self) -> list[FileOperation]:
+        # apply the parsed operations in order, once the file names are known
+        if self._unnamed_operation is not None:
+            return []
+        applied = self.file_operations[self._n_applied :]
+        self._n_applied = len(self.file_operations)
+        for file_operation in applied:
+            self.apply_operation(self.target_project, file_operation)
+        return applied
@@ -0,0 +1,75 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from gs_common.CodeProject import CodeProject
+from gs_common.project_delta import make_delta
+
+
+class ProjectDeltaSender:
+    """
+    Candidates derived from a base project (e.g. the translations of a source
+    project, which usually change a few files) are sent to the code executor as
+    ProjectDeltas against the base instead of complete projects.
+    The base is sent with the first request only; the code executor caches it
+    and later requests only send its hash. The code executor answers with
+    missing_base if it does not have the base (evicted, restarted or another
+    replica), the request is then sent again with the base.
+    """
+
+    # None = send complete projects (see configure)
+    default: "ProjectDeltaSender" = None
+
+    def __init__(self, max_bases: int = 64):
+        self.max_bases = max_bases
+        self._lock = threading.Lock()
+        # hashes of the bases sent to the code executor, least recent first
+        self._sent: OrderedDict[str, None] = OrderedDict()
+
+    @staticmethod
+    def configure(config: dict):
+        if not config["code_executor_project_deltas"]:
+            ProjectDeltaSender.default = None
+            return
+        if ProjectDeltaSender.default is not None:
+            return
+        logging.info("Sending candidates to the code executor as project deltas")
+        ProjectDeltaSender.default = ProjectDeltaSender()
+
+    @staticmethod
+    def delta_fields(
+        fields: dict, base_project: CodeProject, base_hash: str
+    ) -> dict | None:
+        """
+        The request fields with projects (e.g. source_project) or lists of projects
+        (e.g. source_projects) as the delta fields of the code executor
+        (source_project_delta, source_project_deltas). None if a project
+        cannot be sent as a delta (see make_delta).
+        """
+        delta_fields = {}
+        for key, value in fields.items():
+            if isinstance(value, list):
+                deltas = [make_delta(base_project, p, base_hash) for p in value]
+                if None in deltas:
+                    return None
+                delta_fields[f"{key.removesuffix('s')}_deltas"] = deltas
+            else:
+                delta = make_delta(base_project, value, base_hash)
+                if delta is None:
+                    return None
+                delta_fields[f"{key}_delta"] = delta
+        return delta_fields
+
+    def was_sent(self, base_hash: str) -> bool:
+        with self._lock:
+            if base_hash not in self._sent:
+                return False
+            self._sent.move_to_end(base_hash)
+            return True
+
+    def mark_sent(self, base_hash: str):
+        with self._lock:
+            self._sent[base_hash] = None
+            self._sent.move_to_end(base_hash)
+            while len(self._sent) > self.max_bases:
+                self._sent.popitem(last=False)
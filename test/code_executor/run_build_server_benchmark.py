@@ -0,0 +1,71 @@
+import statistics
+import time
+
+from gs_common.file_ops import generate_save_dir
+
+from dataset.util import load_example_project, setup_trace_info_for_testing
+from src.code_executor.build_server import DotnetBuildServer
+from src.code_executor.factories import CodeExecutorFactory
+
+"""
+Benchmark for the dotnet build servers: compile and total time per candidate
+without (cold) and with (warm) a DotnetBuildServer, on the dataset projects.
+Needs the dotnet sdk and the dataset.
+Run with: pytest test/code_executor/run_build_server_benchmark.py -s
+"""
+
+N_CANDIDATES = 5
+PROJECTS = ["QRCoder", "Hashids.net-v112"]
+CONFIG_DOTNET8 = {
+    "source_language": "dotnet8",
+    "testing_framework": "nunit",
+}
+
+setup_trace_info_for_testing()
+
+
+def run_candidates(project_name: str) -> tuple[list[float], list[float]]:
+    compile_times = []
+    total_times = []
+    for _ in range(N_CANDIDATES):
+        source_project = load_example_project(project_name, "dotnet8")
+        test_project = load_example_project(
+            project_name + "-GSTests", "nunit_unittests"
+        )
+        ce = CodeExecutorFactory.create(
+            CONFIG_DOTNET8,
+            source_project,
+            test_project,
+            save_dir=generate_save_dir("benchmark-build-server"),
+        )
+        t0 = time.time()
+        result = ce.execute()
+        total_times.append(time.time() - t0)
+        compile_times.append(ce.compile_time)
+        assert result.failed_tests == 0
+    return compile_times, total_times
+
+
+def test_build_server_benchmark(tmp_path):
+    try:
+        for project_name in PROJECTS:
+            for enabled in [False, True]:
+                build_server = DotnetBuildServer(
+                    enabled,
+                    str(tmp_path / "server"),
+                    max_builds=100,
+                    max_memory_mb=8192,
+                )
+                DotnetBuildServer.default = build_server
+                compile_times, total_times = run_candidates(project_name)
+                mode = "warm" if enabled else "cold"
+                print(
+                    f"{project_name:>20} {mode}: "
+                    f"compile first {compile_times[0]:6.2f}s, "
+                    f"median {statistics.median(compile_times):6.2f}s; "
+                    f"total median {statistics.median(total_times):6.2f}s"
+                )
+                if enabled:
+                    build_server.shutdown()
+    finally:
+        DotnetBuildServer.default = None
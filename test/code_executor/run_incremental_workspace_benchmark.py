@@ -0,0 +1,81 @@
+import statistics
+import time
+
+from gs_common.file_ops import generate_save_dir
+
+from dataset.util import load_example_project, setup_trace_info_for_testing
+from src.code_executor.factories import CodeExecutorFactory
+from src.code_executor.incremental_workspaces import IncrementalWorkspaces
+
+"""
+Benchmark for the incremental workspaces: compile and total time per candidate
+with full builds and with incremental builds in a workspace. The candidates are
+the dataset project with a small change in one source file each, like the
+translations of the TL picker. The first incremental build is the baseline.
+Needs the dotnet sdk and the dataset.
+Run with: pytest test/code_executor/run_incremental_workspace_benchmark.py -s
+"""
+
+N_CANDIDATES = 5
+PROJECTS = ["QRCoder", "Hashids.net-v112"]
+CONFIG_DOTNET8 = {
+    "source_language": "dotnet8",
+    "testing_framework": "nunit",
+}
+
+setup_trace_info_for_testing()
+
+
+def make_candidate(project_name: str, i: int):
+    source_project = load_example_project(project_name, "dotnet8")
+    # small change of one file: a comment, so the tests still pass
+    for file in source_project.files:
+        if file.file_name.endswith(".cs"):
+            source_project.add_file(
+                file_name=file.file_name,
+                source_code=file.source_code + f"\n// candidate {i}\n",
+            )
+            break
+    test_project = load_example_project(project_name + "-GSTests", "nunit_unittests")
+    return source_project, test_project
+
+
+def run_candidates(project_name: str) -> tuple[list[float], list[float]]:
+    compile_times = []
+    total_times = []
+    for i in range(N_CANDIDATES):
+        source_project, test_project = make_candidate(project_name, i)
+        ce = CodeExecutorFactory.create(
+            CONFIG_DOTNET8,
+            source_project,
+            test_project,
+            save_dir=generate_save_dir("benchmark-incremental-workspace"),
+        )
+        t0 = time.time()
+        result = ce.execute()
+        total_times.append(time.time() - t0)
+        compile_times.append(ce.compile_time)
+        assert result.failed_tests == 0
+    return compile_times, total_times
+
+
+def test_incremental_workspace_benchmark(tmp_path):
+    try:
+        for project_name in PROJECTS:
+            for incremental in [False, True]:
+                IncrementalWorkspaces.default = (
+                    IncrementalWorkspaces(str(tmp_path / project_name), 2, 16)
+                    if incremental
+                    else None
+                )
+                compile_times, total_times = run_candidates(project_name)
+                mode = "incremental" if incremental else "full"
+                print(
+                    f"{project_name:>20} {mode:>11}: "
+                    f"compile per candidate "
+                    f"{' '.join(f'{t:6.2f}s' for t in compile_times)}, "
+                    f"median after first {statistics.median(compile_times[1:]):6.2f}s; "
+                    f"total median {statistics.median(total_times):6.2f}s"
+                )
+    finally:
+        IncrementalWorkspaces.default = None
@@ -0,0 +1,63 @@
+import statistics
+import time
+
+from gs_common.file_ops import generate_save_dir
+
+from dataset.util import load_example_project, setup_trace_info_for_testing
+from src.code_executor.factories import CodeExecutorFactory
+from src.code_executor.java_build_daemons import JavaBuildDaemons
+
+"""
+Benchmark for the java build daemons: wall-clock time per candidate with cold
+builds (new JVM per build) and with warm gradle daemons / mvnd, on the java
+dataset projects. Needs the jdk, gradle (and mvnd) and the dataset.
+Run with: pytest test/code_executor/run_java_build_daemon_benchmark.py -s
+"""
+
+N_CANDIDATES = 5
+PROJECTS = [
+    ("spring-boot-payroll-example", "java8"),
+    ("hql-criteria", "java21"),
+]
+
+
+def run_candidates(project_name: str, language: str) -> list[float]:
+    times = []
+    for _ in range(N_CANDIDATES):
+        source_project = load_example_project(project_name, language)
+        test_project = load_example_project(
+            project_name + "-GSTests", "junit_unittests"
+        )
+        ce = CodeExecutorFactory.create(
+            {"source_language": language, "testing_framework": "junit"},
+            source_project,
+            test_project,
+            save_dir=generate_save_dir("benchmark-java-build-daemon"),
+        )
+        t0 = time.time()
+        result = ce.execute()
+        times.append(time.time() - t0)
+        assert result.failed_tests == 0
+    return times
+
+
+def test_java_build_daemon_benchmark():
+    setup_trace_info_for_testing()
+    try:
+        for project_name, language in PROJECTS:
+            medians = {}
+            for enabled in [False, True]:
+                JavaBuildDaemons.default = JavaBuildDaemons(enabled, {}, max_failures=1)
+                times = run_candidates(project_name, language)
+                mode = "warm" if enabled else "cold"
+                medians[mode] = statistics.median(times)
+                print(
+                    f"{project_name:>30} {mode}: first {times[0]:6.2f}s, "
+                    f"median {medians[mode]:6.2f}s"
+                )
+            print(
+                f"{project_name:>30} wall-clock saved per candidate: "
+                f"{medians['cold'] - medians['warm']:6.2f}s"
+            )
+    finally:
+        JavaBuildDaemons.default = None
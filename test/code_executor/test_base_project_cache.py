@@ -0,0 +1,40 @@
+from gs_common.CodeProject import CodeFile, CodeProject
+
+from src.code_executor.base_project_cache import BaseProjectCache
+
+
+def make_project(name: str, size: int) -> CodeProject:
+    return CodeProject(
+        display_name=name,
+        files=[CodeFile(file_name=f"{name}.cs", source_code="x" * size)],
+    )
+
+
+def test_put_get():
+    cache = BaseProjectCache(max_size_bytes=1000)
+    project = make_project("Fib", 100)
+    base_hash = cache.put(project)
+
+    assert base_hash == project.content_hash(normalize=False)
+    assert cache.get(base_hash) is project
+    assert cache.get("unknown") is None
+
+
+def test_least_recently_used_is_evicted():
+    cache = BaseProjectCache(max_size_bytes=1000)
+    hashes = [cache.put(make_project(f"P{i}", 400)) for i in range(2)]
+    # P0 is used again -> P1 is evicted
+    cache.get(hashes[0])
+    cache.put(make_project("P2", 400))
+
+    assert cache.get(hashes[0]) is not None
+    assert cache.get(hashes[1]) is None
+
+
+def test_base_larger_than_cache_is_kept():
+    cache = BaseProjectCache(max_size_bytes=100)
+    cache.put(make_project("Small", 10))
+    base_hash = cache.put(make_project("Large", 1000))
+
+    assert cache.get(base_hash) is not None
+    assert len(cache._bases) == 1
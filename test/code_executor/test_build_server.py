@@ -0,0 +1,93 @@
+import subprocess
+
+from src.code_executor.build_server import DotnetBuildServer
+
+
+class FakeRun:
+    def __init__(self, stdout: str = "Build succeeded."):
+        self.stdout = stdout
+        self.calls = []
+
+    def __call__(self, command, **kwargs):
+        self.calls.append((command, kwargs))
+        return subprocess.CompletedProcess(command, 0, self.stdout, "")
+
+    @property
+    def commands(self) -> list[str]:
+        return [" ".join(command) for command, _ in self.calls]
+
+
+def make_build_server(tmp_path, enabled=True, max_builds=100, memory_mb=100.0):
+    fake_run = FakeRun()
+    build_server = DotnetBuildServer(
+        enabled,
+        str(tmp_path / "server"),
+        max_builds=max_builds,
+        max_memory_mb=1000,
+        run=fake_run,
+        memory_mb=lambda: memory_mb,
+    )
+    return build_server, fake_run
+
+
+def test_warm_builds_share_the_server_dir(tmp_path):
+    build_server, fake_run = make_build_server(tmp_path)
+    for job in ["a", "b"]:
+        build_server.run(["dotnet", "build"], cwd=".", env={"TMPDIR": job}, timeout=60)
+
+    assert fake_run.commands == ["dotnet build", "dotnet build"]
+    for _, kwargs in fake_run.calls:
+        assert kwargs["env"]["TMPDIR"] == build_server.server_dir
+        assert kwargs["env"]["DOTNET_CLI_USE_MSBUILD_SERVER"] == "1"
+
+
+def test_cold_builds_disable_build_servers(tmp_path):
+    build_server, fake_run = make_build_server(tmp_path, enabled=False)
+    build_server.run(["dotnet", "test"], cwd=".", env={"TMPDIR": "job"}, timeout=60)
+
+    assert fake_run.commands == ["dotnet test --disable-build-servers"]
+    assert fake_run.calls[0][1]["env"]["TMPDIR"] == "job"
+
+
+def test_warm_tests_keep_the_job_temp_dir(tmp_path):
+    build_server, fake_run = make_build_server(tmp_path)
+    build_server.run(["dotnet", "build"], cwd=".", env={"TMPDIR": "job"}, timeout=60)
+    build_server.run(["dotnet", "test"], cwd=".", env={"TMPDIR": "job"}, timeout=60)
+
+    assert fake_run.commands == ["dotnet build", "dotnet test --disable-build-servers"]
+    test_env = fake_run.calls[1][1]["env"]
+    assert test_env["TMPDIR"] == "job"
+    assert test_env["DOTNET_CLI_USE_MSBUILD_SERVER"] == "0"
+    assert build_server.n_builds == 1
+
+
+def test_recycle_after_max_builds(tmp_path):
+    build_server, fake_run = make_build_server(tmp_path, max_builds=2)
+    for _ in range(3):
+        build_server.run(["dotnet", "build"], cwd=".", env=None, timeout=60)
+
+    assert fake_run.commands == [
+        "dotnet build",
+        "dotnet build",
+        "dotnet build-server shutdown",
+        "dotnet build",
+    ]
+    assert build_server.n_recycles == 1
+    assert build_server.n_builds == 1
+
+
+def test_recycle_on_memory_growth(tmp_path):
+    build_server, fake_run = make_build_server(tmp_path, memory_mb=2000.0)
+    build_server.run(["dotnet", "build"], cwd=".", env=None, timeout=60)
+    assert build_server.recycle_reason == "2000 MB memory"
+
+    build_server.run(["dotnet", "build"], cwd=".", env=None, timeout=60)
+    assert fake_run.commands[1] == "dotnet build-server shutdown"
+
+
+def test_recycle_on_crashed_node(tmp_path):
+    build_server, fake_run = make_build_server(tmp_path)
+    fake_run.stdout = "error MSB4166: Child node exited prematurely."
+    build_server.run(["dotnet", "build"], cwd=".", env=None, timeout=60)
+
+    assert build_server.recycle_reason == "crashed build node"
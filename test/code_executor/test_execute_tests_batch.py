@@ -0,0 +1,215 @@
+import json
+import time
+
+import pytest
+from dapr.ext.grpc import InvokeMethodRequest
+from gs_common.CodeProject import CodeFile, CodeProject, ExecutionResult
+from gs_common.project_delta import make_delta
+from gs_common.wire_format import WireFormat
+
+import src.code_executor.main as code_executor_main
+from src.code_executor.base_project_cache import BaseProjectCache
+from src.code_executor.executor_scheduler import (
+    JOB_KINDS,
+    ExecutorBusyError,
+    ExecutorScheduler,
+)
+
+
+def make_project(display_name: str, source_code: str) -> CodeProject:
+    return CodeProject(
+        display_name=display_name,
+        source_language="dotnet8",
+        files=[CodeFile(file_name=f"{display_name}.cs", source_code=source_code)],
+    )
+
+
+def execute_tests_batch(data: dict) -> list[dict | None]:
+    data["target_language"] = "dotnet8"
+    request = InvokeMethodRequest(data=json.dumps(data).encode(), content_type="")
+    request.metadata = (("traceparent", "00-trace-span-01"),)
+    # app.method only registers the handler, it does not return it
+    handler = code_executor_main.app._servicer._invoke_method_map["execute_tests_batch"]
+    return json.loads(handler(request).text())["results"]
+
+
+def execute_tests_batch_encoded(data: dict) -> dict:
+    data["target_language"] = "dotnet8"
+    request = InvokeMethodRequest(
+        data=WireFormat(compress=False).encode(data), content_type=""
+    )
+    request.metadata = (("traceparent", "00-trace-span-01"),)
+    handler = code_executor_main.app._servicer._invoke_method_map["execute_tests_batch"]
+    return json.loads(handler(request).text())
+
+
+class FakeCodeExecutor:
+    def __init__(self, source_project: CodeProject, test_project: CodeProject):
+        self.source_project = source_project
+        self.test_project = test_project
+
+    def execute(self) -> ExecutionResult:
+        executed.append(
+            (self.test_project.display_name, self.source_project.files[0].source_code)
+        )
+        # formatting changes the project in place
+        self.source_project.files[0].source_code = "formatted"
+        time.sleep(0.05)
+        failed_tests = int(self.test_project.files[0].source_code)
+        return ExecutionResult(
+            total_tests=2,
+            passed_tests=2 - failed_tests,
+            failed_tests=failed_tests,
+            test_output=self.test_project.display_name,
+        )
+
+
+executed = []
+
+
+@pytest.fixture(autouse=True)
+def fake_executor(monkeypatch):
+    # one worker: the candidates run one after another
+    monkeypatch.setattr(
+        ExecutorScheduler,
+        "default",
+        ExecutorScheduler({kind: 1 for kind in JOB_KINDS}, 8, 10),
+    )
+    monkeypatch.setattr(
+        code_executor_main.CodeExecutorFactory,
+        "create",
+        lambda config, source, test, *args: FakeCodeExecutor(source, test),
+    )
+    executed.clear()
+
+
+def test_one_source_many_tests():
+    source_project = make_project("Fib", "class Fib {}")
+    test_projects = [make_project(f"Tests{i}", str(i % 2)) for i in range(3)]
+    results = execute_tests_batch(
+        {
+            "source_project": source_project.model_dump(),
+            "test_projects": [p.model_dump() for p in test_projects],
+        }
+    )
+
+    assert [r["test_output"] for r in results] == ["Tests0", "Tests1", "Tests2"]
+    assert [r["success"] for r in results] == ["true", "false", "true"]
+    # every candidate got its own copy of the shared source project
+    assert [source_code for _, source_code in executed] == ["class Fib {}"] * 3
+
+
+def test_accept_stops_starting_candidates():
+    test_project = make_project("FibTests", "0")
+    source_projects = [make_project("Fib", f"class Fib{i} {{}}") for i in range(3)]
+    results = execute_tests_batch(
+        {
+            "source_projects": [p.model_dump() for p in source_projects],
+            "test_project": test_project.model_dump(),
+            "accept": {"max_failed_tests": 0, "min_passed_tests": 1},
+        }
+    )
+
+    assert results[0]["success"] == "true"
+    assert results[2] is None
+    assert len(executed) < 3
+
+
+def test_candidates_as_deltas(monkeypatch):
+    monkeypatch.setattr(BaseProjectCache, "default", BaseProjectCache(1024 * 1024))
+    test_project = make_project("FibTests", "0")
+    base_project = make_project("Fib", "class Fib {}")
+    source_projects = [make_project("Fib", f"class Fib{i} {{}}") for i in range(2)]
+    deltas = [make_delta(base_project, p) for p in source_projects]
+
+    response = execute_tests_batch_encoded(
+        {
+            "base_project": base_project,
+            "source_project_deltas": deltas,
+            "test_project": test_project,
+        }
+    )
+    assert [r["success"] for r in response["results"]] == ["true", "true"]
+
+    # the base is cached, its hash is enough
+    response = execute_tests_batch_encoded(
+        {
+            "base_hash": base_project.content_hash(normalize=False),
+            "source_project_deltas": deltas,
+            "test_project": test_project,
+        }
+    )
+    assert [r["success"] for r in response["results"]] == ["true", "true"]
+    assert [source_code for _, source_code in executed] == [
+        "class Fib0 {}",
+        "class Fib1 {}",
+    ] * 2
+    # formatting the candidates did not change the cached base
+    assert BaseProjectCache.default.get(deltas[0].base_hash) == base_project
+
+
+def test_missing_base(monkeypatch):
+    monkeypatch.setattr(BaseProjectCache, "default", BaseProjectCache(1024 * 1024))
+    base_project = make_project("Fib", "class Fib {}")
+    response = execute_tests_batch_encoded(
+        {
+            "base_hash": base_project.content_hash(normalize=False),
+            "source_project_deltas": [make_delta(base_project, base_project)],
+            "test_project": make_project("FibTests", "0"),
+        }
+    )
+
+    assert response == {"missing_base": True}
+    assert executed == []
+
+
+def test_invalid_delta(monkeypatch):
+    monkeypatch.setattr(BaseProjectCache, "default", BaseProjectCache(1024 * 1024))
+    base_project = make_project("Fib", "class Fib {}")
+    other_base = make_project("Fib", "class Other {}")
+    deltas = [make_delta(other_base, base_project)] * 2
+    response = execute_tests_batch_encoded(
+        {
+            "base_project": base_project,
+            "source_project_deltas": deltas,
+            "test_project": make_project("FibTests", "0"),
+        }
+    )
+
+    assert [r["success"] for r in response["results"]] == ["false", "false"]
+    assert "Invalid project delta" in response["results"][0]["error"]
+    assert executed == []
+
+    request = InvokeMethodRequest(
+        data=WireFormat(compress=False).encode(
+            {
+                "base_project": base_project,
+                "source_project_delta": deltas[0],
+                "test_project": make_project("FibTests", "0"),
+                "target_language": "dotnet8",
+            }
+        ),
+        content_type="",
+    )
+    request.metadata = (("traceparent", "00-trace-span-01"),)
+    handler = code_executor_main.app._servicer._invoke_method_map["execute_tests"]
+    response = json.loads(handler(request).text())
+    assert response["success"] == "false"
+    assert "Invalid project delta" in response["error"]
+
+
+def test_busy_executor(monkeypatch):
+    def create(config, source, test, *args):
+        raise ExecutorBusyError("queue is full")
+
+    monkeypatch.setattr(code_executor_main.CodeExecutorFactory, "create", create)
+    results = execute_tests_batch(
+        {
+            "source_project": make_project("Fib", "class Fib {}").model_dump(),
+            "test_projects": [make_project("FibTests", "0").model_dump()],
+            "accept": {"max_failed_tests": 0, "min_passed_tests": 1},
+        }
+    )
+
+    # distinct from a failed execution, and not cached
+    assert results == [{"busy": True}]
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+from dapr.ext.grpc import InvokeMethodRequest
+from gs_common.CodeProject import CodeFile, CodeProject, ExecutionResult
+
+import src.code_executor.main as code_executor_main
+from src.code_executor.execution_cache import ExecutionCache
+from src.code_executor.executor_scheduler import JOB_KINDS, ExecutorScheduler
+
+
+def make_request(source_code: str) -> InvokeMethodRequest:
+    source_project = CodeProject(
+        display_name="Fib",
+        source_language="dotnet8",
+        files=[CodeFile(file_name="Fib.cs", source_code=source_code)],
+    )
+    test_project = CodeProject(
+        display_name="FibTests",
+        files=[CodeFile(file_name="FibTests.cs", source_code="class FibTests {}")],
+    )
+    data = {
+        "source_project": source_project.model_dump(),
+        "test_project": test_project.model_dump(),
+        "target_language": "dotnet8",
+    }
+    request = InvokeMethodRequest(data=json.dumps(data).encode(), content_type="")
+    request.metadata = (("traceparent", "00-trace-span-01"),)
+    return request
+
+
+def execute_tests(source_code: str) -> dict:
+    # app.method only registers the handler, it does not return it
+    handler = code_executor_main.app._servicer._invoke_method_map["execute_tests"]
+    return json.loads(handler(make_request(source_code)).text())
+
+
+class FakeCodeExecutor:
+    n_executions = 0
+
+    def execute(self) -> ExecutionResult:
+        FakeCodeExecutor.n_executions += 1
+        return ExecutionResult(
+            total_tests=3, passed_tests=2, failed_tests=1, test_output="1 failed"
+        )
+
+
+@pytest.fixture
+def execution_cache(tmp_path, monkeypatch):
+    ExecutionCache.configure(str(tmp_path), ttl_hours=1, max_size_mb=1)
+    monkeypatch.setattr(
+        ExecutorScheduler,
+        "default",
+        ExecutorScheduler({kind: 1 for kind in JOB_KINDS}, 1, 1),
+    )
+    monkeypatch.setattr(
+        code_executor_main.CodeExecutorFactory,
+        "create",
+        lambda *args: FakeCodeExecutor(),
+    )
+    FakeCodeExecutor.n_executions = 0
+    yield ExecutionCache.default
+    ExecutionCache.default = None
+
+
+def test_execute_tests_uses_cache(execution_cache):
+    response = execute_tests("class Fib {}")
+    cached_response = execute_tests("class Fib {}")
+    assert FakeCodeExecutor.n_executions == 1
+    assert cached_response == response
+    assert response["failed_tests"] == 1
+
+    # whitespace changes are executed again
+    execute_tests("class Fib { }")
+    assert FakeCodeExecutor.n_executions == 2
+
+
+def test_execute_tests_does_not_cache_errors(execution_cache, monkeypatch):
+    def create(*args):
+        raise ValueError("Config not supported")
+
+    monkeypatch.setattr(code_executor_main.CodeExecutorFactory, "create", create)
+    assert execute_tests("class Fib {}")["error"] == "Config not supported"
+
+    monkeypatch.setattr(
+        code_executor_main.CodeExecutorFactory,
+        "create",
+        lambda *args: FakeCodeExecutor(),
+    )
+    assert execute_tests("class Fib {}")["error"] == ""
+    assert FakeCodeExecutor.n_executions == 1
@@ -0,0 +1,66 @@
+import os
+import threading
+import time
+
+import pytest
+
+from src.code_executor.executor_scheduler import ExecutorBusyError, ExecutorScheduler
+
+
+def make_scheduler(n_workers: int, max_queue_depth: int, queue_timeout: float = 5):
+    return ExecutorScheduler({"dotnet8": n_workers}, max_queue_depth, queue_timeout)
+
+
+def test_job_limits_concurrency(tmp_path):
+    scheduler = make_scheduler(n_workers=2, max_queue_depth=10)
+    max_running = 0
+
+    def run_job(i: int):
+        nonlocal max_running
+        with scheduler.job("dotnet8", str(tmp_path / str(i))):
+            max_running = max(max_running, scheduler.n_running("dotnet8"))
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=run_job, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max_running == 2
+    assert scheduler.n_running("dotnet8") == 0
+    assert scheduler.n_queued("dotnet8") == 0
+
+
+def test_job_rejected_if_queue_is_full(tmp_path):
+    scheduler = make_scheduler(n_workers=1, max_queue_depth=0)
+    with scheduler.job("dotnet8", str(tmp_path / "a")):
+        with pytest.raises(ExecutorBusyError):
+            with scheduler.job("dotnet8", str(tmp_path / "b")):
+                pass
+    # worker is free again
+    with scheduler.job("dotnet8", str(tmp_path / "c")):
+        pass
+
+
+def test_job_rejected_after_queue_timeout(tmp_path):
+    scheduler = make_scheduler(n_workers=1, max_queue_depth=1, queue_timeout=0.05)
+    with scheduler.job("dotnet8", str(tmp_path / "a")):
+        with pytest.raises(ExecutorBusyError):
+            with scheduler.job("dotnet8", str(tmp_path / "b")):
+                pass
+    assert scheduler.n_queued("dotnet8") == 0
+
+
+def test_job_has_isolated_temp_dir(tmp_path):
+    scheduler = make_scheduler(n_workers=2, max_queue_depth=0)
+    with scheduler.job("dotnet8", str(tmp_path / "a")) as job_a:
+        with scheduler.job("dotnet8", str(tmp_path / "b")) as job_b:
+            assert job_a.env["TMPDIR"] != job_b.env["TMPDIR"]
+            assert os.path.isdir(job_a.env["TMPDIR"])
+            assert job_a.env["TMPDIR"].startswith(str(tmp_path / "a"))
+            assert job_a.env["NUGET_SCRATCH"] == job_b.env["NUGET_SCRATCH"]
+
+    with pytest.raises(ValueError):
+        with scheduler.job("cobol", str(tmp_path / "c")):
+            pass
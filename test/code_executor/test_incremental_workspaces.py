@@ -0,0 +1,152 @@
+import os
+import subprocess
+
+import pytest
+from gs_common.CodeProject import CodeFile, CodeProject
+
+import src.code_executor.nunit_program as nunit_program
+from src.code_executor.incremental_workspaces import IncrementalWorkspaces, sync_dir
+from src.code_executor.nunit_program import NUnitProgram
+
+SOURCE_CSPROJ = """\
+<Project Sdk="Microsoft.NET.Sdk">
+  <PropertyGroup>
+    <TargetFramework>net8.0</TargetFramework>
+  </PropertyGroup>
+</Project>
+"""
+
+TEST_CSPROJ = """\
+<Project Sdk="Microsoft.NET.Sdk">
+  <PropertyGroup>
+    <TargetFramework>placeholder</TargetFramework>
+  </PropertyGroup>
+  <ItemGroup>
+    <ProjectReference Include="placeholder" />
+  </ItemGroup>
+</Project>
+"""
+
+
+def write(path, content: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def make_projects(fib_code: str) -> tuple[CodeProject, CodeProject]:
+    source_project = CodeProject(
+        display_name="Fib",
+        source_language="dotnet8",
+        files=[
+            CodeFile(file_name="Fib.csproj", source_code=SOURCE_CSPROJ),
+            CodeFile(file_name="Fib.cs", source_code=fib_code),
+            CodeFile(file_name="Util.cs", source_code="class Util {}"),
+        ],
+    )
+    test_project = CodeProject(
+        display_name="Fib-GSTests",
+        files=[
+            CodeFile(file_name="Fib-GSTests.csproj", source_code=TEST_CSPROJ),
+            CodeFile(file_name="FibTests.cs", source_code="class FibTests {}"),
+        ],
+    )
+    return source_project, test_project
+
+
+def test_sync_dir_keeps_build_outputs(tmp_path):
+    source_dir, target_dir = tmp_path / "source", tmp_path / "target"
+    write(source_dir / "A.cs", "class A {}")
+    write(source_dir / "B.cs", "class B {}")
+    sync_dir(str(source_dir), str(target_dir))
+    write(target_dir / "obj" / "project.assets.json", "{}")
+    write(target_dir / "bin" / "A.dll", "dll")
+    write(target_dir / "TestResults" / "test_results.xml", "<test-run />")
+    os.utime(target_dir / "B.cs", (0, 0))
+
+    write(source_dir / "A.cs", "class A { int a; }")
+    n_changed = sync_dir(str(source_dir), str(target_dir))
+
+    assert n_changed == 2
+    assert (target_dir / "A.cs").read_text() == "class A { int a; }"
+    # unchanged file not written, so MSBuild does not rebuild it
+    assert os.stat(target_dir / "B.cs").st_mtime == 0
+    assert (target_dir / "obj" / "project.assets.json").exists()
+    assert (target_dir / "bin" / "A.dll").exists()
+    assert not (target_dir / "TestResults" / "test_results.xml").exists()
+
+
+def test_workspace_is_reused(tmp_path):
+    workspaces = IncrementalWorkspaces(str(tmp_path), 2, 16)
+    first = workspaces.acquire("a")
+    second = workspaces.acquire("a")
+    assert first.path != second.path
+    # max_per_project workspaces in use
+    assert workspaces.acquire("a") is None
+
+    workspaces.release(first)
+    assert workspaces.acquire("a") is first
+    assert first.n_builds == 1
+
+
+def test_least_recently_used_workspace_is_removed(tmp_path):
+    workspaces = IncrementalWorkspaces(str(tmp_path), 2, 2)
+    a, b = workspaces.acquire("a"), workspaces.acquire("b")
+    # no idle workspace to remove
+    assert workspaces.acquire("c") is None
+
+    workspaces.release(a)
+    workspaces.release(b)
+    c = workspaces.acquire("c")
+    assert c is not None
+    assert not os.path.exists(a.path)
+    assert os.path.exists(b.path)
+
+
+def test_workspace_of_interrupted_build_is_removed(tmp_path):
+    workspaces = IncrementalWorkspaces(str(tmp_path), 2, 16)
+    workspace = workspaces.acquire("a")
+    workspace.clean = False
+    workspaces.release(workspace)
+    assert not os.path.exists(workspace.path)
+    assert workspaces.acquire("a") is not workspace
+
+
+@pytest.fixture
+def commands(tmp_path, monkeypatch):
+    commands = []
+
+    def run(command, cwd, **kwargs):
+        commands.append((command, cwd))
+        return subprocess.CompletedProcess(command, 0, "Build succeeded.", "")
+
+    monkeypatch.setattr(nunit_program.subprocess, "run", run)
+    monkeypatch.setattr(
+        IncrementalWorkspaces,
+        "default",
+        IncrementalWorkspaces(str(tmp_path / "workspaces"), 2, 16),
+    )
+    return commands
+
+
+def test_candidates_are_built_in_one_workspace(tmp_path, commands):
+    workspace_paths = []
+    for i, fib_code in enumerate(["class Fib {}", "class Fib { int n; }"]):
+        source_project, test_project = make_projects(fib_code)
+        program = NUnitProgram(source_project, test_project, str(tmp_path / f"e{i}"))
+        if i == 0:
+            write(os.path.join(program.source_project_dir, "obj", "Fib.dll"), "dll")
+        program.compile()
+        workspace_paths.append(program.workspace.path)
+        program.close()
+        assert program.workspace is None
+
+    assert workspace_paths[0] == workspace_paths[1]
+    source_dir = os.path.join(workspace_paths[0], "Fib")
+    with open(os.path.join(source_dir, "Fib.cs")) as f:
+        assert f.read() == "class Fib { int n; }"
+    # build outputs of the first candidate are kept for the second
+    assert os.path.exists(os.path.join(source_dir, "obj", "Fib.dll"))
+    assert [c[1] for c in commands] == [
+        os.path.join(workspace_paths[0], "Fib-GSTests")
+    ] * 2
@@ -0,0 +1,72 @@
+import subprocess
+
+from src.code_executor.java_build_daemons import JavaBuildDaemons
+from src.code_executor.junit_program import GRADLE_CONFIG, MAVEN_CONFIG
+
+
+class FakeRunBuild:
+    """
+    Runs a build; the daemon builds fail with daemon_output if it is set.
+    """
+
+    def __init__(self, daemon_output: str = ""):
+        self.daemon_output = daemon_output
+        self.calls = []
+
+    def __call__(self, command, cwd, env):
+        self.calls.append((command, env))
+        stdout = "BUILD SUCCESSFUL"
+        if "--daemon" in command and self.daemon_output:
+            stdout = self.daemon_output
+        return subprocess.CompletedProcess(command, 0, stdout, "")
+
+
+def make_daemons(installed=("gradle", "mvn", "mvnd"), **java_homes):
+    return JavaBuildDaemons(
+        True,
+        java_homes,
+        max_failures=2,
+        which=lambda tool: f"/usr/bin/{tool}" if tool in installed else None,
+    )
+
+
+def test_daemon_build_with_jdk_of_language():
+    daemons = make_daemons(java21="/opt/jdk21")
+    run_build = FakeRunBuild()
+    command, process_result = daemons.run(
+        GRADLE_CONFIG, "java21", ".", {"JAVA_HOME": "/opt/jdk8"}, run_build
+    )
+
+    assert command == GRADLE_CONFIG["daemon_command"]
+    assert run_build.calls[0][1]["JAVA_HOME"] == "/opt/jdk21"
+    assert process_result.stdout == "BUILD SUCCESSFUL"
+
+
+def test_cold_build_if_daemon_fails():
+    daemons = make_daemons()
+    run_build = FakeRunBuild("Gradle build daemon disappeared unexpectedly")
+    for _ in range(3):
+        command, process_result = daemons.run(
+            GRADLE_CONFIG, "java8", ".", None, run_build
+        )
+        assert command == GRADLE_CONFIG["command"]
+        assert process_result.stdout == "BUILD SUCCESSFUL"
+
+    # warm mode is disabled after 2 failures in a row
+    assert [call[0][-1] for call in run_build.calls] == [
+        "--daemon",
+        "--no-daemon",
+        "--daemon",
+        "--no-daemon",
+        "--no-daemon",
+    ]
+    assert "gradle" in daemons.disabled
+
+
+def test_cold_build_if_mvnd_is_not_installed():
+    daemons = make_daemons(installed=("mvn",))
+    run_build = FakeRunBuild()
+    command, _ = daemons.run(MAVEN_CONFIG, "java21", ".", None, run_build)
+
+    assert command == ["mvn", "test"]
+    assert len(run_build.calls) == 1
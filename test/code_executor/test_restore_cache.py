@@ -0,0 +1,110 @@
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+from src.code_executor.restore_cache import RestoreCache
+
+PACKAGES_CONFIG = """\
+<?xml version="1.0" encoding="utf-8"?>
+<packages>
+  <package id="Newtonsoft.Json" version="13.0.3" targetFramework="net48" />
+</packages>
+"""
+
+
+class FakeRestore:
+    def __init__(self, size: int = 10, delay: float = 0.0):
+        self.size = size
+        self.delay = delay
+        self.n_restores = 0
+
+    def __call__(self, packages_dir: str):
+        self.n_restores += 1
+        time.sleep(self.delay)
+        os.makedirs(os.path.join(packages_dir, "Newtonsoft.Json.13.0.3"))
+        with open(
+            os.path.join(packages_dir, "Newtonsoft.Json.13.0.3", "lib.dll"), "wb"
+        ) as f:
+            f.write(b"0" * self.size)
+
+
+def make_cache(tmp_path, ttl_seconds=3600, max_size_bytes=1024) -> RestoreCache:
+    return RestoreCache(str(tmp_path / "cache"), ttl_seconds, max_size_bytes)
+
+
+def test_restore_once_per_dependency_file(tmp_path):
+    cache = make_cache(tmp_path)
+    restore = FakeRestore(delay=0.05)
+    packages_dirs = []
+
+    def build(i: int):
+        target_dir = str(tmp_path / f"exec{i}" / "packages")
+        os.makedirs(os.path.dirname(target_dir))
+        # whitespace changes do not matter
+        packages_config = PACKAGES_CONFIG.replace("  ", " " * (i % 3))
+        with cache.linked("nuget", packages_config, restore, target_dir):
+            packages_dirs.append(os.path.realpath(target_dir))
+            assert os.path.isfile(
+                os.path.join(target_dir, "Newtonsoft.Json.13.0.3", "lib.dll")
+            )
+
+    threads = [threading.Thread(target=build, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert restore.n_restores == 1
+    assert len(packages_dirs) == 4
+    assert len(set(packages_dirs)) == 1
+    # entries are read-only
+    dll = os.path.join(packages_dirs[0], "Newtonsoft.Json.13.0.3", "lib.dll")
+    assert not os.stat(dll).st_mode & stat.S_IWUSR
+
+
+def test_failed_restore_is_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+
+    def failing_restore(packages_dir: str):
+        os.makedirs(packages_dir)
+        raise Exception("nuget error")
+
+    with pytest.raises(Exception, match="nuget error"):
+        with cache.restored("nuget", PACKAGES_CONFIG, failing_restore):
+            pass
+    assert os.listdir(tmp_path / "cache" / "nuget") == []
+
+    restore = FakeRestore()
+    with cache.restored("nuget", PACKAGES_CONFIG, restore):
+        pass
+    assert restore.n_restores == 1
+
+
+def test_evict_by_size_keeps_entries_in_use(tmp_path):
+    cache = make_cache(tmp_path, max_size_bytes=150)
+    with cache.restored("nuget", "a", FakeRestore(size=100)) as entry_a:
+        # a is in use and therefore kept, b is removed again
+        with cache.restored("nuget", "b", FakeRestore(size=100)) as entry_b:
+            pass
+        cache.evict()
+        assert os.path.isdir(entry_a)
+        assert not os.path.isdir(entry_b)
+
+    # least recently used entry a is removed
+    with cache.restored("nuget", "c", FakeRestore(size=100)) as entry_c:
+        pass
+    assert not os.path.isdir(entry_a)
+    assert os.path.isdir(entry_c)
+
+
+def test_evict_by_age(tmp_path):
+    cache = make_cache(tmp_path, ttl_seconds=60)
+    with cache.restored("nuget", "a", FakeRestore()) as entry_a:
+        pass
+    os.utime(entry_a, (time.time() - 120, time.time() - 120))
+
+    cache.evict()
+    assert not os.path.exists(entry_a)
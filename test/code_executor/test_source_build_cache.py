@@ -0,0 +1,125 @@
+import os
+import subprocess
+import threading
+import time
+
+import pytest
+from gs_common.CodeProject import CodeFile, CodeProject
+
+import src.code_executor.nunit_program as nunit_program
+from src.code_executor.nunit_program import NUnitProgram
+from src.code_executor.source_build_cache import SourceBuildCache
+
+SOURCE_CSPROJ = """\
+<Project Sdk="Microsoft.NET.Sdk">
+  <PropertyGroup>
+    <TargetFramework>net8.0</TargetFramework>
+  </PropertyGroup>
+</Project>
+"""
+
+TEST_CSPROJ = """\
+<Project Sdk="Microsoft.NET.Sdk">
+  <PropertyGroup>
+    <TargetFramework>placeholder</TargetFramework>
+  </PropertyGroup>
+  <ItemGroup>
+    <ProjectReference Include="placeholder" />
+  </ItemGroup>
+</Project>
+"""
+
+
+def make_projects(test_name: str) -> tuple[CodeProject, CodeProject]:
+    source_project = CodeProject(
+        display_name="Fib",
+        source_language="dotnet8",
+        files=[
+            CodeFile(file_name="Fib.csproj", source_code=SOURCE_CSPROJ),
+            CodeFile(file_name="Fib.cs", source_code="class Fib {}"),
+        ],
+    )
+    test_project = CodeProject(
+        display_name="Fib-GSTests",
+        files=[
+            CodeFile(file_name="Fib-GSTests.csproj", source_code=TEST_CSPROJ),
+            CodeFile(
+                file_name=f"{test_name}.cs", source_code=f"class {test_name} {{}}"
+            ),
+        ],
+    )
+    return source_project, test_project
+
+
+@pytest.fixture
+def commands(tmp_path, monkeypatch):
+    commands = []
+
+    def run(command, cwd, **kwargs):
+        commands.append((command, cwd))
+        return subprocess.CompletedProcess(command, 0, "Build succeeded.", "")
+
+    monkeypatch.setattr(nunit_program.subprocess, "run", run)
+    monkeypatch.setattr(
+        SourceBuildCache,
+        "default",
+        SourceBuildCache(str(tmp_path / "cache"), 3600, 1024 * 1024),
+    )
+    return commands
+
+
+def test_source_is_built_once(tmp_path, commands):
+    for i, test_name in enumerate(["FibTests", "OtherFibTests"]):
+        source_project, test_project = make_projects(test_name)
+        program = NUnitProgram(source_project, test_project, str(tmp_path / f"e{i}"))
+        program.compile()
+        assert program.source_is_cached
+
+        with open(os.path.join(program.test_project_dir, "Fib-GSTests.csproj")) as f:
+            test_csproj = f.read()
+        assert str(tmp_path / "cache" / "source") in test_csproj
+
+    source_builds = [c for c in commands if c[0] == ["dotnet", "build"]]
+    test_builds = [
+        c
+        for c in commands
+        if c[0] == ["dotnet", "build", "-p:BuildProjectReferences=false"]
+    ]
+    assert len(source_builds) == 1
+    assert source_builds[0][1].startswith(str(tmp_path / "cache"))
+    assert len(test_builds) == 2
+
+
+def test_failed_source_build_is_not_cached(tmp_path, commands, monkeypatch):
+    def failing_run(command, cwd, **kwargs):
+        commands.append((command, cwd))
+        return subprocess.CompletedProcess(command, 1, "Build FAILED.", "")
+
+    monkeypatch.setattr(nunit_program.subprocess, "run", failing_run)
+    source_project, test_project = make_projects("FibTests")
+    program = NUnitProgram(source_project, test_project, str(tmp_path / "e"))
+    with pytest.raises(Exception, match="dotnet error"):
+        program.compile()
+
+    assert os.listdir(tmp_path / "cache" / "source") == []
+
+
+def test_entry_is_used_by_one_build_at_a_time(tmp_path):
+    cache = SourceBuildCache(str(tmp_path / "cache"), 3600, 1024 * 1024)
+    in_use = []
+    overlaps = []
+
+    def use_entry():
+        with cache.built("class Fib {}", lambda entry_dir: os.makedirs(entry_dir)):
+            overlaps.append(len(in_use))
+            in_use.append(1)
+            time.sleep(0.02)
+            in_use.pop()
+
+    threads = [threading.Thread(target=use_entry) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert overlaps == [0, 0, 0, 0]
@@ -0,0 +1,139 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from gs_common.CodeProject import CodeFile, CodeProject
+
+from src.goat_service.tl_generator.models.openai_tl_gen_llm import OpenAITLGenLLM
+from src.goat_service.tl_generator.prompts.universal_tl_prompter import (
+    UniversalTLPrompter,
+)
+from src.goat_service.utils.generation_listener import current_generation_listener
+
+GENERATIONS = [
+    "Plan: rename\nProgram.cs\n<<<< SEARCH\nclass Program {}\n====\nclass A {}\n>>>> REPLACE\n",
+    "Program.cs\n<<<< SEARCH\nclass Program {}\n====\nclass B {}\n>>>> REPLACE",
+]
+
+
+def make_chunk(index=None, content=None, finish_reason=None, usage=None):
+    choices = []
+    if index is not None:
+        choices.append(
+            SimpleNamespace(
+                index=index,
+                delta=SimpleNamespace(content=content),
+                finish_reason=finish_reason,
+            )
+        )
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class FakeStream:
+    def __init__(self, chunks, events):
+        self.chunks = chunks
+        self.events = events
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(0)
+            for choice in chunk.choices:
+                if choice.finish_reason:
+                    self.events.append(f"finish {choice.index}")
+            yield chunk
+
+
+class FakeCompletions:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.payload = None
+        self.events = []
+
+    async def create(self, **payload):
+        self.payload = payload
+        return FakeStream(self.chunks, self.events)
+
+
+def interleaved_chunks(chunk_size: int) -> list:
+    # both choices stream at the same time
+    chunks = []
+    parts = [
+        [text[i : i + chunk_size] for i in range(0, len(text), chunk_size)]
+        for text in GENERATIONS
+    ]
+    for j in range(max(len(p) for p in parts)):
+        for i, p in enumerate(parts):
+            if j < len(p):
+                chunks.append(make_chunk(i, p[j]))
+            if j == len(p) - 1:
+                chunks.append(make_chunk(i, finish_reason="stop"))
+    usage = SimpleNamespace(
+        model_dump=lambda exclude_none: {
+            "prompt_tokens": 10,
+            "completion_tokens": 20,
+            "total_tokens": 30,
+        }
+    )
+    chunks.append(make_chunk(usage=usage))
+    return chunks
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    return OpenAITLGenLLM("gpt-4o", 2, 0.3, stream_operations=True)
+
+
+def make_prompter() -> UniversalTLPrompter:
+    return UniversalTLPrompter(
+        CodeProject(
+            display_name="AdapterPattern",
+            files=[CodeFile(file_name="Program.cs", source_code="class Program {}\n")],
+            source_language="dotnet8",
+        ),
+        "rename the class",
+    )
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1000])
+def test_streamed_generations_are_applied_while_streaming(llm, chunk_size):
+    completions = FakeCompletions(interleaved_chunks(chunk_size))
+    llm.llm.async_client = completions
+    prompter = make_prompter()
+
+    async def run():
+        def listener(generation):
+            completions.events.append(f"notify {GENERATIONS.index(generation.text)}")
+
+        current_generation_listener.set(listener)
+        return await llm._generate_translations(prompter)
+
+    llm_result, _, _ = asyncio.run(run())
+
+    assert completions.payload["stream"] is True
+    assert completions.payload["n"] == 2
+    # each generation is notified as soon as it is complete
+    finished = completions.events[0::2]
+    assert sorted(finished) == ["finish 0", "finish 1"]
+    assert completions.events[1::2] == [e.replace("finish", "notify") for e in finished]
+    assert [g.text for g in llm_result.generations[0]] == GENERATIONS
+    assert llm_result.llm_output["token_usage"]["completion_tokens"] == 20
+
+    # the candidates were applied while streaming, same as the batch conversion
+    batch = make_prompter().process_llm_result(llm_result)
+    streamed = prompter.process_llm_result(llm_result)
+    assert [p.model_dump() for p in streamed] == [p.model_dump() for p in batch]
+    for text, project in zip(GENERATIONS, streamed):
+        assert prompter.streamed_results[text][0] is project
+
+
+def test_not_streamed_by_default(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    llm = OpenAITLGenLLM("gpt-4o", 2, 0.3)
+    assert not llm.stream_operations
@@ -0,0 +1,134 @@
+from dapr.ext.grpc import InvokeMethodRequest
+from gs_common.CodeProject import CodeFile, CodeProject, ExecutionResult
+from gs_common.project_delta import apply_delta
+from gs_common.proto.common_pb2 import CodeProject as ProtoCodeProject
+from gs_common.proto.tl_generator_pb2 import (
+    ReturnCode,
+    TLGeneratorRequest,
+    TLGeneratorResponse,
+)
+from gs_common.proto.tl_picker_pb2 import ReturnCode as TLPickerReturnCode
+from gs_common.proto.tl_picker_pb2 import TLPickerRequest
+from langchain_core.outputs import Generation, LLMResult
+
+from src.goat_service.tl_generator.models.tl_gen_llm import TLGenLLM
+from src.goat_service.tl_generator.tl_gen_service import TLGenService
+from src.goat_service.tl_picker.tl_picker_service import TLPickerService
+
+
+def test_to_solution_deltas():
+    source_project = CodeProject(
+        display_name="Fib",
+        source_language="dotnetframework",
+        files=[
+            CodeFile(file_name=f"File{i}.cs", source_code=f"class File{i} {{}}")
+            for i in range(10)
+        ],
+    )
+    translated = source_project.copy_on_write()
+    translated.source_language = "dotnet8"
+    translated.update_file("File1.cs", "class File1 { }")
+    # duplicate file names, cannot be sent as a delta
+    duplicates = source_project.copy_on_write()
+    duplicates.files.append(CodeFile(file_name="File1.cs", source_code=""))
+    response = TLGeneratorResponse(
+        solutions=[
+            ProtoCodeProject(**translated.model_dump()),
+            ProtoCodeProject(**duplicates.model_dump()),
+        ],
+        return_code=ReturnCode.SUCCESS,
+    )
+
+    response = TLGenService.to_solution_deltas(response, source_project)
+
+    assert len(response.solution_deltas) == 1
+    assert len(response.solution_deltas[0].files.changed) == 1
+    assert apply_delta(source_project, response.solution_deltas[0]) == translated
+    assert len(response.solutions) == 1
+    assert len(response.solutions[0].files) == 11
+
+
+class FakeTLGenLLM(TLGenLLM):
+    def __init__(self, class_names: list[str]):
+        self.llm_result = LLMResult(
+            generations=[
+                [
+                    Generation(
+                        text=f"Program.cs\n<<<< SEARCH\nclass Program {{}}\n====\n"
+                        f"class {class_name} {{}}\n>>>> REPLACE\n"
+                    )
+                    for class_name in class_names
+                ]
+            ]
+        )
+
+    def generate_translations(self, prompter):
+        return self.process_llm_result(prompter, (self.llm_result, None, "question"))
+
+
+def make_request(message) -> InvokeMethodRequest:
+    request = InvokeMethodRequest(data=message)
+    request.metadata = (("traceparent", "00-trace-span-01"),)
+    return request
+
+
+def test_solution_deltas_generate_and_pick(tmp_path):
+    source_project = CodeProject(
+        display_name="Fib",
+        source_language="dotnet8",
+        files=[CodeFile(file_name="Program.cs", source_code="class Program {}\n")],
+        reference_files=[CodeFile(file_name="lib/A.dll", source_code="AAAA")],
+    )
+    proto_source_project = ProtoCodeProject(**source_project.model_dump())
+
+    tl_gen_service = TLGenService.__new__(TLGenService)
+    tl_gen_service.hedger = None
+    tl_gen_service.backup_base_dir = str(tmp_path)
+    tl_gen_service.gslite_tl_gen_llm = FakeTLGenLLM(["A", "B"])
+    tl_gen_service.backup_gslite_tl_gen_llm = tl_gen_service.gslite_tl_gen_llm
+    tl_gen_response = tl_gen_service.generate_translations(
+        make_request(
+            TLGeneratorRequest(
+                source_project=proto_source_project,
+                target_language="gslite",
+                instruction="rename the class",
+                solution_deltas=True,
+            )
+        )
+    )
+    assert tl_gen_response.return_code == ReturnCode.SUCCESS
+    assert len(tl_gen_response.solutions) == 0
+    assert len(tl_gen_response.solution_deltas) == 2
+
+    # the gateway passes the deltas on with the complete source project
+    executed = []
+
+    async def execute_tests(tl_projects, *args):
+        executed.extend(tl_projects)
+        return [
+            ExecutionResult(
+                project=p, success=True, total_tests=1, passed_tests=1, failed_tests=0
+            )
+            for p in tl_projects
+        ]
+
+    tl_picker_service = TLPickerService.__new__(TLPickerService)
+    tl_picker_service.acceptance_criterion = None
+    tl_picker_service._execute_tests = execute_tests
+    response = tl_picker_service.pick_translation(
+        make_request(
+            TLPickerRequest(
+                source_project=proto_source_project,
+                translation_deltas=tl_gen_response.solution_deltas,
+                test_project=ProtoCodeProject(display_name="FibTests"),
+                target_language="dotnet8",
+            )
+        )
+    )
+
+    assert [p.files[0].source_code for p in executed] == [
+        "class A {}\n",
+        "class B {}\n",
+    ]
+    assert all(p.reference_files == source_project.reference_files for p in executed)
+    assert response.return_code == TLPickerReturnCode.SUCCESS
@@ -0,0 +1,171 @@
+import asyncio
+import pickle
+
+import pytest
+from gs_common.CodeProject import CodeFile, CodeProject
+from langchain_core.outputs import Generation, LLMResult
+
+from src.goat_service.tl_generator.prompts.dotnet8_improve_tl_prompter import (
+    DotNet8ImproveTLPrompter,
+)
+from src.goat_service.tl_generator.prompts.tl_prompter import TLPrompter
+from src.goat_service.tl_generator.prompts.universal_tl_prompter import (
+    UniversalTLPrompter,
+)
+
+
+def make_source_project() -> CodeProject:
+    return CodeProject(
+        display_name="AdapterPattern",
+        files=[
+            CodeFile(file_name="Program.cs", source_code="class Program {}\n"),
+        ],
+        reference_files=[
+            CodeFile(file_name="Content/site.css", source_code="body {}\n"),
+        ],
+        source_language="dotnet8",
+    )
+
+
+def make_generation(class_name: str, valid: bool = True) -> Generation:
+    end = ">>>> REPLACE" if valid else ">>> REPLACE"
+    return Generation(
+        text=f"""\
+Program.cs
+<<<< SEARCH
+class Program {{}}
+====
+class {class_name} {{}}
+{end}
+"""
+    )
+
+
+LLM_RESULT = LLMResult(
+    generations=[
+        [
+            make_generation("Bad1", valid=False),
+            make_generation("A"),
+            make_generation("A"),
+            make_generation("B"),
+            make_generation("Bad2", valid=False),
+            make_generation("C"),
+        ]
+    ]
+)
+
+
+def process(llm_result: LLMResult) -> list[CodeProject]:
+    prompter = UniversalTLPrompter(make_source_project(), "rename the class")
+    return prompter.process_llm_result(llm_result)
+
+
+def test_process_llm_result_order_and_duplicates():
+    projects = process(LLM_RESULT)
+
+    # duplicate "A" removed, bad projects at the end
+    assert [p.get_file("Program.cs").source_code for p in projects] == [
+        "class A {}\n",
+        "class B {}\n",
+        "class C {}\n",
+        "class Program {}\n",
+        "class Program {}\n",
+    ]
+    for p in projects:
+        assert [f.file_name for f in p.reference_files] == ["Content/site.css"]
+
+
+@pytest.fixture
+def process_pool():
+    TLPrompter.start_process_pool(2)
+    yield
+    TLPrompter.process_pool.shutdown()
+    TLPrompter.process_pool = None
+    TLPrompter.n_process_workers = 0
+
+
+def test_process_llm_result_process_pool_same_as_serial(process_pool):
+    serial = [p.model_dump() for p in process(LLM_RESULT)]
+
+    prompter = UniversalTLPrompter(make_source_project(), "rename the class")
+    projects = prompter.process_llm_result(LLM_RESULT)
+
+    assert [p.model_dump() for p in projects] == serial
+    # reference files are re-attached in the parent, not copied
+    for p in projects:
+        assert p.reference_files[0] is prompter.source_project_reference_files[0]
+
+
+def test_pool_prompter_does_not_pickle_reference_files(process_pool):
+    prompter = UniversalTLPrompter(make_source_project(), "rename the class")
+    pickled = pickle.dumps(prompter._pool_prompter())
+
+    assert b"class Program" in pickled
+    assert b"Content/site.css" in pickled
+    assert b"body {}" not in pickled
+    # the prompter itself keeps the reference files
+    assert prompter.source_project_reference_files[0].source_code == "body {}\n"
+
+
+async def collect_code_projects(prompter: TLPrompter) -> list[CodeProject]:
+    async def generations():
+        for generation in LLM_RESULT.generations[0]:
+            await asyncio.sleep(0)
+            yield generation.text
+
+    return [project async for project, _ in prompter.aiter_code_projects(generations())]
+
+
+def test_aiter_code_projects_same_as_process_llm_result():
+    serial = sorted(p.model_dump_json() for p in process(LLM_RESULT))
+
+    prompter = UniversalTLPrompter(make_source_project(), "rename the class")
+    projects = asyncio.run(collect_code_projects(prompter))
+
+    assert sorted(p.model_dump_json() for p in projects) == serial
+
+
+def test_aiter_code_projects_process_pool(process_pool):
+    serial = sorted(p.model_dump_json() for p in process(LLM_RESULT))
+
+    prompter = UniversalTLPrompter(make_source_project(), "rename the class")
+    projects = asyncio.run(collect_code_projects(prompter))
+
+    assert sorted(p.model_dump_json() for p in projects) == serial
+    for p in projects:
+        assert p.reference_files[0] is prompter.source_project_reference_files[0]
+
+
+def stream(prompter: TLPrompter, text: str, chunk_size: int = 5):
+    applier = prompter.streaming_applier()
+    for i in range(0, len(text), chunk_size):
+        applier.feed(text[i : i + chunk_size])
+    prompter.add_streamed_result(text, applier)
+
+
+def test_streamed_results_same_as_process_llm_result():
+    serial = [p.model_dump() for p in process(LLM_RESULT)]
+
+    prompter = UniversalTLPrompter(make_source_project(), "rename the class")
+    streamed = [generation.text for generation in LLM_RESULT.generations[0][:4]]
+    for text in streamed:
+        stream(prompter, text)
+    projects = prompter.process_llm_result(LLM_RESULT)
+
+    assert [p.model_dump() for p in projects] == serial
+    # the streamed candidates are not converted again
+    assert projects[0] is prompter.streamed_results[streamed[1]][0]
+    assert projects[0].reference_files[0] is prompter.source_project_reference_files[0]
+
+
+def test_streamed_results_not_pickled_for_process_pool(process_pool):
+    prompter = UniversalTLPrompter(make_source_project(), "rename the class")
+    stream(prompter, make_generation("Streamed").text)
+
+    assert b"Streamed" not in pickle.dumps(prompter._pool_prompter())
+    assert len(prompter.streamed_results) == 1
+
+
+def test_no_streaming_applier_for_other_conversions():
+    prompter = DotNet8ImproveTLPrompter(make_source_project(), "rename the class")
+    assert prompter.streaming_applier() is None
@@ -0,0 +1,163 @@
+import asyncio
+
+from gs_common.CodeProject import CodeFile, CodeProject, ExecutionResult
+from langchain_core.outputs import Generation, LLMResult
+
+from src.goat_service.tl_generator.prompts.universal_tl_prompter import (
+    UniversalTLPrompter,
+)
+from src.goat_service.tl_picker.tl_pipeline import TLPipeline
+from src.goat_service.utils.execution_fan_out import AcceptanceCriterion
+from src.goat_service.utils.generation_listener import notify_generation
+
+
+def make_generation(class_name: str, indent: str = "") -> Generation:
+    return Generation(
+        text=f"""\
+Program.cs
+<<<< SEARCH
+class Program {{}}
+====
+{indent}class {class_name} {{}}
+>>>> REPLACE
+"""
+    )
+
+
+class FakeExecutor:
+    """
+    Execute a candidate in `delays[class_name]` seconds; it passes all tests
+    if its class name is in `passing`.
+    """
+
+    def __init__(self, delays: dict[str, float], passing: set[str]):
+        self.delays = delays
+        self.passing = passing
+        self.started = []
+        self.cancelled = []
+
+    async def execute_tests(self, tl_project: CodeProject) -> ExecutionResult:
+        class_name = tl_project.get_file("Program.cs").source_code.split()[1]
+        self.started.append(class_name)
+        try:
+            await asyncio.sleep(self.delays[class_name])
+        except asyncio.CancelledError:
+            self.cancelled.append(class_name)
+            raise
+        if class_name == "Error":
+            raise ConnectionError("executor not reachable")
+        success = class_name in self.passing
+        return ExecutionResult(
+            project=tl_project,
+            success=success,
+            total_tests=2,
+            passed_tests=2 if success else 1,
+            failed_tests=0 if success else 1,
+        )
+
+
+def make_prompter() -> UniversalTLPrompter:
+    return UniversalTLPrompter(
+        CodeProject(
+            files=[CodeFile(file_name="Program.cs", source_code="class Program {}\n")],
+            source_language="dotnet8",
+        ),
+        "rename the class",
+    )
+
+
+def run_pipeline(executor: FakeExecutor, generations: list[Generation]):
+    llm_result = LLMResult(generations=[generations])
+
+    async def generate():
+        return llm_result, None, "question"
+
+    pipeline = TLPipeline(executor.execute_tests, AcceptanceCriterion())
+    return asyncio.run(pipeline.run(generate, make_prompter()))
+
+
+def test_pipeline_executes_all_candidates():
+    executor = FakeExecutor({"A": 0.01, "B": 0.0, "Error": 0.0}, passing=set())
+    pipeline_result = run_pipeline(
+        executor, [make_generation(c) for c in ["A", "B", "Error", "B"]]
+    )
+
+    assert not pipeline_result.stopped_early
+    # duplicate "B" is not executed
+    assert sorted(executor.started) == ["A", "B", "Error"]
+    assert len(pipeline_result.tl_gen_result.tl_projects) == 3
+    assert pipeline_result.tl_gen_result.question == "question"
+    assert len(pipeline_result.results) == 3
+    assert sum(isinstance(r, ConnectionError) for r in pipeline_result.results) == 1
+
+
+def test_pipeline_stops_at_first_passing_candidate():
+    executor = FakeExecutor({"A": 1.0, "B": 0.0, "C": 1.0}, passing={"B", "C"})
+    pipeline_result = run_pipeline(
+        executor, [make_generation(c) for c in ["A", "B", "C"]]
+    )
+
+    assert pipeline_result.stopped_early
+    assert [
+        r.project.get_file("Program.cs").source_code for r in pipeline_result.results
+    ] == ["class B {}\n"]
+    assert sorted(executor.cancelled) == sorted(set(executor.started) - {"B"})
+    assert pipeline_result.time_saved >= 0
+
+
+def test_pipeline_executes_identical_candidates_once():
+    executor = FakeExecutor({"A": 0.0, "B": 0.0}, passing=set())
+    pipeline_result = run_pipeline(
+        executor,
+        [make_generation("A"), make_generation("B"), make_generation("A", "  ")],
+    )
+
+    assert sorted(executor.started) == ["A", "B"]
+    assert len(pipeline_result.tl_gen_result.tl_projects) == 3
+    assert len(pipeline_result.results) == 3
+
+
+def test_pipeline_executes_streamed_generations_during_generation():
+    executor = FakeExecutor({"A": 0.0, "B": 0.0}, passing=set())
+    generations = [make_generation("A"), make_generation("B")]
+    started_before_return = []
+
+    async def generate():
+        # A is complete first, B only comes with the result
+        notify_generation(generations[0])
+        await asyncio.sleep(0.1)
+        started_before_return.extend(executor.started)
+        return LLMResult(generations=[generations]), None, "question"
+
+    pipeline = TLPipeline(executor.execute_tests, AcceptanceCriterion())
+    pipeline_result = asyncio.run(pipeline.run(generate, make_prompter()))
+
+    assert started_before_return == ["A"]
+    # A is not converted and executed again from the result
+    assert executor.started == ["A", "B"]
+    assert len(pipeline_result.tl_gen_result.tl_projects) == 2
+
+
+def test_pipeline_stops_generation_at_first_passing_streamed_candidate():
+    executor = FakeExecutor({"A": 0.0}, passing={"A"})
+    generation_cancelled = []
+
+    async def generate():
+        notify_generation(make_generation("A"))
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            generation_cancelled.append(True)
+            raise
+
+    pipeline = TLPipeline(executor.execute_tests, AcceptanceCriterion())
+    pipeline_result = asyncio.run(
+        asyncio.wait_for(pipeline.run(generate, make_prompter()), timeout=5)
+    )
+
+    assert pipeline_result.stopped_early
+    assert generation_cancelled == [True]
+    # the result has the generations received before the llm call was cancelled
+    llm_result = pipeline_result.tl_gen_result.llm_result
+    assert [g.text for g in llm_result.generations[0]] == [make_generation("A").text]
+    assert len(pipeline_result.tl_gen_result.tl_projects) == 1
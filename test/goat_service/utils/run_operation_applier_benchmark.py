@@ -0,0 +1,197 @@
+import copy
+import logging
+import multiprocessing
+import resource
+import time
+
+from gs_common.CodeProject import CodeFile, CodeProject
+
+from src.goat_service.utils.operation_applier import OperationApplier
+
+"""
+Benchmarks for OperationApplier.
+Memory of apply: copy-on-write vs. deepcopy. Each mode runs in a fresh process
+so that peak RSS (ru_maxrss) is comparable.
+Parsing: single-pass parser vs. the old per-block rescanning loop.
+Run with: pytest test/goat_service/utils/run_operation_applier_benchmark.py -s
+"""
+
+PROJECT_SIZE_MB = 50
+N_FILES = 10_000
+N_CANDIDATES = 10
+
+
+def make_project() -> CodeProject:
+    file_size = PROJECT_SIZE_MB * 1024 * 1024 // N_FILES
+    line = "        var x = 1; // some code\n"
+    body = line * (file_size // len(line))
+    return CodeProject(
+        display_name="benchmark",
+        source_language="dotnet8",
+        files=[
+            CodeFile(
+                file_name=f"src/File{i}.cs",
+                source_code=f"class File{i}\n{{\n{body}}}\n",
+            )
+            for i in range(N_FILES)
+        ],
+    )
+
+
+def make_generation(candidate: int) -> str:
+    # each candidate changes a handful of files
+    gen = ""
+    for i in range(5):
+        gen += f"""\
+src/File{candidate * 5 + i}.cs
+<<<< SEARCH
+class File{candidate * 5 + i}
+====
+class Changed{candidate}
+>>>> REPLACE
+"""
+    return gen
+
+
+class DeepCopyOperationApplier(OperationApplier):
+    """apply() as it was before copy-on-write"""
+
+    def apply(self):
+        source_project = self.source_project
+        self.source_project = copy.deepcopy(source_project)
+        try:
+            return super().apply()
+        finally:
+            self.source_project = source_project
+
+
+def run_candidates(applier_cls, queue):
+    project = make_project()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.time()
+    candidates = []
+    for i in range(N_CANDIDATES):
+        candidate, success = applier_cls(project, make_generation(i)).apply()
+        assert success
+        candidates.append(candidate)
+    t = time.time() - t0
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    dumps = [c.model_dump() for c in candidates]
+    queue.put((rss_before, rss_after, t, dumps))
+
+
+def measure(applier_cls):
+    queue = multiprocessing.Queue()
+    p = multiprocessing.Process(target=run_candidates, args=(applier_cls, queue))
+    p.start()
+    result = queue.get()
+    p.join()
+    return result
+
+
+def test_copy_on_write_peak_rss():
+    results = {}
+    for name, applier_cls in [
+        ("deepcopy", DeepCopyOperationApplier),
+        ("copy_on_write", OperationApplier),
+    ]:
+        rss_before, rss_after, t, dumps = measure(applier_cls)
+        results[name] = (rss_after - rss_before, dumps)
+        print(
+            f"{name:>14}: peak RSS +{(rss_after - rss_before) / 1024:8.1f} MB "
+            f"for {N_CANDIDATES} candidates in {t:.2f}s"
+        )
+
+    # same output, much less memory
+    assert results["copy_on_write"][1] == results["deepcopy"][1]
+    assert results["copy_on_write"][0] < results["deepcopy"][0]
+
+
+PARSE_GENERATION_MB = 5
+N_PARSE_BLOCKS = 2_000
+N_UNTERMINATED_MARKERS = 4_000
+
+
+def legacy_parse(generation: str) -> list[tuple[str, str, str]]:
+    # old parser of OperationApplier.__init__ (file name cleanup left out)
+    operations = []
+    gen_lines = generation.split("\n")
+    for i, line in enumerate(gen_lines):
+        if line.startswith("<<<< SEARCH"):
+            file_name = gen_lines[i - 1]
+            search_block = ""
+            valid_block = False
+            for j in range(i + 1, len(gen_lines)):
+                if gen_lines[j] == "<<<< SEARCH" or gen_lines[j] == ">>>> REPLACE":
+                    valid_block = False
+                    break
+                if gen_lines[j] == "====":
+                    valid_block = True
+                    break
+                search_block += gen_lines[j] + "\n"
+            if not valid_block:
+                continue
+            replace_block = ""
+            valid_block = False
+            for j in range(j + 1, len(gen_lines)):
+                if gen_lines[j] == "====" or gen_lines[j] == "<<<< SEARCH":
+                    valid_block = False
+                    break
+                if gen_lines[j] == ">>>> REPLACE":
+                    valid_block = True
+                    break
+                replace_block += gen_lines[j] + "\n"
+            if not valid_block:
+                continue
+            operations.append((file_name, search_block, replace_block))
+    return operations
+
+
+def make_large_generation() -> str:
+    block_size = PARSE_GENERATION_MB * 1024 * 1024 // N_PARSE_BLOCKS
+    line = "        var x = 1; // some code\n"
+    body = line * (block_size // 2 // len(line))
+    return "".join(
+        f"src/File{i}.cs\n<<<< SEARCH\n{body}====\n{body}>>>> REPLACE\n"
+        for i in range(N_PARSE_BLOCKS)
+    )
+
+
+def time_parsers(generation: str) -> tuple[float, float]:
+    empty_project = CodeProject(display_name="benchmark", source_language="dotnet8")
+    logging.disable(logging.WARNING)
+    try:
+        t0 = time.time()
+        applier = OperationApplier(empty_project, generation)
+        t_new = time.time() - t0
+        t0 = time.time()
+        legacy = legacy_parse(generation)
+        t_legacy = time.time() - t0
+    finally:
+        logging.disable(logging.NOTSET)
+
+    assert [
+        (op.file_name, op.search_block, op.replace_block)
+        for op in applier.file_operations
+    ] == legacy
+    return t_new, t_legacy
+
+
+def test_parse_large_generation():
+    generation = make_large_generation()
+    t_new, t_legacy = time_parsers(generation)
+    print(
+        f"{len(generation) / 1024 / 1024:.1f} MB, {N_PARSE_BLOCKS} blocks: "
+        f"single pass {t_new:.3f}s, legacy {t_legacy:.3f}s"
+    )
+
+
+def test_parse_unterminated_markers():
+    # every marker starts a block that is never closed -> legacy rescans to the end
+    generation = "src/File.cs\n<<<< SEARCH x\n" * N_UNTERMINATED_MARKERS
+    t_new, t_legacy = time_parsers(generation)
+    print(
+        f"{N_UNTERMINATED_MARKERS} unterminated markers: "
+        f"single pass {t_new:.3f}s, legacy {t_legacy:.3f}s"
+    )
+    assert t_new < t_legacy
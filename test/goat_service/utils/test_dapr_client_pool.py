@@ -0,0 +1,121 @@
+import asyncio
+
+import grpc
+import pytest
+from dapr.conf import settings
+from gs_common.tracing import current_trace_id
+
+from src.goat_service.utils.dapr_client_pool import DaprClientPool
+
+
+class FakeConnectorError(grpc.aio.AioRpcError):
+    def __init__(self):
+        super().__init__(
+            grpc.StatusCode.UNAVAILABLE,
+            grpc.aio.Metadata(),
+            grpc.aio.Metadata(),
+            details="connection refused",
+        )
+
+
+class FakeClient:
+    def __init__(self, n_connection_errors=0):
+        self.n_calls = 0
+        self.closed = False
+        self.n_connection_errors = n_connection_errors
+        self.metadata = []
+
+    async def invoke_method(self, app_id, method_name, data, metadata, timeout):
+        self.n_calls += 1
+        self.metadata.append(metadata)
+        if self.n_connection_errors > 0:
+            self.n_connection_errors -= 1
+            raise FakeConnectorError()
+        if data == "fail":
+            raise ValueError("executor error")
+        return f"{app_id}/{method_name}: {data}"
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeClientFactory:
+    def __init__(self, n_connection_errors=0):
+        self.clients = []
+        self.n_connection_errors = n_connection_errors
+
+    def __call__(self):
+        # only the first client fails
+        client = FakeClient(self.n_connection_errors if not self.clients else 0)
+        self.clients.append(client)
+        return client
+
+
+async def invoke_many(pool, n):
+    return await asyncio.gather(
+        *[pool.invoke_method("app", "method", str(i), 10) for i in range(n)]
+    )
+
+
+def test_pool_reuses_clients():
+    factory = FakeClientFactory()
+    pool = DaprClientPool(2, factory)
+
+    async def run():
+        await invoke_many(pool, 5)
+        await invoke_many(pool, 5)
+
+    asyncio.run(run())
+    assert pool.n_opened == 2
+    assert pool.n_open == 2
+    assert [c.n_calls for c in factory.clients] == [5, 5]
+
+
+def test_pool_reconnects_and_retries_on_connection_error():
+    factory = FakeClientFactory(n_connection_errors=1)
+    pool = DaprClientPool(1, factory)
+
+    response = asyncio.run(pool.invoke_method("app", "method", "data", 10))
+    assert response == "app/method: data"
+    assert len(factory.clients) == 2
+    assert factory.clients[0].closed
+    assert pool.n_open == 1
+
+
+def test_pool_does_not_retry_other_errors():
+    factory = FakeClientFactory()
+    pool = DaprClientPool(1, factory)
+
+    with pytest.raises(ValueError):
+        asyncio.run(pool.invoke_method("app", "method", "fail", 10))
+    assert len(factory.clients) == 1
+    assert factory.clients[0].n_calls == 1
+
+
+def test_pool_opens_new_clients_on_new_loop():
+    factory = FakeClientFactory()
+    pool = DaprClientPool(1, factory)
+
+    asyncio.run(pool.invoke_method("app", "method", "data", 10))
+    asyncio.run(pool.invoke_method("app", "method", "data", 10))
+    assert pool.n_opened == 2
+
+
+def test_pool_sends_trace_info_as_metadata():
+    factory = FakeClientFactory()
+    pool = DaprClientPool(1, factory)
+
+    async def run():
+        current_trace_id.set("00-trace-span-01")
+        await pool.invoke_method("app", "method", "data", 10)
+
+    asyncio.run(run())
+    assert factory.clients[0].metadata == [(("traceparent", "00-trace-span-01"),)]
+
+
+def test_configure_invokes_over_grpc(monkeypatch):
+    monkeypatch.setattr(DaprClientPool, "default", None)
+    monkeypatch.setattr(settings, "DAPR_API_METHOD_INVOCATION_PROTOCOL", "http")
+
+    DaprClientPool.configure(1)
+    assert settings.DAPR_API_METHOD_INVOCATION_PROTOCOL == "grpc"
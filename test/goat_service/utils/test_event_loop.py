@@ -0,0 +1,73 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.goat_service.utils.event_loop import get_event_loop, run_coroutine
+
+test_var = contextvars.ContextVar("test_var", default="unset")
+
+
+async def get_value_later(value, delay=0.0):
+    await asyncio.sleep(delay)
+    return value
+
+
+async def fail():
+    raise ValueError("failed")
+
+
+async def get_test_var():
+    return test_var.get()
+
+
+def test_run_coroutine_result_and_exception():
+    assert run_coroutine(get_value_later(42)) == 42
+    with pytest.raises(ValueError, match="failed"):
+        run_coroutine(fail())
+
+
+def test_run_coroutine_uses_one_loop():
+    loop = get_event_loop()
+    assert run_coroutine(get_value_later(1)) == 1
+    assert get_event_loop() is loop
+
+
+def test_run_coroutine_copies_context():
+    def run_with_var(value):
+        test_var.set(value)
+        return run_coroutine(get_test_var())
+
+    with ThreadPoolExecutor(2) as pool:
+        assert list(pool.map(run_with_var, ["a", "b"])) == ["a", "b"]
+
+
+def test_run_coroutine_multiplexes_requests():
+    # 20 threads waiting 0.2s each on the same loop finish together
+    t0 = time.time()
+    with ThreadPoolExecutor(20) as pool:
+        results = list(
+            pool.map(lambda i: run_coroutine(get_value_later(i, 0.2)), range(20))
+        )
+    assert results == list(range(20))
+    assert time.time() - t0 < 2
+
+
+def test_run_coroutine_timeout_cancels_coroutine():
+    cancelled = threading.Event()
+
+    async def hang():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(TimeoutError):
+        run_coroutine(hang(), timeout=0.1)
+    assert cancelled.wait(1)
+    # the loop is still usable
+    assert run_coroutine(get_value_later(1), timeout=1) == 1
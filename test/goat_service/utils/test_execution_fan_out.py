@@ -0,0 +1,326 @@
+import asyncio
+
+from gs_common.CodeProject import CodeFile, CodeProject, ExecutionResult
+
+import src.goat_service.utils.execution_fan_out as execution_fan_out
+from src.goat_service.utils.execution_fan_out import (
+    AcceptanceCriterion,
+    execute_batch_until_accepted,
+    execute_unique_until_accepted,
+    gather_until_accepted,
+)
+from src.goat_service.utils.grpc_code_executor_calls import (
+    SOURCE_CANDIDATES,
+    TEST_CANDIDATES,
+)
+
+
+class FakeExecutions:
+    def __init__(self):
+        self.cancelled = []
+
+    async def execute(self, name, delay, failed_tests=0, passed_tests=3, error=""):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(name)
+            raise
+        if error:
+            raise ConnectionError(error)
+        return ExecutionResult(
+            project=name,
+            success=failed_tests == 0,
+            total_tests=failed_tests + passed_tests,
+            failed_tests=failed_tests,
+            passed_tests=passed_tests,
+        )
+
+
+def test_acceptance_criterion():
+    accept = AcceptanceCriterion(max_failed_tests=1, min_passed_tests=2)
+    assert accept(ExecutionResult(failed_tests=1, passed_tests=2))
+    assert not accept(ExecutionResult(failed_tests=2, passed_tests=2))
+    assert not accept(ExecutionResult(failed_tests=0, passed_tests=1))
+    assert not accept(ExecutionResult(failed_tests=0, passed_tests=5, error="CS0103"))
+    # defaults of a failed execution
+    assert not accept(ExecutionResult())
+
+
+def test_acceptance_criterion_from_config():
+    config = {
+        "tl_picker_accept_max_failed_tests": 0,
+        "tl_picker_accept_min_passed_tests": 4,
+    }
+    assert AcceptanceCriterion.from_config(config, "tl_picker") == AcceptanceCriterion(
+        0, 4
+    )
+    config["tl_picker_accept_max_failed_tests"] = None
+    assert AcceptanceCriterion.from_config(config, "tl_picker") is None
+
+
+def test_gather_until_accepted_cancels_remaining():
+    fake = FakeExecutions()
+    executions = [
+        fake.execute("failing", 0.0, failed_tests=2),
+        fake.execute("slow", 1.0),
+        fake.execute("error", 0.0, error="executor not reachable"),
+        fake.execute("good", 0.01),
+        fake.execute("slower", 2.0),
+    ]
+    results = asyncio.run(gather_until_accepted(executions, AcceptanceCriterion()))
+
+    assert [r.project for r in results if isinstance(r, ExecutionResult)] == [
+        "failing",
+        "good",
+    ]
+    assert sum(isinstance(r, ConnectionError) for r in results) == 1
+    assert sorted(fake.cancelled) == ["slow", "slower"]
+
+
+def test_gather_until_accepted_without_criterion_awaits_all():
+    fake = FakeExecutions()
+    executions = [fake.execute(str(i), 0.01 * i) for i in range(4)]
+    results = asyncio.run(gather_until_accepted(executions, None))
+
+    assert [r.project for r in results] == ["0", "1", "2", "3"]
+    assert fake.cancelled == []
+
+
+def test_execute_unique_until_accepted_fans_out_duplicates():
+    candidates = [
+        CodeProject(files=[CodeFile(file_name="A.cs", source_code=source_code)])
+        for source_code in ["class A {}", "class B {}", "  class A {}\n", "class A {}"]
+    ]
+    executed = []
+
+    async def execute(candidate):
+        executed.append(candidate)
+        return ExecutionResult(project=candidate, failed_tests=1, passed_tests=2)
+
+    results = asyncio.run(execute_unique_until_accepted(candidates, execute, None))
+
+    assert executed == [candidates[0], candidates[1]]
+    assert sorted(id(r.project) for r in results) == sorted(id(c) for c in candidates)
+    assert all(r.failed_tests == 1 for r in results)
+
+
+PASSED_RESPONSE = {
+    "success": "true",
+    "error": "",
+    "total_tests": 2,
+    "passed_tests": 2,
+    "failed_tests": 0,
+    "test_output": "",
+    "runtime": 1,
+}
+
+
+def make_candidates(source_codes: list[str]) -> list[CodeProject]:
+    return [
+        CodeProject(files=[CodeFile(file_name="A.cs", source_code=source_code)])
+        for source_code in source_codes
+    ]
+
+
+def test_execute_batch_until_accepted_sends_unique_candidates(monkeypatch):
+    source_project = CodeProject(display_name="Fib")
+    candidates = make_candidates(
+        ["class A {}", "class B {}", "class A {}", "class C {}"]
+    )
+    requests = []
+
+    async def call_execute_tests_batch(
+        candidate_field, chunk, shared_project, target_language, accept, base_project
+    ):
+        requests.append((candidate_field, chunk, shared_project, accept))
+        # the last candidate was not started
+        return {"results": [PASSED_RESPONSE, PASSED_RESPONSE, None]}
+
+    monkeypatch.setattr(
+        execution_fan_out, "_call_execute_tests_batch", call_execute_tests_batch
+    )
+    results = asyncio.run(
+        execute_batch_until_accepted(
+            TEST_CANDIDATES,
+            candidates,
+            source_project,
+            "dotnet8",
+            AcceptanceCriterion(),
+            batch_size=10,
+        )
+    )
+
+    assert requests == [
+        (
+            TEST_CANDIDATES,
+            [candidates[0], candidates[1], candidates[3]],
+            source_project,
+            {"max_failed_tests": 0, "min_passed_tests": 1},
+        )
+    ]
+    assert [id(r.project) for r in results] == [
+        id(candidates[0]),
+        id(candidates[2]),
+        id(candidates[1]),
+    ]
+    assert all(r.success for r in results)
+
+
+def test_execute_batch_until_accepted_in_chunks(monkeypatch):
+    test_project = CodeProject(display_name="FibTests")
+    candidates = make_candidates(["class A {}", "class B {}", "class C {}"])
+    chunks = []
+
+    async def call_execute_tests_batch(
+        candidate_field, chunk, shared_project, target_language, accept, base_project
+    ):
+        chunks.append(chunk)
+        if chunk[0] is candidates[1]:
+            raise ConnectionError("executor not reachable")
+        response = dict(PASSED_RESPONSE, passed_tests=1, failed_tests=1)
+        return {"results": [response] * len(chunk)}
+
+    monkeypatch.setattr(
+        execution_fan_out, "_call_execute_tests_batch", call_execute_tests_batch
+    )
+    results = asyncio.run(
+        execute_batch_until_accepted(
+            SOURCE_CANDIDATES,
+            candidates,
+            test_project,
+            "dotnet8",
+            AcceptanceCriterion(),
+            batch_size=1,
+        )
+    )
+
+    # one request per candidate, the failed request only loses its candidate
+    assert chunks == [[c] for c in candidates]
+    assert isinstance(results[1], ConnectionError)
+    assert [r.project for i, r in enumerate(results) if i != 1] == [
+        candidates[0],
+        candidates[2],
+    ]
+
+
+def test_execute_batch_until_accepted_cancels_other_chunks(monkeypatch):
+    candidates = make_candidates(["class A {}", "class B {}"])
+    cancelled = []
+
+    async def call_execute_tests_batch(
+        candidate_field, chunk, shared_project, target_language, accept, base_project
+    ):
+        if chunk[0] is candidates[1]:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(chunk)
+                raise
+        return {"results": [PASSED_RESPONSE]}
+
+    monkeypatch.setattr(
+        execution_fan_out, "_call_execute_tests_batch", call_execute_tests_batch
+    )
+    results = asyncio.run(
+        execute_batch_until_accepted(
+            SOURCE_CANDIDATES,
+            candidates,
+            CodeProject(display_name="FibTests"),
+            "dotnet8",
+            AcceptanceCriterion(),
+            batch_size=1,
+        )
+    )
+
+    assert [r.project for r in results] == [candidates[0]]
+    assert cancelled == [[candidates[1]]]
+
+
+def test_execute_batch_until_accepted_without_batches(monkeypatch):
+    test_project = CodeProject(display_name="FibTests")
+    candidates = make_candidates(["class A {}", "class B {}", "class A {}"])
+    requests = []
+
+    async def call_execute_tests(
+        source_project, test_project, target_language, base_project
+    ):
+        requests.append((source_project, test_project))
+        return PASSED_RESPONSE
+
+    monkeypatch.setattr(execution_fan_out, "_call_execute_tests", call_execute_tests)
+    results = asyncio.run(
+        execute_batch_until_accepted(
+            SOURCE_CANDIDATES,
+            candidates,
+            test_project,
+            "dotnet8",
+            None,
+            batch_size=None,
+        )
+    )
+
+    assert requests == [(candidates[0], test_project), (candidates[1], test_project)]
+    assert [r.project for r in results] == [candidates[0], candidates[2], candidates[1]]
+
+
+def test_busy_candidates_are_retried(monkeypatch):
+    monkeypatch.setattr(execution_fan_out, "BUSY_BACKOFF_SECONDS", 0)
+    candidates = make_candidates(["class A {}", "class B {}"])
+    chunks = []
+
+    async def call_execute_tests_batch(
+        candidate_field, chunk, shared_project, target_language, accept, base_project
+    ):
+        chunks.append(chunk)
+        failed = dict(PASSED_RESPONSE, passed_tests=1, failed_tests=1)
+        # B is rejected twice, then executed
+        busy = len(chunks) <= 2
+        return {
+            "results": [
+                {"busy": True} if busy and c is candidates[1] else failed for c in chunk
+            ]
+        }
+
+    monkeypatch.setattr(
+        execution_fan_out, "_call_execute_tests_batch", call_execute_tests_batch
+    )
+    results = asyncio.run(
+        execute_batch_until_accepted(
+            SOURCE_CANDIDATES,
+            candidates,
+            CodeProject(display_name="FibTests"),
+            "dotnet8",
+            AcceptanceCriterion(),
+            batch_size=2,
+        )
+    )
+
+    assert chunks == [candidates, [candidates[1]], [candidates[1]]]
+    assert [r.project for r in results] == candidates
+
+
+def test_busy_until_retries_exhausted(monkeypatch):
+    monkeypatch.setattr(execution_fan_out, "BUSY_BACKOFF_SECONDS", 0)
+    n_calls = []
+
+    async def call_execute_tests(
+        source_project, test_project, target_language, base_project
+    ):
+        n_calls.append(1)
+        return {"busy": True}
+
+    monkeypatch.setattr(execution_fan_out, "_call_execute_tests", call_execute_tests)
+    candidates = make_candidates(["class A {}"])
+    results = asyncio.run(
+        execute_batch_until_accepted(
+            SOURCE_CANDIDATES,
+            candidates,
+            CodeProject(display_name="FibTests"),
+            "dotnet8",
+            None,
+            batch_size=None,
+        )
+    )
+
+    assert len(n_calls) == execution_fan_out.BUSY_RETRIES + 1
+    assert isinstance(results[0], execution_fan_out.CodeExecutorBusyError)
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import time
+
+from langchain.prompts.chat import ChatPromptTemplate, HumanMessagePromptTemplate
+from langchain_core.outputs import Generation, LLMResult
+
+from src.goat_service.utils.llm_cache import DiskLLMCacheBackend, LLMCache
+
+
+class FakeLLM:
+    def __init__(self, model="gpt-test", n_generations=2, temperature=0.3):
+        self.model = model
+        self.n_generations = n_generations
+        self.temperature = temperature
+        self.n_calls = 0
+
+    async def generate(self, prompter):
+        self.n_calls += 1
+        llm_result = LLMResult(
+            generations=[[Generation(text="a"), Generation(text="b")]]
+        )
+        return llm_result, prompter.get_prompt(), prompter.get_question()
+
+
+class FakePrompter:
+    def __init__(self, question):
+        self.question = question
+
+    def get_prompt(self) -> ChatPromptTemplate:
+        return ChatPromptTemplate(
+            messages=[
+                ("system", "You are a test."),
+                HumanMessagePromptTemplate.from_template("{question}"),
+            ],
+            input_variables=["question"],
+        )
+
+    def get_question(self) -> str:
+        return self.question
+
+
+def test_disk_backend_get_set(tmp_path):
+    backend = DiskLLMCacheBackend(str(tmp_path), ttl_seconds=60, max_size_bytes=1024)
+
+    assert backend.get("key") is None
+    backend.set("key", "value")
+    assert backend.get("key") == "value"
+    backend.set("key", "new value")
+    assert backend.get("key") == "new value"
+
+
+def test_disk_backend_ttl(tmp_path):
+    backend = DiskLLMCacheBackend(str(tmp_path), ttl_seconds=60, max_size_bytes=1024)
+    backend.set("key", "value")
+
+    # pretend the entry was written 2 minutes ago
+    old = time.time() - 120
+    os.utime(tmp_path / "key.json", (old, old))
+
+    assert backend.get("key") is None
+    assert not os.path.exists(tmp_path / "key.json")
+
+
+def test_disk_backend_evicts_least_recently_used(tmp_path):
+    backend = DiskLLMCacheBackend(str(tmp_path), ttl_seconds=60, max_size_bytes=25)
+    now = time.time()
+    for i, key in enumerate(["a", "b"]):
+        backend.set(key, "x" * 10)
+        os.utime(tmp_path / f"{key}.json", (now - 10 + i, now))
+    # use a -> b is the least recently used entry
+    assert backend.get("a") is not None
+
+    backend.set("c", "x" * 10)
+
+    assert backend.get("a") is not None
+    assert backend.get("b") is None
+    assert backend.get("c") is not None
+
+
+def run_generate(cache: LLMCache, llm, prompter, generate):
+    return asyncio.run(cache.generate(llm, prompter, generate))
+
+
+def test_generate_uses_cache(tmp_path):
+    cache = LLMCache(
+        DiskLLMCacheBackend(str(tmp_path), ttl_seconds=60, max_size_bytes=1024**2)
+    )
+    llm = FakeLLM()
+    prompter = FakePrompter("question")
+
+    llm_result, _, question = run_generate(
+        cache, llm, prompter, lambda: llm.generate(prompter)
+    )
+    cached_result, _, cached_question = run_generate(
+        cache, llm, prompter, lambda: llm.generate(prompter)
+    )
+
+    assert llm.n_calls == 1
+    assert cached_question == question
+    assert [g.text for g in cached_result.generations[0]] == ["a", "b"]
+
+    # other question or model parameters -> new llm call
+    run_generate(cache, llm, FakePrompter("other"), lambda: llm.generate(prompter))
+    other_llm = FakeLLM(temperature=0.8)
+    run_generate(cache, other_llm, prompter, lambda: other_llm.generate(prompter))
+    assert llm.n_calls == 2
+    assert other_llm.n_calls == 1
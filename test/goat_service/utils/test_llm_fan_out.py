@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+from langchain_core.outputs import Generation, LLMResult
+
+from src.goat_service.utils.llm_fan_out import agenerate_fan_out
+
+
+class FakeChain:
+    def __init__(self, n_failures=0):
+        self.n_calls = 0
+        self.n_running = 0
+        self.max_running = 0
+        self.n_failures = n_failures
+
+    async def agenerate(self, input_list):
+        self.n_calls += 1
+        call = self.n_calls
+        self.n_running += 1
+        self.max_running = max(self.max_running, self.n_running)
+        try:
+            await asyncio.sleep(0.01)
+            if call <= self.n_failures:
+                raise TimeoutError(f"call {call} failed")
+            return LLMResult(
+                generations=[[Generation(text=f"{input_list[0]['question']} {call}")]],
+                llm_output={"model_name": "fake"},
+            )
+        finally:
+            self.n_running -= 1
+
+
+def test_fan_out_merges_samples():
+    chain = FakeChain()
+    llm_result = asyncio.run(agenerate_fan_out(chain, "q", 10, 3))
+
+    assert chain.n_calls == 10
+    assert chain.max_running == 3
+    assert len(llm_result.generations) == 1
+    assert sorted(g.text for g in llm_result.generations[0]) == sorted(
+        f"q {i}" for i in range(1, 11)
+    )
+    assert llm_result.llm_output == {"model_name": "fake"}
+
+
+def test_fan_out_drops_failed_samples():
+    chain = FakeChain(n_failures=2)
+    llm_result = asyncio.run(agenerate_fan_out(chain, "q", 5, 5))
+
+    assert len(llm_result.generations[0]) == 3
+
+
+def test_fan_out_raises_if_all_fail():
+    chain = FakeChain(n_failures=3)
+    with pytest.raises(TimeoutError):
+        asyncio.run(agenerate_fan_out(chain, "q", 3, 2))
@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+
+from src.goat_service.utils.llm_hedging import (
+    LatencyHistogram,
+    LLMHedger,
+    latency_histograms,
+    timed_generate,
+)
+
+
+class FakeLLM:
+    def __init__(self, model, delay, error=None):
+        self.model = model
+        self.delay = delay
+        self.error = error
+        self.cancelled = False
+
+    async def agenerate_llm_result(self, prompter):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return self.model, None, prompter
+
+
+class TimedFakeLLM(FakeLLM):
+    # records its latencies like the real llms
+    async def agenerate_llm_result(self, prompter):
+        return await timed_generate(
+            self.model, lambda: super(TimedFakeLLM, self).agenerate_llm_result(prompter)
+        )
+
+
+def run_hedged(primary, backup, delay=0.05):
+    hedger = LLMHedger(0.9, default_delay=delay)
+    return asyncio.run(hedger.generate(primary, backup, "question"))
+
+
+def test_primary_within_delay():
+    primary, backup = FakeLLM("primary", 0.0), FakeLLM("backup", 0.0)
+    assert run_hedged(primary, backup)[0] == "primary"
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    primary, backup = FakeLLM("primary", 1.0), FakeLLM("backup", 0.0)
+    assert run_hedged(primary, backup)[0] == "backup"
+    assert primary.cancelled
+
+
+def test_slow_primary_still_wins_against_slower_backup():
+    primary, backup = FakeLLM("primary", 0.1), FakeLLM("backup", 1.0)
+    assert run_hedged(primary, backup)[0] == "primary"
+    assert backup.cancelled
+
+
+def test_failed_primary_uses_backup():
+    primary = FakeLLM("primary", 0.0, error=TimeoutError("stall"))
+    backup = FakeLLM("backup", 0.0)
+    assert run_hedged(primary, backup)[0] == "backup"
+
+    # hedged backup fails -> wait for the primary
+    primary, backup = FakeLLM("primary", 0.1), FakeLLM("backup", 0.0, ValueError())
+    assert run_hedged(primary, backup)[0] == "primary"
+
+
+def test_both_failed_raises():
+    primary = FakeLLM("primary", 0.1, error=TimeoutError("stall"))
+    backup = FakeLLM("backup", 0.0, error=ValueError("error"))
+    with pytest.raises(ValueError):
+        run_hedged(primary, backup)
+
+
+def test_cancelled_generate_cancels_both_calls():
+    primary, backup = FakeLLM("primary", 1.0), FakeLLM("backup", 1.0)
+    hedger = LLMHedger(0.9, default_delay=0.01)
+
+    async def run():
+        task = asyncio.create_task(hedger.generate(primary, backup, "question"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return primary.cancelled, backup.cancelled
+
+    # checked before asyncio.run cancels the remaining tasks
+    assert asyncio.run(run()) == (True, True)
+
+
+def test_latency_histogram_percentile():
+    histogram = LatencyHistogram(window_size=100)
+    assert histogram.percentile(0.9) is None
+    for i in range(200):
+        histogram.record(float(i))
+    # only the last 100 samples are kept
+    assert histogram.percentile(0.0) == 100.0
+    assert histogram.percentile(0.9) == 190.0
+    assert histogram.percentile(1.0) == 199.0
+
+
+def test_hedge_delay_adapts_to_recorded_latencies():
+    hedger = LLMHedger(0.5, default_delay=30, min_samples=3)
+    model = "test-hedge-delay-model"
+    assert hedger.hedge_delay(model) == 30
+
+    async def generate():
+        return "result"
+
+    for _ in range(3):
+        assert asyncio.run(timed_generate(model, generate)) == "result"
+    assert len(latency_histograms[model].samples) == 3
+    assert hedger.hedge_delay(model) < 1
+
+
+def test_cancelled_primaries_keep_hedge_delay():
+    model = "test-hedge-cancelled-model"
+    hedger = LLMHedger(0.5, default_delay=1.0, min_samples=4)
+    backup = FakeLLM("backup", 0.0)
+
+    async def run(delays):
+        for delay in delays:
+            await hedger.generate(TimedFakeLLM(model, delay), backup, "question")
+
+    # not hedged yet (default delay): the delay becomes the median of 0.01 / 0.05
+    asyncio.run(run([0.01, 0.01, 0.05, 0.05]))
+    assert hedger.hedge_delay(model) >= 0.05
+
+    # half of the primaries are slower than the delay and are hedged; their
+    # elapsed time is recorded, so the delay does not drift down to 0.01
+    asyncio.run(run([0.5, 0.01] * 3))
+    assert len(latency_histograms[model].samples) == 10
+    assert hedger.hedge_delay(model) >= 0.04
+
+
+def test_failed_calls_are_recorded():
+    model = "test-hedge-failed-model"
+
+    async def generate():
+        raise TimeoutError("stall")
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(timed_generate(model, generate))
+    assert len(latency_histograms[model].samples) == 1
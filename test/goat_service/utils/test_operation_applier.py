@@ -1,10 +1,30 @@
+import time
 from textwrap import dedent
 
 import pytest
 from gs_common.CodeProject import CodeFile, CodeProject
 
 from dataset.util import load_example_project
-from src.goat_service.utils.operation_applier import FileOperation, OperationApplier
+from src.goat_service.utils.operation_applier import (
+    FileOperation,
+    OperationApplier,
+    StreamingOperationApplier,
+)
+
+
+def assert_streaming_equivalent(source_project: CodeProject, generation: str):
+    # the streaming applier must match the batch applier for any chunking
+    batch_applier = OperationApplier(source_project, generation)
+    batch_result, batch_success = batch_applier.apply()
+    for chunk_size in [1, 3, 7, 64, len(generation) + 1]:
+        applier = StreamingOperationApplier(source_project)
+        for i in range(0, len(generation), chunk_size):
+            applier.feed(generation[i : i + chunk_size])
+        result, success = applier.finish()
+
+        assert applier.file_operations == batch_applier.file_operations
+        assert result == batch_result
+        assert success == batch_success
 
 
 def test_apply_success():
@@ -47,6 +67,7 @@ namespace AdapterPattern
 }
     """
 
+    assert_streaming_equivalent(source_project, generation)
     applier = OperationApplier(source_project, generation)
     result, success = applier.apply()
 
@@ -100,6 +121,7 @@ namespace AdapterPattern
 }
     """
 
+    assert_streaming_equivalent(source_project, generation)
     applier = OperationApplier(source_project, generation)
     result, success = applier.apply()
 
@@ -127,6 +149,7 @@ log4net.config
 >>>> REPLACE
     """
 
+    assert_streaming_equivalent(source_project, generation)
     applier = OperationApplier(source_project, generation)
     result, success = applier.apply()
 
@@ -159,6 +182,7 @@ Program.cs
 >>>> REPLACE
     """
 
+    assert_streaming_equivalent(source_project, generation)
     applier = OperationApplier(source_project, generation)
     result, success = applier.apply()
 
@@ -186,6 +210,7 @@ namespace AdapterPattern
 namespace TESTING
 >>>> REPLACE
     """
+    assert_streaming_equivalent(source_project, generation)
     applier = OperationApplier(source_project, generation)
     result, success = applier.apply()
 
@@ -236,6 +261,7 @@ namespace AdapterPattern
 }
     """
 
+    assert_streaming_equivalent(source_project, generation)
     applier = OperationApplier(source_project, generation)
     result, success = applier.apply()
 
@@ -263,6 +289,7 @@ new file path: log4net.config
 >>>> REPLACE
     """
 
+    assert_streaming_equivalent(source_project, generation)
     applier = OperationApplier(source_project, generation)
     result, success = applier.apply()
 
@@ -312,6 +339,7 @@ Hashids.net.csproj
   <Target Name="AfterBuild">
     """
 
+    assert_streaming_equivalent(source_project, generation)
     applier = OperationApplier(source_project, generation)
     result, success = applier.apply()
 
@@ -361,6 +389,7 @@ AdapterPattern.csproj
   <Target Name="AfterBuild">
     """
 
+    assert_streaming_equivalent(source_project, generation)
     applier = OperationApplier(source_project, generation)
     result, success = applier.apply()
 
@@ -399,6 +428,7 @@ Program.cs
 >>> REPLACE
     """
 
+    assert_streaming_equivalent(source_project, generation)
     applier = OperationApplier(source_project, generation)
     result, success = applier.apply()
 
@@ -457,6 +487,7 @@ namespace AdapterPattern
 }
     """
 
+    assert_streaming_equivalent(source_project, generation)
     applier = OperationApplier(source_project, generation)
     result, success = applier.apply()
 
@@ -523,6 +554,7 @@ Hashids.cs
 
     """
 
+    assert_streaming_equivalent(source_project, generation)
     applier = OperationApplier(source_project, generation)
     result, success = applier.apply()
 
@@ -574,6 +606,7 @@ namespace AdapterPattern
 }
     """
 
+    assert_streaming_equivalent(source_project, generation)
     applier = OperationApplier(source_project, generation)
     result, success = applier.apply()
 
@@ -603,8 +636,157 @@ asdkljasdöklasjdkl
 >>>> REPLACE
     """
 
+    assert_streaming_equivalent(source_project, generation)
     applier = OperationApplier(source_project, generation)
     result, success = applier.apply()
 
     assert success
     assert result.get_file(invalid_file_name).source_code == "asdkljasdöklasjdkl\n"
+
+
+def test_apply_copy_on_write_does_not_modify_source():
+    source_project = CodeProject(
+        display_name="AdapterPattern",
+        files=[
+            CodeFile(file_name="Program.cs", source_code="class Program {}\n"),
+            CodeFile(file_name="Other.cs", source_code="class Other {}\n"),
+            CodeFile(file_name="Removed.cs", source_code="class Removed {}\n"),
+        ],
+        source_language="dotnet8",
+    )
+    source_dump = source_project.model_dump()
+    generation = """\
+Program.cs
+<<<< SEARCH
+class Program {}
+====
+class TESTING {}
+>>>> REPLACE
+Removed.cs
+<<<< SEARCH
+====
+>>>> REPLACE
+New.cs
+<<<< SEARCH
+====
+class New {}
+>>>> REPLACE
+    """
+
+    assert_streaming_equivalent(source_project, generation)
+    applier = OperationApplier(source_project, generation)
+    result, success = applier.apply()
+
+    assert success
+    assert source_project.model_dump() == source_dump
+    assert result.get_file("Program.cs").source_code == "class TESTING {}\n"
+    assert result.get_file("Removed.cs") is None
+    assert result.get_file("New.cs").source_code == "class New {}\n"
+    # unchanged files are shared, changed files are new objects
+    assert result.get_file("Other.cs") is source_project.get_file("Other.cs")
+    assert result.get_file("Program.cs") is not source_project.get_file("Program.cs")
+    assert [f.file_name for f in result.files] == ["Program.cs", "Other.cs", "New.cs"]
+
+
+@pytest.mark.parametrize(
+    "generation, n_operations, expected_success",
+    [
+        # <<<< SEARCH on the first line takes the file name from the last line
+        ("<<<< SEARCH\n    {\n====\n    {}\n>>>> REPLACE\nProgram.cs", 1, True),
+        # nested start line inside a search block
+        (
+            "Program.cs\n<<<< SEARCH\n<<<< SEARCH extra\n    {\n====\n    {}\n>>>> REPLACE\n",
+            1,
+            False,
+        ),
+        # unterminated search and replace blocks
+        ("Program.cs\n<<<< SEARCH\n    {\n", 0, False),
+        ("Program.cs\n<<<< SEARCH\n    {\n====\n    {}\n", 0, False),
+        (
+            "Program.cs\n<<<< SEARCH\n    {\n====\n<<<< SEARCH\n    {\n====\n\n>>>> REPLACE",
+            0,
+            False,
+        ),
+        ("", 0, True),
+        ("Program.cs\n<<<< SEARCH", 0, False),
+    ],
+)
+def test_parse_edge_cases(generation, n_operations, expected_success):
+    source_project = CodeProject(
+        display_name="AdapterPattern",
+        files=[CodeFile(file_name="Program.cs", source_code="class A\n{\n}\n")],
+        source_language="dotnet8",
+    )
+    assert_streaming_equivalent(source_project, generation)
+    applier = OperationApplier(source_project, generation)
+    _, success = applier.apply()
+
+    assert len(applier.file_operations) == n_operations
+    assert all(op.file_name == "Program.cs" for op in applier.file_operations)
+    assert success == expected_success
+
+
+def test_streaming_applies_operation_when_block_completes():
+    source_project = CodeProject(
+        display_name="AdapterPattern",
+        files=[CodeFile(file_name="Program.cs", source_code="class A\n{\n}\n")],
+        source_language="dotnet8",
+    )
+    applier = StreamingOperationApplier(source_project)
+
+    assert applier.feed("Program.cs\n<<<< SEARCH\nclass A\n====\nclass B\n") == []
+    applied = applier.feed(">>>> REPLACE\nNew.cs\n<<<< SEARCH\n")
+    assert [op.file_name for op in applied] == ["Program.cs"]
+    assert applier.target_project.get_file("Program.cs").source_code == (
+        "class B\n{\n}\n"
+    )
+
+    applied = applier.feed("====\nclass C\n{\n}\n>>>> REPLACE")
+    assert applied == []
+    result, success = applier.finish()
+    assert success
+    assert result.get_file("New.cs").source_code == "class C\n{\n}\n"
+    assert source_project.get_file("Program.cs").source_code == "class A\n{\n}\n"
+
+
+@pytest.mark.parametrize(
+    "source, search_block, expected",
+    [
+        # long runs of whitespace-only lines made the old regex backtrack for ~10s
+        (
+            "class A\n" + "        \n" * 20_000 + "}\n",
+            "    missing();\n    other();\n",
+            None,
+        ),
+        (
+            "    foo();\n" + "   \n" * 20_000 + "    qux();\n",
+            "foo();\n    bar();\n",
+            None,
+        ),
+        (
+            "{\n" + "   \n" * 20_000 + "    foo();\n    bar();\n}\n",
+            "  foo();\n  bar();\n",
+            # the match starts at the first blank line, like with the regex
+            "{\n   x();\n}\n",
+        ),
+        ("    x = 1;\n" * 5_000, "x = 1;\n" * 200 + "y = 2;\n", None),
+    ],
+    ids=["blank_lines", "blank_lines_gap", "blank_lines_match", "repeated_lines"],
+)
+def test_replace_code_block_adversarial(source, search_block, expected):
+    applier = OperationApplier(CodeProject(display_name="A"), "")
+
+    t0 = time.monotonic()
+    result = applier.replace_code_block(source, search_block, "x();\n")
+    assert time.monotonic() - t0 < applier.fuzzy_match_time_budget
+
+    # no match leaves the file unchanged
+    assert result == (source if expected is None else expected)
+
+
+def test_replace_code_block_time_budget():
+    applier = OperationApplier(CodeProject(display_name="A"), "")
+    applier.fuzzy_match_time_budget = -1
+
+    source = "    foo();\n    bar();\n"
+    assert applier.replace_code_block(source, "  foo();\n  bar();\n", "x\n") is None
@@ -0,0 +1,109 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from gs_common.CodeProject import CodeFile, CodeProject
+from gs_common.project_delta import apply_delta
+from gs_common.wire_format import WireFormat, decode_request
+
+from src.goat_service.utils import grpc_code_executor_calls
+from src.goat_service.utils.grpc_code_executor_calls import _call_execute_tests
+from src.goat_service.utils.project_delta_sender import ProjectDeltaSender
+
+
+def make_project(source_code: str) -> CodeProject:
+    return CodeProject(
+        display_name="Fib",
+        source_language="dotnet8",
+        files=[
+            CodeFile(file_name="Fib.cs", source_code=source_code),
+            CodeFile(file_name="Util.cs", source_code="class Util {}" * 1000),
+        ],
+    )
+
+
+class FakeCodeExecutor:
+    """
+    execute_tests with a base project cache (see code_executor.main).
+    """
+
+    def __init__(self):
+        self.bases = {}
+        self.requests = []
+
+    async def invoke_method(self, service_name, method_name, data, timeout):
+        request = decode_request(
+            data, ["source_project", "base_project"], ["source_project_delta"]
+        )
+        self.requests.append(request)
+        if "source_project_delta" in request:
+            if "base_project" in request:
+                base = request["base_project"]
+                self.bases[base.content_hash(normalize=False)] = base
+            base = self.bases.get(request["source_project_delta"].base_hash)
+            if base is None:
+                return SimpleNamespace(data=json.dumps({"missing_base": True}))
+            source_project = apply_delta(base, request["source_project_delta"])
+        else:
+            source_project = request["source_project"]
+        return SimpleNamespace(
+            data=json.dumps({"source_code": source_project.files[0].source_code})
+        )
+
+
+@pytest.fixture
+def code_executor(monkeypatch):
+    monkeypatch.setattr(WireFormat, "default", WireFormat(compress=False))
+    monkeypatch.setattr(ProjectDeltaSender, "default", ProjectDeltaSender())
+    code_executor = FakeCodeExecutor()
+    monkeypatch.setattr(
+        grpc_code_executor_calls, "invoke_method", code_executor.invoke_method
+    )
+    return code_executor
+
+
+def execute(source_project: CodeProject, base_project: CodeProject | None) -> str:
+    test_project = CodeProject(display_name="FibTests")
+    response = asyncio.run(
+        _call_execute_tests(source_project, test_project, "dotnet8", base_project)
+    )
+    return response["source_code"]
+
+
+def test_base_is_sent_once(code_executor):
+    base = make_project("class Fib {}")
+    for i in range(3):
+        candidate = base.copy_on_write()
+        candidate.update_file("Fib.cs", f"class Fib{i} {{}}")
+        assert execute(candidate, base) == f"class Fib{i} {{}}"
+
+    assert ["base_project" in r for r in code_executor.requests] == [
+        True,
+        False,
+        False,
+    ]
+    assert all("source_project" not in r for r in code_executor.requests)
+
+
+def test_missing_base_is_sent_again(code_executor):
+    base = make_project("class Fib {}")
+    execute(base, base)
+    # e.g. the code executor restarted
+    code_executor.bases.clear()
+
+    assert execute(base, base) == "class Fib {}"
+    assert ["base_project" in r for r in code_executor.requests] == [
+        True,
+        False,
+        True,
+    ]
+
+
+def test_without_base_or_sender(code_executor, monkeypatch):
+    project = make_project("class Fib {}")
+    execute(project, None)
+    monkeypatch.setattr(ProjectDeltaSender, "default", None)
+    execute(project, project)
+
+    assert all("source_project" in r for r in code_executor.requests)
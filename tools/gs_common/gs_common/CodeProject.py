@@ -1,10 +1,14 @@
 import base64
+import hashlib
 import logging
 import os
+import weakref
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
+
+from gs_common.file_ops.blob_store import BlobStore
 
 SKIP_DIRS = [
     ".vs",
@@ -67,13 +71,155 @@ BINARY_FILE_EXTENSIONS = [
 ]
 
 
+def normalize_source_code(source_code: str) -> str:
+    """
+    Source code without whitespace-only differences (line endings, indentation,
+    trailing whitespace, blank lines).
+    NOTE: whitespace changes inside multi-line string literals are ignored too.
+    """
+    lines = (line.strip() for line in source_code.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
 class CodeFile(BaseModel):
     file_name: str
     source_code: str = ""
 
+    # cache for content_hash, reset when source_code is changed
+    _content_hash: Optional[str] = PrivateAttr(default=None)
+    # FileIndexes that contain this file, invalidated when file_name is changed
+    _indexes: Optional[Dict[int, "weakref.ref[FileIndex]"]] = PrivateAttr(default=None)
+
     def __lt__(self, other):
         return self.file_name < other.file_name
 
+    def __eq__(self, other):
+        # only compare fields; the content hash is a cache
+        if not isinstance(other, CodeFile):
+            return NotImplemented
+        return self.__dict__ == other.__dict__
+
+    def __setattr__(self, name, value):
+        if name == "source_code":
+            self._content_hash = None
+        elif name == "file_name" and self._indexes:
+            for index_ref in self._indexes.values():
+                index = index_ref()
+                if index is not None:
+                    index.invalidate()
+            self._indexes = None
+        super().__setattr__(name, value)
+
+    def __getstate__(self):
+        # the indexes are local to the process (weak references cannot be pickled)
+        state = super().__getstate__()
+        private = state.get("__pydantic_private__")
+        if private and private.get("_indexes") is not None:
+            state["__pydantic_private__"] = {**private, "_indexes": None}
+        return state
+
+    def content_hash(self, normalize: bool = True) -> str:
+        """
+        sha256 of the source code, by default normalized (see normalize_source_code).
+        """
+        if not normalize:
+            return hashlib.sha256(self.source_code.encode()).hexdigest()
+        if self._content_hash is None:
+            normalized = normalize_source_code(self.source_code)
+            self._content_hash = hashlib.sha256(normalized.encode()).hexdigest()
+        return self._content_hash
+
+
+class FileIndex:
+    """
+    Name -> position lookup for a list of CodeFiles.
+    The index is rebuilt lazily when the list is replaced or changes its length,
+    and when one of its CodeFiles is renamed (file.file_name = ...), so a miss
+    is a real miss. A hit is checked against the file name, which covers lists
+    that were reordered in place. Replace items of the list with add_file,
+    update_file or rename_file, not by assigning files[i] directly.
+    """
+
+    def __init__(self):
+        self.files: Optional[List[CodeFile]] = None
+        self.n_files = -1
+        self.positions: Dict[str, int] = {}
+        self._ref = weakref.ref(self)
+
+    def __reduce__(self):
+        # copies and unpickled indexes start empty, rebuilt on the first lookup
+        return (FileIndex, ())
+
+    def invalidate(self):
+        self.files = None
+
+    def _register(self, code_file: CodeFile):
+        indexes = code_file._indexes
+        if indexes is None:
+            indexes = code_file._indexes = {}
+        elif len(indexes) >= 16 and len(indexes) & (len(indexes) - 1) == 0:
+            # a shared CodeFile can outlive many indexes (see
+            # CodeProject.copy_on_write), drop the dead ones now and then
+            for key in [k for k, ref in indexes.items() if ref() is None]:
+                del indexes[key]
+        indexes[id(self)] = self._ref
+
+    def _get_positions(self, files: List[CodeFile]) -> Dict[str, int]:
+        if files is not self.files or len(files) != self.n_files:
+            self.positions = {}
+            for i, f in enumerate(files):
+                # keep first occurrence, same as a linear scan would
+                self.positions.setdefault(f.file_name, i)
+                self._register(f)
+            # NOTE: keep a reference to the list, comparing ids is not safe
+            # because a freed list can be reused at the same address
+            self.files = files
+            self.n_files = len(files)
+        return self.positions
+
+    def position(self, files: List[CodeFile], file_name: str) -> Optional[int]:
+        pos = self._get_positions(files).get(file_name)
+        if pos is not None and files[pos].file_name != file_name:
+            # list was reordered in place -> rebuild
+            self.invalidate()
+            pos = self._get_positions(files).get(file_name)
+        return pos
+
+    def get(self, files: List[CodeFile], file_name: str) -> Optional[CodeFile]:
+        pos = self.position(files, file_name)
+        return None if pos is None else files[pos]
+
+    def add(self, files: List[CodeFile], code_file: CodeFile):
+        positions = self._get_positions(files)
+        files.append(code_file)
+        positions.setdefault(code_file.file_name, len(files) - 1)
+        self.n_files = len(files)
+        self._register(code_file)
+
+    def replace(self, files: List[CodeFile], code_file: CodeFile) -> bool:
+        pos = self.position(files, code_file.file_name)
+        if pos is None:
+            return False
+        files[pos] = code_file
+        self._register(code_file)
+        return True
+
+    def rename(self, files: List[CodeFile], file_name: str, new_file_name: str) -> bool:
+        pos = self.position(files, file_name)
+        if pos is None:
+            return False
+        files[pos] = CodeFile(
+            file_name=new_file_name, source_code=files[pos].source_code
+        )
+        self.invalidate()
+        return True
+
+    def remove(self, files: List[CodeFile], file_name: str) -> List[CodeFile]:
+        new_files = [f for f in files if f.file_name != file_name]
+        # positions shift after the removed files -> rebuild on next lookup
+        self.invalidate()
+        return new_files
+
 
 class CodeProject(BaseModel):
     display_name: str = ""
@@ -81,6 +227,35 @@ class CodeProject(BaseModel):
     files: List[CodeFile] = []
     reference_files: List[CodeFile] = []
 
+    _file_index: FileIndex = PrivateAttr(default_factory=FileIndex)
+    _reference_file_index: FileIndex = PrivateAttr(default_factory=FileIndex)
+
+    def __eq__(self, other):
+        # only compare fields; the file indexes are caches
+        if not isinstance(other, CodeProject):
+            return NotImplemented
+        return self.__dict__ == other.__dict__
+
+    def content_hash(self, normalize: bool = True) -> str:
+        """
+        Canonical hash of the project content: a hash over the sorted file paths
+        and the content hashes of the files (see CodeFile.content_hash).
+        Projects with the same hash only differ in display_name and, if
+        normalize, whitespace.
+        """
+        h = hashlib.sha256(self.source_language.encode())
+        for kind, files in (
+            ("files", self.files),
+            ("reference_files", self.reference_files),
+        ):
+            entries = sorted(
+                (file.file_name.replace("\\", "/"), file.content_hash(normalize))
+                for file in files
+            )
+            for file_name, file_hash in entries:
+                h.update(f"\0{kind}\0{file_name}\0{file_hash}".encode())
+        return h.hexdigest()
+
     def __str__(self):
         s = f"Project folder: {self.display_name}\n"
         s += "Code files:\n"
@@ -91,51 +266,79 @@ class CodeProject(BaseModel):
             s += "```\n"
         return s
 
+    def copy_on_write(self) -> "CodeProject":
+        """
+        Cheap copy of the project that shares the CodeFile objects.
+        add_file/update_file/remove_file never mutate a CodeFile in place,
+        they replace it in the list, so changes on the copy do not leak
+        into this project. Do not modify shared CodeFiles directly.
+        """
+        return CodeProject(
+            display_name=self.display_name,
+            source_language=self.source_language,
+            files=list(self.files),
+            reference_files=list(self.reference_files),
+        )
+
     def add_file(self, file_name: str, source_code: str):
-        for f in self.files:
-            if f.file_name == file_name:
-                logging.warning(f"Overwriting file {file_name}")
-                f.source_code = source_code
-                return
-        self.files.append(CodeFile(file_name=file_name, source_code=source_code))
+        code_file = CodeFile(file_name=file_name, source_code=source_code)
+        if self._file_index.replace(self.files, code_file):
+            logging.warning(f"Overwriting file {file_name}")
+            return
+        self._file_index.add(self.files, code_file)
+
+    def update_file(self, file_name: str, source_code: str) -> bool:
+        # replace instead of mutating, the CodeFile may be shared (see copy_on_write)
+        code_file = CodeFile(file_name=file_name, source_code=source_code)
+        return self._file_index.replace(self.files, code_file)
 
     def remove_file(self, file_name: str) -> bool:
-        n_files_before = len(self.files)
-        self.files = [f for f in self.files if f.file_name != file_name]
-        n_files_after = len(self.files)
-        success = n_files_before != n_files_after
-        if not success:
+        if self._file_index.position(self.files, file_name) is None:
             logging.warning(f"Could not remove file {file_name}")
-        return success
+            return False
+        self.files = self._file_index.remove(self.files, file_name)
+        return True
+
+    def rename_file(self, old_file_name: str, new_file_name: str) -> bool:
+        if not self._file_index.rename(self.files, old_file_name, new_file_name):
+            logging.warning(f"Could not rename file {old_file_name}")
+            return False
+        return True
 
     def add_reference_file(self, file_name: str, source_code: str):
-        for f in self.reference_files:
-            if f.file_name == file_name:
-                logging.warning(f"Overwriting reference file {file_name}")
-                f.source_code = source_code
-                return
-        self.reference_files.append(
-            CodeFile(file_name=file_name, source_code=source_code)
-        )
+        code_file = CodeFile(file_name=file_name, source_code=source_code)
+        if self._reference_file_index.replace(self.reference_files, code_file):
+            logging.warning(f"Overwriting reference file {file_name}")
+            return
+        self._reference_file_index.add(self.reference_files, code_file)
 
     def remove_reference_file(self, file_name: str) -> bool:
-        n_files_before = len(self.reference_files)
-        self.reference_files = [
-            f for f in self.reference_files if f.file_name != file_name
-        ]
-        n_files_after = len(self.reference_files)
-        success = n_files_before != n_files_after
-        if not success:
+        if self._reference_file_index.position(self.reference_files, file_name) is None:
             logging.warning(f"Could not remove reference file {file_name}")
-        return success
+            return False
+        self.reference_files = self._reference_file_index.remove(
+            self.reference_files, file_name
+        )
+        return True
 
     def get_file(self, file_name: str) -> Optional[CodeFile]:
-        for file in self.files:
-            if file.file_name == file_name:
-                return file
-        return None
+        return self._file_index.get(self.files, file_name)
 
-    def save_to_dir(self, project_base_dir: str):
+    def get_reference_file(self, file_name: str) -> Optional[CodeFile]:
+        return self._reference_file_index.get(self.reference_files, file_name)
+
+    def save_to_dir(
+        self,
+        project_base_dir: str,
+        blob_store: Optional[BlobStore] = None,
+        hardlink: bool = True,
+    ):
+        """
+        Write all files (reference files first) to project_base_dir.
+        With a blob_store the files are materialized from the store (see
+        BlobStore.materialize); hardlink=False if the saved files are modified
+        in place later (e.g. by the upgrade-assistant).
+        """
         # check duplicate files in files and reference_files
         reference_file_names = [f.file_name for f in self.reference_files]
         file_names = [f.file_name for f in self.files]
@@ -159,25 +362,35 @@ class CodeProject(BaseModel):
                         os.path.join(project_base_dir, os.path.dirname(file_name)),
                         exist_ok=True,
                     )
-                if CodeProject._is_binary_file(file_name):
-                    # Try to decode the source_code from base64
-                    content = base64.b64decode(code_file.source_code)
-                    mode = "wb"
-                    encoding = None
+                binary = CodeProject._is_binary_file(file_name)
+                file_path = os.path.join(project_base_dir, file_name)
+                if blob_store is None:
+                    CodeProject._write_file(code_file, file_path, binary)
                 else:
-                    # If it can't be decoded from base64, treat it as text
-                    content = code_file.source_code
-                    mode = "w"
-                    encoding = "utf-8"
-                with open(
-                    os.path.join(project_base_dir, file_name),
-                    mode,
-                    encoding=encoding,
-                ) as f:
-                    f.write(content)
+                    blob_store.materialize(
+                        BlobStore.make_key(code_file.source_code, binary),
+                        file_path,
+                        lambda path: CodeProject._write_file(code_file, path, binary),
+                        hardlink,
+                    )
             except Exception as e:
                 logging.error(f"Error saving file {file_name}: {e}")
 
+    @staticmethod
+    def _write_file(code_file: CodeFile, file_path: str, binary: bool):
+        if binary:
+            # Try to decode the source_code from base64
+            content = base64.b64decode(code_file.source_code)
+            mode = "wb"
+            encoding = None
+        else:
+            # If it can't be decoded from base64, treat it as text
+            content = code_file.source_code
+            mode = "w"
+            encoding = "utf-8"
+        with open(file_path, mode, encoding=encoding) as f:
+            f.write(content)
+
     @staticmethod
     def _is_binary_file(file_path):
         _, ext = os.path.splitext(file_path)
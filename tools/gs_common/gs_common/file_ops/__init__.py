@@ -1,3 +1,5 @@
+from .blob_store import BlobStore
+from .disk_cache import DiskCache
 from .file_ops import (
     backup_dict,
     backup_dict_in_background,
@@ -5,6 +7,8 @@ from .file_ops import (
 )
 
 __all__ = [
+    "BlobStore",
+    "DiskCache",
     "backup_dict",
     "backup_dict_in_background",
     "generate_save_dir",
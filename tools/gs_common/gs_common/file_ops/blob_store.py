@@ -0,0 +1,186 @@
+import errno
+import hashlib
+import logging
+import os
+import shutil
+import stat
+import threading
+import uuid
+from collections.abc import Callable
+
+try:
+    import fcntl
+except ImportError:
+    # windows: no reflinks
+    fcntl = None
+
+# ioctl to clone a file on copy-on-write filesystems (btrfs, xfs), linux only
+FICLONE = 0x40049409
+# errors of os.link / FICLONE if the filesystem does not support them
+UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP, errno.EINVAL}
+
+
+def _read_only_protects_blobs() -> bool:
+    """
+    Whether the read-only mode of a blob stops in-place writes through its
+    hardlinks. Not on windows (the mode is not set there) and not for root
+    (ignores the mode).
+    """
+    return os.name != "nt" and os.geteuid() != 0
+
+
+class BlobStore:
+    """
+    File contents by content hash, one read-only file per blob in store_dir.
+    Saving a project (see CodeProject.save_to_dir) materializes every file from its
+    blob: a hardlink (or a reflink / copy if hardlink=False or not supported)
+    instead of writing (and base64 decoding) the content again.
+
+    Hardlinked files share the blob: they must be replaced, never modified in
+    place. The read-only mode of the blobs enforces this; where it does not
+    (windows, running as root) files are never hardlinked, an in-place write
+    by a build tool would otherwise corrupt the blob for every other job.
+    Blobs are written to a temp file and renamed, so population is safe
+    across threads and processes. If the store grows beyond max_size_bytes the
+    oldest blobs are removed; files linked to them are not affected.
+    """
+
+    # store used by the code executor to save projects, None = disabled
+    default: "BlobStore" = None
+
+    def __init__(self, store_dir: str, max_size_bytes: int):
+        self.store_dir = os.path.abspath(store_dir)
+        self.max_size_bytes = max_size_bytes
+        self._lock = threading.Lock()
+        self._can_hardlink = _read_only_protects_blobs()
+        if not self._can_hardlink:
+            logging.info("Blobs are writable for this process, not hardlinking them")
+        self._can_reflink = fcntl is not None
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._blobs())
+
+    @staticmethod
+    def configure(store_dir: str | None, max_size_mb: float):
+        """
+        Set BlobStore.default to a store in store_dir.
+        store_dir None disables the store.
+        """
+        if not store_dir:
+            BlobStore.default = None
+            return
+        logging.info(f"Using blob store in {store_dir}")
+        BlobStore.default = BlobStore(store_dir, int(max_size_mb * 1024 * 1024))
+
+    @staticmethod
+    def make_key(content: str, binary: bool) -> str:
+        """
+        Key of a file content as saved: the same string is saved differently as
+        binary (base64 decoded) and as text file.
+        """
+        kind = b"b\0" if binary else b"t\0"
+        return hashlib.sha256(kind + content.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.store_dir, key[:2], key)
+
+    def _populate(self, path: str, write: Callable[[str], None]):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+        try:
+            write(tmp_path)
+            if os.name != "nt":
+                # stops in-place writes to hardlinked files (except by root)
+                os.chmod(tmp_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        with self._lock:
+            self._size += os.stat(path).st_size
+            evict = self._size > self.max_size_bytes
+        if evict:
+            self.evict()
+
+    def _link(self, path: str, target_path: str, hardlink: bool):
+        if hardlink and self._can_hardlink:
+            try:
+                os.link(path, target_path)
+                return
+            except OSError as e:
+                if e.errno not in UNSUPPORTED_ERRNOS:
+                    raise
+                logging.warning(f"Cannot hardlink from blob store, copying: {e}")
+                self._can_hardlink = False
+        if self._can_reflink:
+            try:
+                with open(path, "rb") as src, open(target_path, "wb") as dst:
+                    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return
+            except OSError as e:
+                if e.errno not in UNSUPPORTED_ERRNOS | {errno.ENOTTY}:
+                    raise
+                self._can_reflink = False
+        shutil.copyfile(path, target_path)
+
+    def materialize(
+        self,
+        key: str,
+        target_path: str,
+        write: Callable[[str], None],
+        hardlink: bool = True,
+    ):
+        """
+        Create target_path with the content of blob key; an existing file at
+        target_path is replaced. On a miss write(path) is called to write the
+        content of the blob to path.
+        """
+        path = self._path(key)
+        if not os.path.isfile(path):
+            self._populate(path, write)
+        tmp_path = None
+        if os.path.lexists(target_path):
+            # link next to the target, then replace it (never write into it)
+            tmp_path = f"{target_path}.tmp-{uuid.uuid4().hex}"
+        try:
+            self._link(path, tmp_path or target_path, hardlink)
+        except FileNotFoundError:
+            # blob evicted in the meantime
+            self._populate(path, write)
+            self._link(path, tmp_path or target_path, hardlink)
+        if tmp_path is not None:
+            os.replace(tmp_path, target_path)
+
+    def _blobs(self) -> list[tuple[float, int, str]]:
+        blobs = []
+        for prefix in os.scandir(self.store_dir):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                if ".tmp-" in entry.name:
+                    continue
+                try:
+                    stat_result = entry.stat()
+                except FileNotFoundError:
+                    continue
+                blobs.append((stat_result.st_mtime, stat_result.st_size, entry.path))
+        return blobs
+
+    def evict(self):
+        """
+        Remove the oldest blobs until the store is below max_size_bytes.
+        NOTE: by time of population, not of the last use: touching a blob
+        would also touch all files linked to it.
+        """
+        blobs = sorted(self._blobs())
+        total_size = sum(size for _, size, _ in blobs)
+        for _, size, path in blobs:
+            if total_size <= self.max_size_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+        with self._lock:
+            self._size = total_size
+        logging.info(f"GSMETRIC:blob_store_size_mb={total_size / 1024 / 1024:.0f}")
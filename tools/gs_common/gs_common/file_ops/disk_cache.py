@@ -0,0 +1,78 @@
+import os
+import tempfile
+import threading
+import time
+
+
+class DiskCache:
+    """
+    String values by key, one file per key in cache_dir.
+    Entries expire after ttl_seconds; if the cache grows beyond max_size_bytes
+    the least recently used entries are removed.
+    """
+
+    def __init__(self, cache_dir: str, ttl_seconds: float, max_size_bytes: int):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_size_bytes = max_size_bytes
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            # mtime: time of the last set, atime: time of the last use
+            stat = os.stat(path)
+            now = time.time()
+            if now - stat.st_mtime > self.ttl_seconds:
+                self._remove(path)
+                return None
+            with open(path, "r") as f:
+                value = f.read()
+            os.utime(path, (now, stat.st_mtime))
+            return value
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, value: str):
+        # write to a temp file first so readers never see partial entries
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(value)
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+
+    def evict(self):
+        with self.lock:
+            now = time.time()
+            entries = []
+            total_size = 0
+            for entry in os.scandir(self.cache_dir):
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if now - stat.st_mtime > self.ttl_seconds:
+                    self._remove(entry.path)
+                    continue
+                entries.append((stat.st_atime, stat.st_size, entry.path))
+                total_size += stat.st_size
+
+            # least recently used first
+            entries.sort()
+            for _, size, path in entries:
+                if total_size <= self.max_size_bytes:
+                    break
+                self._remove(path)
+                total_size -= size
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
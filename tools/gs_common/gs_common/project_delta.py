@@ -0,0 +1,106 @@
+from gs_common.CodeProject import CodeFile, CodeProject
+from gs_common.proto import common_pb2
+
+
+def _file_changes(
+    base_files: list[CodeFile], files: list[CodeFile]
+) -> common_pb2.FileChanges | None:
+    base_by_name = {f.file_name: f for f in base_files}
+    by_name = {f.file_name: f for f in files}
+    if len(base_by_name) != len(base_files) or len(by_name) != len(files):
+        # duplicate file names, cannot be addressed by name
+        return None
+    changes = common_pb2.FileChanges()
+    for code_file in files:
+        base_file = base_by_name.get(code_file.file_name)
+        if base_file is None:
+            changes.added.add(
+                file_name=code_file.file_name, source_code=code_file.source_code
+            )
+        # shared CodeFile (see CodeProject.copy_on_write) -> no string compare
+        elif base_file is not code_file and (
+            base_file.source_code != code_file.source_code
+        ):
+            changes.changed.add(
+                file_name=code_file.file_name, source_code=code_file.source_code
+            )
+    changes.deleted.extend(
+        f.file_name for f in base_files if f.file_name not in by_name
+    )
+    return changes
+
+
+def _apply_changes(
+    base_files: list[CodeFile], changes: common_pb2.FileChanges
+) -> list[CodeFile]:
+    changed = {f.file_name: f.source_code for f in changes.changed}
+    deleted = set(changes.deleted)
+    files = []
+    for code_file in base_files:
+        if code_file.file_name in deleted:
+            continue
+        if code_file.file_name in changed:
+            code_file = CodeFile(
+                file_name=code_file.file_name,
+                source_code=changed.pop(code_file.file_name),
+            )
+        files.append(code_file)
+    if changed:
+        raise ValueError(f"Changed files not in base project: {list(changed)}")
+    files.extend(
+        CodeFile(file_name=f.file_name, source_code=f.source_code)
+        for f in changes.added
+    )
+    return files
+
+
+def make_delta(
+    base: CodeProject, project: CodeProject, base_hash: str | None = None
+) -> common_pb2.ProjectDelta | None:
+    """
+    project as a ProjectDelta against base: the changed, added and deleted files
+    (by file_name). None if the files of base or project cannot be addressed by
+    name (duplicate file names), send the complete project then.
+    base_hash: base.content_hash(normalize=False) if already known.
+    """
+    files = _file_changes(base.files, project.files)
+    reference_files = _file_changes(base.reference_files, project.reference_files)
+    if files is None or reference_files is None:
+        return None
+    return common_pb2.ProjectDelta(
+        base_hash=base_hash or base.content_hash(normalize=False),
+        source_language=project.source_language,
+        display_name=project.display_name,
+        files=files,
+        reference_files=reference_files,
+    )
+
+
+def apply_delta(
+    base: CodeProject, delta: common_pb2.ProjectDelta, base_hash: str | None = None
+) -> CodeProject:
+    """
+    Inverse of make_delta: the project with the same files as the project the
+    delta was made of. Added files come after the files of base, so the order
+    of the files can differ. The unchanged CodeFiles are shared with base (as
+    CodeProject.copy_on_write), copy the project before modifying files in place.
+    Raises ValueError if the delta was made against another base.
+    """
+    if (base_hash or base.content_hash(normalize=False)) != delta.base_hash:
+        raise ValueError("Project delta does not match the base project")
+    return CodeProject(
+        source_language=delta.source_language,
+        display_name=delta.display_name,
+        files=_apply_changes(base.files, delta.files),
+        reference_files=_apply_changes(base.reference_files, delta.reference_files),
+    )
+
+
+def delta_size(delta: common_pb2.ProjectDelta) -> int:
+    """
+    Number of changed, added and deleted files (incl. reference files).
+    """
+    return sum(
+        len(changes.changed) + len(changes.added) + len(changes.deleted)
+        for changes in (delta.files, delta.reference_files)
+    )
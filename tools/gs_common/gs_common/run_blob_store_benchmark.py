@@ -0,0 +1,67 @@
+import base64
+import os
+import shutil
+import time
+
+from gs_common.CodeProject import CodeFile, CodeProject
+from gs_common.file_ops import BlobStore
+
+"""
+Benchmark for saving a large, reference-heavy project (5000 files) with
+CodeProject.save_to_dir: writing every file vs materializing from a BlobStore
+with hardlinks and with copies (reflinks where supported).
+NOTE: the store copies instead of hardlinking on windows and as root.
+Run with: pytest tools/gs_common/gs_common/run_blob_store_benchmark.py -s
+"""
+
+N_FILES = 5_000
+N_SAVES = 5
+
+
+def make_project() -> CodeProject:
+    files = [
+        CodeFile(
+            file_name=f"src/dir{i % 50}/File{i}.cs",
+            source_code=f"class File{i} {{}}\n" * 100,
+        )
+        for i in range(N_FILES // 2)
+    ]
+    reference_files = [
+        CodeFile(
+            file_name=f"packages/lib{i % 50}/Lib{i}.dll",
+            source_code=base64.b64encode(os.urandom(16 * 1024)).decode(),
+        )
+        for i in range(N_FILES // 2)
+    ]
+    return CodeProject(
+        display_name="benchmark",
+        source_language="dotnet8",
+        files=files,
+        reference_files=reference_files,
+    )
+
+
+def time_saves(project: CodeProject, base_dir: str, **kwargs) -> list[float]:
+    times = []
+    for i in range(N_SAVES):
+        project_dir = os.path.join(base_dir, str(i))
+        t0 = time.time()
+        project.save_to_dir(project_dir, **kwargs)
+        times.append(time.time() - t0)
+        shutil.rmtree(project_dir)
+    return times
+
+
+def test_blob_store_benchmark(tmp_path):
+    project = make_project()
+    store = BlobStore(str(tmp_path / "store"), 1024 * 1024 * 1024)
+    for mode, kwargs in [
+        ("write", {}),
+        ("hardlink", {"blob_store": store}),
+        ("copy", {"blob_store": store, "hardlink": False}),
+    ]:
+        times = time_saves(project, str(tmp_path / mode), **kwargs)
+        print(
+            f"{mode:>9}: first save {times[0] * 1000:7.0f}ms, "
+            f"later saves {min(times[1:]) * 1000:7.0f}ms"
+        )
@@ -0,0 +1,91 @@
+import timeit
+
+from gs_common.CodeProject import CodeFile, CodeProject
+
+"""
+Microbenchmark for CodeProject file lookups.
+Run with: pytest tools/gs_common/gs_common/run_code_project_benchmark.py -s
+"""
+
+N_LOOKUPS = 1_000
+
+
+def make_project(n_files: int) -> CodeProject:
+    return CodeProject(
+        display_name="benchmark",
+        source_language="dotnet8",
+        files=[
+            CodeFile(file_name=f"src/dir{i % 50}/File{i}.cs", source_code="")
+            for i in range(n_files)
+        ],
+    )
+
+
+def linear_get_file(project: CodeProject, file_name: str):
+    # old implementation of CodeProject.get_file
+    for file in project.files:
+        if file.file_name == file_name:
+            return file
+    return None
+
+
+def test_get_file_lookup_cost_is_flat():
+    times = {}
+    for n_files in [10, 100, 1_000, 10_000]:
+        project = make_project(n_files)
+        # lookups spread over the whole project, worst case is the last file
+        names = [
+            project.files[i * n_files // N_LOOKUPS].file_name for i in range(N_LOOKUPS)
+        ]
+        t_index = min(
+            timeit.repeat(lambda: [project.get_file(n) for n in names], number=1)
+        )
+        t_linear = min(
+            timeit.repeat(
+                lambda: [linear_get_file(project, n) for n in names],
+                number=1,
+                repeat=3,
+            )
+        )
+        times[n_files] = t_index
+        print(
+            f"{n_files=:>6}: indexed {t_index / N_LOOKUPS * 1e6:8.2f} us/lookup, "
+            f"linear {t_linear / N_LOOKUPS * 1e6:10.2f} us/lookup"
+        )
+
+    # 1000x more files should not make lookups noticeably slower
+    assert times[10_000] < times[10] * 10
+
+
+def test_get_file_miss_cost_is_flat():
+    times = {}
+    for n_files in [10, 100, 1_000, 10_000]:
+        project = make_project(n_files)
+        names = [f"src/missing/File{i}.cs" for i in range(N_LOOKUPS)]
+        t_index = min(
+            timeit.repeat(lambda: [project.get_file(n) for n in names], number=1)
+        )
+        times[n_files] = t_index
+        print(f"{n_files=:>6}: indexed {t_index / N_LOOKUPS * 1e6:8.2f} us/miss")
+
+    assert times[10_000] < times[10] * 10
+
+
+def test_add_file_cost_is_flat():
+    n_adds = 200
+    times = {}
+    for n_files in [10, 100, 1_000, 10_000, 40_000]:
+
+        def add_files():
+            project = make_project(n_files)
+            project.get_file(project.files[0].file_name)
+            start = timeit.default_timer()
+            for i in range(n_adds):
+                project.add_file(f"src/new/File{i}.cs", "")
+            return timeit.default_timer() - start
+
+        t_add = min(add_files() for _ in range(3))
+        times[n_files] = t_add
+        print(f"{n_files=:>6}: {t_add / n_adds * 1e6:8.2f} us/add_file")
+
+    assert times[40_000] < times[10] * 10
@@ -0,0 +1,76 @@
+import time
+
+from gs_common.CodeProject import CodeFile, CodeProject
+from gs_common.project_delta import apply_delta, make_delta
+from gs_common.proto.common_pb2 import CodeProject as ProtoCodeProject
+from gs_common.proto.tl_generator_pb2 import TLGeneratorResponse
+
+"""
+Benchmark for the translation candidates as deltas: size of a TLGeneratorResponse
+with 10 candidates of a ~20 MB project, each changing a few files, as complete
+projects (solutions) and as deltas (solution_deltas), and the time to make and
+apply the deltas.
+Run with: pytest tools/gs_common/gs_common/run_project_delta_benchmark.py -s
+"""
+
+N_CANDIDATES = 10
+N_CHANGED_FILES = 5
+
+
+def make_project() -> CodeProject:
+    # 2000 files of ~10 KB
+    return CodeProject(
+        display_name="synthetic",
+        source_language="dotnetframework",
+        files=[
+            CodeFile(
+                file_name=f"src/dir{i % 50}/File{i}.cs",
+                source_code=f"class File{i} {{ int x = {i}; }}\n" * 360,
+            )
+            for i in range(2_000)
+        ],
+    )
+
+
+def make_candidates(source_project: CodeProject) -> list[CodeProject]:
+    # as the OperationApplier: a copy_on_write of the source with a few files replaced
+    candidates = []
+    for i in range(N_CANDIDATES):
+        candidate = source_project.copy_on_write()
+        candidate.source_language = "dotnet8"
+        for j in range(N_CHANGED_FILES):
+            code_file = source_project.files[i * N_CHANGED_FILES + j]
+            candidate.update_file(code_file.file_name, code_file.source_code + "// ")
+        candidate.add_file(f"src/New{i}.cs", f"class New{i} {{}}")
+        candidates.append(candidate)
+    return candidates
+
+
+def test_project_delta_benchmark():
+    source_project = make_project()
+    candidates = make_candidates(source_project)
+
+    t0 = time.time()
+    full = TLGeneratorResponse(
+        solutions=[ProtoCodeProject(**c.model_dump()) for c in candidates]
+    ).SerializeToString()
+    t_full = time.time() - t0
+
+    t0 = time.time()
+    base_hash = source_project.content_hash(normalize=False)
+    deltas = [make_delta(source_project, c, base_hash) for c in candidates]
+    delta = TLGeneratorResponse(solution_deltas=deltas).SerializeToString()
+    t_delta = time.time() - t0
+
+    t0 = time.time()
+    reconstructed = [apply_delta(source_project, d, base_hash) for d in deltas]
+    t_apply = time.time() - t0
+    assert [p.content_hash() for p in reconstructed] == [
+        c.content_hash() for c in candidates
+    ]
+
+    print(
+        f"\nsolutions:       {len(full) / 1024 / 1024:8.1f} MB, {t_full * 1000:7.1f}ms"
+        f"\nsolution_deltas: {len(delta) / 1024:8.1f} KB, {t_delta * 1000:7.1f}ms"
+        f", apply {t_apply * 1000:.1f}ms"
+    )
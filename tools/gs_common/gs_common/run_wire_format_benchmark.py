@@ -0,0 +1,88 @@
+import base64
+import os
+import time
+
+from dataset.util import load_example_project
+from gs_common.CodeProject import CodeFile, CodeProject
+from gs_common.wire_format import WireFormat, decode_request, encode_request
+
+"""
+Benchmark for the requests to the code executor: encode and decode time and
+bytes on the wire of json and of the binary WireFormat (with zstd if
+zstandard is installed), for the dataset projects and a large synthetic
+project with many binary reference files.
+Run with: pytest tools/gs_common/gs_common/run_wire_format_benchmark.py -s
+"""
+
+N_REPEATS = 5
+PROJECTS = [
+    ("QRCoder", "dotnetframework"),
+    ("QRCoder", "dotnet8"),
+    ("Hashids.net-v112", "dotnet8"),
+]
+
+
+def make_synthetic_project() -> CodeProject:
+    return CodeProject(
+        display_name="synthetic",
+        source_language="dotnet8",
+        files=[
+            CodeFile(
+                file_name=f"src/dir{i % 50}/File{i}.cs",
+                source_code=f"class File{i} {{}}\n" * 100,
+            )
+            for i in range(1_000)
+        ],
+        reference_files=[
+            CodeFile(
+                file_name=f"packages/lib{i % 50}/Lib{i}.dll",
+                source_code=base64.b64encode(os.urandom(64 * 1024)).decode(),
+            )
+            for i in range(200)
+        ],
+    )
+
+
+def min_time(function) -> tuple[float, object]:
+    times = []
+    for _ in range(N_REPEATS):
+        t0 = time.time()
+        result = function()
+        times.append(time.time() - t0)
+    return min(times), result
+
+
+def benchmark(name: str, project: CodeProject):
+    data = {
+        "source_project": project,
+        "test_project": project,
+        "target_language": project.source_language,
+    }
+    formats = {"json": None, "binary": WireFormat(compress=False)}
+    if WireFormat(compress=True).compress:
+        formats["binary+zstd"] = WireFormat(compress=True)
+    try:
+        for format_name, wire_format in formats.items():
+            WireFormat.default = wire_format
+            t_encode, encoded = min_time(lambda: encode_request(data))
+            if isinstance(encoded, str):
+                encoded = encoded.encode()
+            t_decode, decoded = min_time(
+                lambda: decode_request(encoded, ["source_project", "test_project"])
+            )
+            assert decoded["source_project"] == project
+            print(
+                f"{name:>30} {format_name:>12}: {len(encoded) / 1024:9.0f} KB, "
+                f"encode {t_encode * 1000:7.1f}ms, decode {t_decode * 1000:7.1f}ms"
+            )
+    finally:
+        WireFormat.default = None
+
+
+def test_wire_format_benchmark_dataset():
+    for name, language in PROJECTS:
+        benchmark(f"{name} ({language})", load_example_project(name, language))
+
+
+def test_wire_format_benchmark_synthetic():
+    benchmark("synthetic", make_synthetic_project())
@@ -0,0 +1,90 @@
+import base64
+import os
+
+from gs_common.CodeProject import CodeFile, CodeProject
+from gs_common.file_ops import BlobStore, blob_store
+
+
+def make_project(text: str) -> CodeProject:
+    return CodeProject(
+        display_name="test",
+        source_language="dotnet8",
+        files=[CodeFile(file_name="src/A.cs", source_code=text)],
+        reference_files=[
+            CodeFile(
+                file_name="lib/B.dll",
+                source_code=base64.b64encode(b"binary content").decode(),
+            )
+        ],
+    )
+
+
+def test_save_to_dir_with_blob_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "_read_only_protects_blobs", lambda: True)
+    store = BlobStore(str(tmp_path / "store"), 1024 * 1024)
+    project = make_project("class A {}")
+    project.save_to_dir(str(tmp_path / "first"), store)
+    project.save_to_dir(str(tmp_path / "second"), store)
+
+    for project_dir in [tmp_path / "first", tmp_path / "second"]:
+        assert (project_dir / "src" / "A.cs").read_text() == "class A {}"
+        assert (project_dir / "lib" / "B.dll").read_bytes() == b"binary content"
+    # both saves are links to the same blob
+    assert os.stat(tmp_path / "second" / "lib" / "B.dll").st_nlink == 3
+
+
+def test_save_to_dir_replaces_linked_files(tmp_path):
+    store = BlobStore(str(tmp_path / "store"), 1024 * 1024)
+    make_project("class A {}").save_to_dir(str(tmp_path / "project"), store)
+    make_project("class A { int a; }").save_to_dir(str(tmp_path / "project"), store)
+
+    assert (tmp_path / "project" / "src" / "A.cs").read_text() == "class A { int a; }"
+    # the blob of the first version is unchanged
+    make_project("class A {}").save_to_dir(str(tmp_path / "other"), store)
+    assert (tmp_path / "other" / "src" / "A.cs").read_text() == "class A {}"
+
+
+def test_save_to_dir_without_hardlinks(tmp_path):
+    store = BlobStore(str(tmp_path / "store"), 1024 * 1024)
+    make_project("class A {}").save_to_dir(
+        str(tmp_path / "project"), store, hardlink=False
+    )
+    path = tmp_path / "project" / "src" / "A.cs"
+    assert os.stat(path).st_nlink == 1
+    # copies can be modified in place
+    with open(path, "w") as f:
+        f.write("class A { int a; }")
+    make_project("class A {}").save_to_dir(str(tmp_path / "other"), store)
+    assert (tmp_path / "other" / "src" / "A.cs").read_text() == "class A {}"
+
+
+def test_no_hardlinks_if_blobs_are_writable(tmp_path, monkeypatch):
+    # e.g. running as root
+    monkeypatch.setattr(blob_store, "_read_only_protects_blobs", lambda: False)
+    store = BlobStore(str(tmp_path / "store"), 1024 * 1024)
+    make_project("class A {}").save_to_dir(str(tmp_path / "project"), store)
+    path = tmp_path / "project" / "src" / "A.cs"
+    assert os.stat(path).st_nlink == 1
+    # an in-place write does not reach the blob
+    with open(path, "w") as f:
+        f.write("class A { int a; }")
+    make_project("class A {}").save_to_dir(str(tmp_path / "other"), store)
+    assert (tmp_path / "other" / "src" / "A.cs").read_text() == "class A {}"
+
+
+def test_evict_oldest_blobs(tmp_path):
+    store = BlobStore(str(tmp_path / "store"), 15)
+    for i in range(3):
+        key = BlobStore.make_key(str(i), binary=False)
+        store.materialize(
+            key,
+            str(tmp_path / f"{i}.txt"),
+            lambda path: open(path, "w").write("0123456789"),
+        )
+        os.utime(store._path(key), (i, i))
+    store.evict()
+
+    blobs = sorted(os.path.basename(path) for _, _, path in store._blobs())
+    assert blobs == [BlobStore.make_key("2", binary=False)]
+    # evicted blobs do not affect materialized files
+    assert (tmp_path / "0.txt").read_text() == "0123456789"
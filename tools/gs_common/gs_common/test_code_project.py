@@ -1,5 +1,6 @@
 import base64
 import os
+import pickle
 import tempfile
 
 from dataset.util import load_example_project
@@ -166,3 +167,154 @@ def test_reference_file_dirs():
         assert len(loaded_project.reference_files) == 1
         assert loaded_project.reference_files[0].file_name == ref_file_name
         assert loaded_project.reference_files[0].source_code == "class ReferenceFile {}"
+
+
+def test_file_index_add_remove_rename():
+    project = CodeProject(
+        display_name="test",
+        source_language="dotnet8",
+        files=[
+            CodeFile(file_name="a.cs", source_code="a"),
+            CodeFile(file_name="b.cs", source_code="b"),
+        ],
+    )
+    assert project.get_file("a.cs").source_code == "a"
+
+    # add via method and via list append
+    project.add_file("c.cs", "c")
+    project.files.append(CodeFile(file_name="d.cs", source_code="d"))
+    assert project.get_file("c.cs").source_code == "c"
+    assert project.get_file("d.cs").source_code == "d"
+
+    # overwrite keeps a single file
+    project.add_file("a.cs", "new a")
+    assert project.get_file("a.cs").source_code == "new a"
+    assert len(project.files) == 4
+
+    # rename via method and via attribute
+    assert project.rename_file("a.cs", "e.cs")
+    project.get_file("b.cs").file_name = "f.cs"
+    assert project.get_file("a.cs") is None
+    assert project.get_file("b.cs") is None
+    assert project.get_file("e.cs").source_code == "new a"
+    assert project.get_file("f.cs").source_code == "b"
+
+    # remove
+    assert project.remove_file("e.cs")
+    assert not project.remove_file("e.cs")
+    assert project.get_file("e.cs") is None
+    assert len(project.files) == 3
+
+    # replace the whole list
+    project.files = [CodeFile(file_name="g.cs", source_code="g")]
+    assert project.get_file("c.cs") is None
+    assert project.get_file("g.cs").source_code == "g"
+
+
+def test_file_index_renamed_and_reordered_in_place():
+    project = CodeProject(
+        files=[
+            CodeFile(file_name="b.cs", source_code="b"),
+            CodeFile(file_name="a.cs", source_code="a"),
+        ],
+    )
+    assert project.get_file("c.cs") is None
+
+    # renamed to a name that was looked up (and missed) before
+    project.get_file("b.cs").file_name = "c.cs"
+    assert project.get_file("c.cs").source_code == "b"
+    assert project.get_file("b.cs") is None
+
+    # same list, same length, new order
+    project.files.sort()
+    assert project.get_file("a.cs").source_code == "a"
+    assert project.get_file("c.cs").source_code == "b"
+
+    # renames are seen by all projects sharing the CodeFile
+    other = project.copy_on_write()
+    assert other.get_file("a.cs").source_code == "a"
+    project.get_file("a.cs").file_name = "d.cs"
+    assert project.get_file("d.cs").source_code == "a"
+    assert other.get_file("d.cs").source_code == "a"
+    assert other.get_file("a.cs") is None
+
+
+def test_file_index_pickle_and_copy():
+    project = CodeProject(files=[CodeFile(file_name="a.cs", source_code="a")])
+    assert project.get_file("a.cs") is not None
+
+    for copied in [pickle.loads(pickle.dumps(project)), project.model_copy(deep=True)]:
+        assert copied == project
+        copied.get_file("a.cs").file_name = "b.cs"
+        assert copied.get_file("b.cs").source_code == "a"
+        assert project.get_file("a.cs").source_code == "a"
+
+
+def test_file_index_first_duplicate_wins():
+    project = CodeProject(
+        files=[
+            CodeFile(file_name="a.cs", source_code="first"),
+            CodeFile(file_name="a.cs", source_code="second"),
+        ],
+    )
+    assert project.get_file("a.cs").source_code == "first"
+    assert project.remove_file("a.cs")
+    assert len(project.files) == 0
+
+
+def test_file_index_reference_files():
+    project = CodeProject()
+    project.add_reference_file("lib.dll", "AAAA")
+    project.add_reference_file("lib.dll", "BBBB")
+    assert len(project.reference_files) == 1
+    assert project.get_reference_file("lib.dll").source_code == "BBBB"
+    assert project.remove_reference_file("lib.dll")
+    assert project.get_reference_file("lib.dll") is None
+
+
+def test_file_index_does_not_affect_equality():
+    project = CodeProject(files=[CodeFile(file_name="a.cs", source_code="a")])
+    other = project.model_copy(deep=True)
+    # build the index on one of them only
+    project.get_file("a.cs")
+    assert project == other
+
+
+def test_content_hash_ignores_whitespace_and_order():
+    project = CodeProject(
+        source_language="dotnet8",
+        files=[
+            CodeFile(file_name="src\\A.cs", source_code="class A {\r\n  int x;\r\n}"),
+            CodeFile(file_name="B.cs", source_code="class B {}"),
+        ],
+    )
+    other = CodeProject(
+        display_name="other",
+        source_language="dotnet8",
+        files=[
+            CodeFile(file_name="B.cs", source_code="class B {}\n\n"),
+            CodeFile(file_name="src/A.cs", source_code="class A {\n    int x;  \n}\n"),
+        ],
+    )
+    assert project.content_hash() == other.content_hash()
+
+    other.update_file("B.cs", "class B { }")
+    assert project.content_hash() != other.content_hash()
+
+    # same content as a reference file or in another language is different
+    moved = CodeProject(source_language="dotnet8", reference_files=project.files)
+    assert moved.content_hash() != project.content_hash()
+    project.source_language = "java21"
+    assert (
+        project.content_hash()
+        != CodeProject(source_language="dotnet8", files=project.files).content_hash()
+    )
+
+
+def test_content_hash_cache_is_reset():
+    file = CodeFile(file_name="a.cs", source_code="a")
+    content_hash = file.content_hash()
+    file.source_code = "b"
+    assert file.content_hash() != content_hash
+    # the cache does not affect equality
+    assert file == CodeFile(file_name="a.cs", source_code="b")
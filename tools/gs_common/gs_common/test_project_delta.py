@@ -0,0 +1,75 @@
+import pytest
+
+from gs_common.CodeProject import CodeFile, CodeProject
+from gs_common.project_delta import apply_delta, delta_size, make_delta
+
+
+def make_project() -> CodeProject:
+    return CodeProject(
+        display_name="Fib",
+        source_language="dotnetframework",
+        files=[
+            CodeFile(file_name=f"src/File{i}.cs", source_code=f"class File{i} {{}}")
+            for i in range(100)
+        ],
+        reference_files=[CodeFile(file_name="lib/A.dll", source_code="AAAA")],
+    )
+
+
+def test_make_apply_delta():
+    base = make_project()
+    project = base.copy_on_write()
+    project.display_name = "Fib (translated)"
+    project.source_language = "dotnet8"
+    project.update_file("src/File1.cs", "class File1 { }")
+    project.add_file("src/New.cs", "class New {}")
+    project.remove_file("src/File2.cs")
+    project.remove_reference_file("lib/A.dll")
+
+    delta = make_delta(base, project)
+
+    assert [f.file_name for f in delta.files.changed] == ["src/File1.cs"]
+    assert [f.file_name for f in delta.files.added] == ["src/New.cs"]
+    assert list(delta.files.deleted) == ["src/File2.cs"]
+    assert list(delta.reference_files.deleted) == ["lib/A.dll"]
+    assert delta_size(delta) == 4
+    assert apply_delta(base, delta) == project
+
+
+def test_unchanged_files_are_not_sent():
+    base = make_project()
+    # equal content, but not the same CodeFile objects
+    project = CodeProject.model_validate(base.model_dump())
+
+    delta = make_delta(base, project)
+
+    assert delta_size(delta) == 0
+    assert apply_delta(base, delta) == project
+
+
+def test_apply_delta_shares_unchanged_files():
+    base = make_project()
+    project = base.copy_on_write()
+    project.update_file("src/File1.cs", "class File1 { }")
+
+    reconstructed = apply_delta(base, make_delta(base, project))
+
+    assert reconstructed.files[0] is base.files[0]
+    assert base.files[1].source_code == "class File1 {}"
+
+
+def test_apply_delta_to_other_base():
+    base = make_project()
+    delta = make_delta(base, base.copy_on_write())
+    base.update_file("src/File1.cs", "class File1 { }")
+
+    with pytest.raises(ValueError):
+        apply_delta(base, delta)
+
+
+def test_duplicate_file_names():
+    base = make_project()
+    project = base.copy_on_write()
+    project.files.append(CodeFile(file_name="src/File1.cs", source_code=""))
+
+    assert make_delta(base, project) is None
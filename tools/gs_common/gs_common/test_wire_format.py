@@ -0,0 +1,97 @@
+import base64
+import json
+
+import pytest
+
+from gs_common.CodeProject import CodeFile, CodeProject
+from gs_common.project_delta import apply_delta, make_delta
+from gs_common.wire_format import WireFormat, decode_request, encode_request
+
+
+def make_project(name: str) -> CodeProject:
+    return CodeProject(
+        display_name=name,
+        source_language="dotnet8",
+        files=[CodeFile(file_name="src/A.cs", source_code="class A {}\n")],
+        reference_files=[
+            CodeFile(
+                file_name="lib/B.dll",
+                source_code=base64.b64encode(bytes(range(256))).decode(),
+            ),
+            # no extension: treated as binary, but not base64
+            CodeFile(file_name="LICENSE", source_code="MIT License\n"),
+            CodeFile(file_name="empty.png", source_code=""),
+        ],
+    )
+
+
+@pytest.fixture
+def wire_format(monkeypatch):
+    monkeypatch.setattr(WireFormat, "default", WireFormat(compress=False))
+    return WireFormat.default
+
+
+def test_encode_decode_request(wire_format):
+    data = {
+        "source_project": make_project("Fib"),
+        "test_projects": [make_project("FibTests"), make_project("OtherTests")],
+        "target_language": "dotnet8",
+        "accept": None,
+    }
+    encoded = encode_request(data)
+
+    assert WireFormat.is_encoded(encoded)
+    assert decode_request(encoded, []) == data
+
+
+def test_binary_files_are_sent_as_bytes(wire_format):
+    project = make_project("Fib")
+    encoded = encode_request({"source_project": project})
+    json_encoded = json.dumps({"source_project": project.model_dump()})
+    # base64 of the dll is not in the encoded request, its bytes are
+    assert project.reference_files[0].source_code.encode() not in encoded
+    assert bytes(range(256)) in encoded
+    assert len(encoded) < len(json_encoded)
+
+
+def test_decode_json_request(monkeypatch):
+    monkeypatch.setattr(WireFormat, "default", None)
+    data = {"source_project": make_project("Fib"), "target_language": "dotnet8"}
+    encoded = encode_request(data)
+
+    assert isinstance(encoded, str)
+    assert decode_request(encoded.encode(), ["source_project"]) == data
+
+
+def test_compressed_request(monkeypatch):
+    pytest.importorskip("zstandard")
+    monkeypatch.setattr(WireFormat, "default", WireFormat(compress=True))
+    data = {"source_project": make_project("Fib"), "target_language": "dotnet8"}
+    assert decode_request(encode_request(data), []) == data
+
+
+@pytest.mark.parametrize("binary", [True, False])
+def test_encode_decode_deltas(monkeypatch, binary):
+    monkeypatch.setattr(
+        WireFormat, "default", WireFormat(compress=False) if binary else None
+    )
+    base = make_project("Fib")
+    candidate = base.copy_on_write()
+    candidate.update_file("src/A.cs", "class B {}\n")
+    delta = make_delta(base, candidate)
+    data = {
+        "base_project": base,
+        "source_project_delta": delta,
+        "source_project_deltas": [delta, delta],
+        "target_language": "dotnet8",
+    }
+    decoded = decode_request(
+        encode_request(data),
+        ["base_project"],
+        ["source_project_delta", "source_project_deltas"],
+    )
+
+    assert decoded == data
+    assert apply_delta(decoded["base_project"], decoded["source_project_delta"]) == (
+        candidate
+    )
@@ -0,0 +1,197 @@
+import base64
+import binascii
+import json
+import logging
+
+from google.protobuf.json_format import MessageToDict, ParseDict
+from gs_common.CodeProject import CodeFile, CodeProject
+from gs_common.proto import code_executor_pb2, common_pb2
+
+try:
+    import zstandard
+except ImportError:
+    # compression is optional, see WireFormat
+    zstandard = None
+
+# start of an encoded message; json requests start with "{"
+MAGIC = b"GSW1"
+# byte after MAGIC: how the ExecutorRequest is compressed
+UNCOMPRESSED = b"\x00"
+ZSTD = b"\x01"
+
+
+def _project_to_proto(project: CodeProject, proto: common_pb2.CodeProject):
+    def to_proto(code_file: CodeFile) -> common_pb2.CodeFile:
+        if CodeProject._is_binary_file(code_file.file_name):
+            try:
+                return common_pb2.CodeFile(
+                    file_name=code_file.file_name,
+                    binary_content=base64.b64decode(
+                        code_file.source_code, validate=True
+                    ),
+                )
+            except binascii.Error:
+                # not base64 (e.g. a text file without extension), send as is
+                pass
+        return common_pb2.CodeFile(
+            file_name=code_file.file_name, source_code=code_file.source_code
+        )
+
+    # fill the message in place, copying a large message is not free
+    proto.source_language = project.source_language
+    proto.display_name = project.display_name
+    proto.files.extend(to_proto(f) for f in project.files)
+    proto.reference_files.extend(to_proto(f) for f in project.reference_files)
+
+
+def _project_from_proto(proto: common_pb2.CodeProject) -> CodeProject:
+    def from_proto(code_file: common_pb2.CodeFile) -> CodeFile:
+        if code_file.binary_content:
+            source_code = base64.b64encode(code_file.binary_content).decode()
+        else:
+            source_code = code_file.source_code
+        return CodeFile(file_name=code_file.file_name, source_code=source_code)
+
+    return CodeProject(
+        source_language=proto.source_language,
+        display_name=proto.display_name,
+        files=[from_proto(f) for f in proto.files],
+        reference_files=[from_proto(f) for f in proto.reference_files],
+    )
+
+
+class WireFormat:
+    """
+    Compact encoding of the requests to the code executor: the projects as
+    gs.common.CodeProject protos with binary files as bytes instead of base64,
+    gs.common.ProjectDeltas (see gs_common.project_delta) as they are, the
+    other fields as json, optionally compressed with zstd.
+    An encoded request starts with MAGIC, so the code executor accepts both
+    encoded and json requests (see decode_request).
+    """
+
+    # format of the requests to the code executor, None = json
+    default: "WireFormat" = None
+
+    def __init__(self, compress: bool, compression_level: int = 3):
+        if compress and zstandard is None:
+            logging.warning("zstandard is not installed, sending uncompressed")
+            compress = False
+        self.compress = compress
+        self.compression_level = compression_level
+
+    @staticmethod
+    def configure(config: dict):
+        if config["code_executor_wire_format"] != "binary":
+            WireFormat.default = None
+            return
+        WireFormat.default = WireFormat(config["code_executor_wire_compression"])
+
+    def encode(self, data: dict) -> bytes:
+        """
+        Encode a request: values are CodeProjects, ProjectDeltas, lists of
+        either or json serializable.
+        """
+        request = code_executor_pb2.ExecutorRequest()
+        fields = {}
+        for key, value in data.items():
+            if isinstance(value, CodeProject):
+                _project_to_proto(value, request.projects[key])
+            elif (
+                isinstance(value, list)
+                and value
+                and all(isinstance(v, CodeProject) for v in value)
+            ):
+                project_list = request.project_lists[key]
+                for v in value:
+                    _project_to_proto(v, project_list.projects.add())
+            elif isinstance(value, common_pb2.ProjectDelta):
+                request.deltas[key].CopyFrom(value)
+            elif (
+                isinstance(value, list)
+                and value
+                and all(isinstance(v, common_pb2.ProjectDelta) for v in value)
+            ):
+                request.delta_lists[key].deltas.extend(value)
+            else:
+                fields[key] = value
+        request.fields_json = json.dumps(fields)
+        message = request.SerializeToString()
+        if self.compress:
+            compressor = zstandard.ZstdCompressor(level=self.compression_level)
+            return MAGIC + ZSTD + compressor.compress(message)
+        return MAGIC + UNCOMPRESSED + message
+
+    @staticmethod
+    def is_encoded(data: bytes) -> bool:
+        return data[: len(MAGIC)] == MAGIC
+
+    @staticmethod
+    def decode(data: bytes) -> dict:
+        """
+        Inverse of encode, the projects are CodeProjects.
+        """
+        compression = data[len(MAGIC) : len(MAGIC) + 1]
+        message = data[len(MAGIC) + 1 :]
+        if compression == ZSTD:
+            if zstandard is None:
+                raise ValueError("zstd compressed request, but zstandard is missing")
+            message = zstandard.ZstdDecompressor().decompress(message)
+        elif compression != UNCOMPRESSED:
+            raise ValueError(f"Unknown compression of request: {compression}")
+        request = code_executor_pb2.ExecutorRequest()
+        request.ParseFromString(message)
+        data = json.loads(request.fields_json)
+        for key, project in request.projects.items():
+            data[key] = _project_from_proto(project)
+        for key, project_list in request.project_lists.items():
+            data[key] = [_project_from_proto(p) for p in project_list.projects]
+        for key, delta in request.deltas.items():
+            data[key] = delta
+        for key, delta_list in request.delta_lists.items():
+            data[key] = list(delta_list.deltas)
+        return data
+
+
+def encode_request(data: dict) -> str | bytes:
+    """
+    Encode a request to the code executor with WireFormat.default, or as json
+    (projects as model_dump, ProjectDeltas as proto json) if it is None.
+    """
+    if WireFormat.default is not None:
+        return WireFormat.default.encode(data)
+
+    def to_json(value):
+        if isinstance(value, CodeProject):
+            return value.model_dump()
+        if isinstance(value, common_pb2.ProjectDelta):
+            return MessageToDict(value)
+        if isinstance(value, list):
+            return [to_json(v) for v in value]
+        return value
+
+    return json.dumps({key: to_json(value) for key, value in data.items()})
+
+
+def decode_request(
+    data: bytes, project_keys: list[str], delta_keys: list[str] = ()
+) -> dict:
+    """
+    Decode a request of encode_request; for json requests the fields in
+    project_keys are validated to CodeProjects and the fields in delta_keys
+    are parsed to ProjectDeltas (or lists of them).
+    """
+    if WireFormat.is_encoded(data):
+        return WireFormat.decode(data)
+    data = json.loads(data)
+    for key in project_keys:
+        if isinstance(data.get(key), list):
+            data[key] = [CodeProject.model_validate(p) for p in data[key]]
+        elif key in data:
+            data[key] = CodeProject.model_validate(data[key])
+    for key in delta_keys:
+        if isinstance(data.get(key), list):
+            data[key] = [ParseDict(d, common_pb2.ProjectDelta()) for d in data[key]]
+        elif key in data:
+            data[key] = ParseDict(data[key], common_pb2.ProjectDelta())
+    return data